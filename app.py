@@ -1,4 +1,5 @@
 from datetime import datetime
+import click
 from flask import Flask
 from models import db, User
 import config
@@ -9,6 +10,9 @@ from blueprints.auth import auth_bp
 from blueprints.admin import admin_bp
 from blueprints.admin.aussendungen import cronjob as aussendungen_cronjob
 from utils.auto_aufbuchung import cronjob as auto_aufbuchung_cronjob
+from utils.idempotenz import cronjob as idempotenz_cronjob
+from utils.partitionen import cronjob as partitionen_cronjob
+from utils import archiv, partitionen, rollup, schwaerzung
 from blueprints.bar import bar_bp
 from blueprints.ranking import ranking_bp
 from logging.config import dictConfig
@@ -59,6 +63,43 @@ def float_format_filter(value):
 
 app.jinja_env.filters["float_format"] = float_format_filter
 
+with app.app_context():
+    schwaerzung.laden()
+
+
+@app.cli.command("rollup-neu-berechnen")
+def rollup_neu_berechnen():
+    """Baut den stündlichen Ranking-Rollup aus der Buchungstabelle neu auf."""
+    rollup.neu_berechnen()
+    print("Ranking-Rollup neu berechnet.")
+
+
+@app.cli.command("buchungen-archivieren")
+@click.option("--monate", type=int, default=None, help="Abrechnungen älter als so viele Monate (Standard: ARCHIV_MONATE)")
+def buchungen_archivieren(monate):
+    """Verschiebt die Buchungen alter Abrechnungen ins kalte Archiv (siehe utils/archiv.py)."""
+    abrechnungen, buchungen = archiv.archivieren(monate)
+    print(f"{buchungen} Buchungen aus {abrechnungen} Abrechnungen archiviert.")
+
+
+@app.cli.command("buchung-partitionieren")
+def buchung_partitionieren():
+    """Stellt buchung einmalig auf monatliche Range-Partitionen um (siehe utils/partitionen.py)."""
+    if partitionen.partitioniert():
+        print("buchung ist bereits partitioniert.")
+        return
+    partitionen.umstellen()
+    print("buchung ist jetzt nach Monaten partitioniert.")
+
+
+@app.cli.command("buchung-partitionen-anlegen")
+def buchung_partitionen_anlegen():
+    """Legt die Monatspartitionen für die nächsten BUCHUNG_PARTITIONEN_VORAUS Monate an."""
+    if not partitionen.anlegen():
+        print("buchung ist nicht partitioniert – nichts zu tun.")
+        return
+    print("Partitionen angelegt.")
+
 
 if __name__ == "__main__":
     with app.app_context():
@@ -85,6 +126,19 @@ if __name__ == "__main__":
         seconds=60,
         next_run_time=datetime.now(),
     )
+    scheduler.add_job(
+        id="idempotenz_cleanup",
+        func=lambda: idempotenz_cronjob(app),
+        trigger="interval",
+        hours=1,
+    )
+    scheduler.add_job(
+        id="buchung_partitionen",
+        func=lambda: partitionen_cronjob(app),
+        trigger="interval",
+        days=1,
+        next_run_time=datetime.now(),
+    )
     scheduler.start()
 
     app.run(host="0.0.0.0", debug=config.DEBUG)
@@ -4,9 +4,11 @@ from flask import Blueprint, flash, render_template, request, jsonify, url_for
 from flask_login import login_required
 from datetime import datetime
 
-from sqlalchemy import func, text, or_, and_
+from sqlalchemy import case, func, text, or_, and_, update
 
-from models import db, Abrechnung, Buchung
+from models import db, Abrechnung, Buchung, Mitglied
+from utils import archiv
+from utils.abrechnung import zusammenfassen
 
 
 abrechnung_bp = Blueprint(
@@ -20,45 +22,8 @@ abrechnung_bp = Blueprint(
 @abrechnung_bp.route("/")
 @login_required
 def index():
-    with db.engine.connect() as connection:
-        sql = """
-        SELECT a.id,
-               a.name,
-               a.zeitstempel,
-               general.num_buchungen,
-               general.veraendert,
-               general.von_datum,
-               general.bis_datum,
-               COALESCE(summe_eingaenge.summe_eingaenge, 0) AS summe_eingaenge,
-               COALESCE(summe_ausgaenge.summe_ausgaenge, 0) AS summe_ausgaenge
-        FROM abrechnung a,
-             LATERAL (
-                 SELECT abrechnungs_id                                           AS id,
-                        count(b.id)                                              AS num_buchungen,
-                        bool_or(COALESCE(b.storno_updated_at > a.zeitstempel, FALSE))   AS veraendert,
-                        MIN(b.zeitstempel)                                       AS von_datum,
-                        MAX(b.zeitstempel)                                       AS bis_datum
-                 FROM buchung b
-                 WHERE a.id = abrechnungs_id
-                 GROUP BY abrechnungs_id
-             ) general
-             NATURAL LEFT JOIN (
-                 SELECT abrechnungs_id AS id, sum(gesamtpreis) AS summe_eingaenge
-                 FROM buchung
-                 WHERE gesamtpreis > 0.0
-                   AND storno = false
-                 GROUP BY abrechnungs_id
-             ) summe_eingaenge
-             NATURAL LEFT JOIN (
-                 SELECT abrechnungs_id AS id, -1 * sum(gesamtpreis) AS summe_ausgaenge
-                 FROM buchung
-                 WHERE gesamtpreis < 0.0
-                   AND storno = false
-                 GROUP BY abrechnungs_id
-             ) summe_ausgaenge
-        ORDER BY zeitstempel DESC
-        """
-        abrechnungen = connection.execute(text(sql))
+    # Kennzahlen stehen an der Abrechnung (utils/abrechnung.py), auch für archivierte
+    abrechnungen = Abrechnung.query.order_by(Abrechnung.zeitstempel.desc()).all()
     return render_template("admin/abrechnung/index.html", abrechnungen=abrechnungen)
 
 
@@ -73,23 +38,25 @@ def create():
 
     abrechnung = Abrechnung(name=name)
     db.session.add(abrechnung)
+    db.session.flush()
 
-    query = Buchung.query.filter(Buchung.abrechnungs_id.is_(None))
-
+    bedingungen = [Buchung.abrechnungs_id.is_(None)]
     if modus == "zeitraum":
         start_dt = datetime.fromisoformat(start)
         end_dt = datetime.fromisoformat(end)
-        query = query.filter(
-            Buchung.zeitstempel >= start_dt,
-            Buchung.zeitstempel <= end_dt,
-        )
+        bedingungen += [Buchung.zeitstempel >= start_dt, Buchung.zeitstempel <= end_dt]
 
-    buchungen = query.all()
-    for b in buchungen:
-        b.abrechnung_obj = abrechnung
+    # Ein UPDATE statt alle Buchungen ins ORM zu laden
+    anzahl = db.session.execute(
+        update(Buchung)
+        .where(*bedingungen)
+        .values(abrechnungs_id=abrechnung.id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    zusammenfassen(abrechnung.id)
 
     db.session.commit()
-    return jsonify({"success": True})
+    return jsonify({"success": True, "anzahl": anzahl})
 
 
 @abrechnung_bp.route("/<int:abrechnung_id>")
@@ -97,6 +64,10 @@ def create():
 def detail(abrechnung_id):
     abrechnung = Abrechnung.query.get_or_404(abrechnung_id)
 
+    archiv_kopf = archiv.archiviert(abrechnung.id)
+    if archiv_kopf is not None:
+        return _detail_archiviert(abrechnung, archiv_kopf)
+
     buchungen = (
         Buchung.query
         .filter_by(abrechnungs_id=abrechnung.id)
@@ -114,23 +85,6 @@ def detail(abrechnung_id):
         .all()
     )
 
-    # FIX: Crash wenn Abrechnung keine Buchungen hat
-    von_datum = None
-    bis_datum = None
-    if buchungen:
-        with db.engine.connect() as connection:
-            sql = f"""
-                SELECT MIN(b.zeitstempel) AS von_datum,
-                       MAX(b.zeitstempel) AS bis_datum
-                FROM buchung b
-                WHERE b.abrechnungs_id = {abrechnung_id}
-                GROUP BY abrechnungs_id
-            """
-            results = list(connection.execute(text(sql)))
-            if results:
-                von_datum = results[0][0]
-                bis_datum = results[0][1]
-
     konten = defaultdict(lambda: {"mitglied": None, "einzahlungen": 0, "konsum": 0})
     for b in buchungen:
         konto = konten[b.mitglied_id]
@@ -146,43 +100,99 @@ def detail(abrechnung_id):
         buchungen=buchungen,
         stornierte=stornierte,
         konten=konten,
-        von_datum=von_datum,
-        bis_datum=bis_datum,
+        von_datum=abrechnung.von_datum,
+        bis_datum=abrechnung.bis_datum,
+    )
+
+
+def _detail_archiviert(abrechnung, archiv_kopf):
+    """Detailseite einer archivierten Abrechnung: Kontoübersicht aus dem Archiv, keine Einzelbuchungen."""
+    konten = defaultdict(lambda: {"mitglied": None, "einzahlungen": 0, "konsum": 0})
+    zeilen = db.session.execute(text(
+        """
+        SELECT z.mitglied_id,
+               COALESCE(sum(z.gesamtpreis) FILTER (WHERE z.gesamtpreis > 0), 0) AS einzahlungen,
+               COALESCE(-sum(z.gesamtpreis) FILTER (WHERE z.gesamtpreis <= 0), 0) AS konsum
+        FROM buchung_archiv_zeilen z
+        WHERE z.abrechnungs_id = :id AND z.storno = false
+        GROUP BY z.mitglied_id
+        """
+    ), {"id": abrechnung.id})
+    for row in zeilen:
+        konto = konten[row.mitglied_id]
+        konto["mitglied"] = db.session.get(Mitglied, row.mitglied_id)
+        konto["einzahlungen"] = row.einzahlungen
+        konto["konsum"] = row.konsum
+
+    return render_template(
+        "admin/abrechnung/detail.html",
+        abrechnung=abrechnung,
+        archiv=archiv_kopf,
+        buchungen=[],
+        stornierte=[],
+        konten=konten,
+        von_datum=archiv_kopf.von_datum,
+        bis_datum=archiv_kopf.bis_datum,
     )
 
 
+def _gesperrt(abrechnung_id):
+    """Abrechnung mit Zeilensperre laden: reiht Änderungen hinter eine laufende Archivierung ein."""
+    return Abrechnung.query.filter_by(id=abrechnung_id).with_for_update().first_or_404()
+
+
+def _archiviert_antwort(abrechnung):
+    if archiv.archiviert(abrechnung.id) is None:
+        return None
+    return jsonify(success=False, message="Die Abrechnung ist archiviert und kann nicht mehr geändert werden."), 400
+
+
 @abrechnung_bp.route("/<int:abrechnung_id>/update", methods=["POST"])
 @login_required
 def update(abrechnung_id):
-    abrechnung = Abrechnung.query.get_or_404(abrechnung_id)
+    abrechnung = _gesperrt(abrechnung_id)
+    antwort = _archiviert_antwort(abrechnung)
+    if antwort:
+        return antwort
     data = request.get_json()
     start = datetime.fromisoformat(data["start"])
     ende = datetime.fromisoformat(data["ende"])
 
-    Buchung.query.filter_by(abrechnungs_id=abrechnung.id).update({"abrechnungs_id": None})
-
-    buchungen = (
-        Buchung.query
-        .filter(
-            Buchung.abrechnungs_id == None,
-            Buchung.zeitstempel >= start,
-            Buchung.zeitstempel <= ende,
+    # Ein UPDATE: bisherige Buchungen außerhalb des Zeitraums lösen,
+    # freie Buchungen im Zeitraum zuordnen. Nur Zeilen, deren Zuordnung sich wirklich
+    # ändert, werden geschrieben – rowcount ist damit die Zahl der Änderungen.
+    im_zeitraum = and_(Buchung.zeitstempel >= start, Buchung.zeitstempel <= ende)
+    neue_id = case((im_zeitraum, abrechnung.id), else_=None)
+    anzahl = db.session.execute(
+        update(Buchung)
+        .where(
+            or_(
+                Buchung.abrechnungs_id == abrechnung.id,
+                and_(Buchung.abrechnungs_id.is_(None), im_zeitraum),
+            ),
+            Buchung.abrechnungs_id.is_distinct_from(neue_id),
         )
-        .all()
-    )
-    for b in buchungen:
-        b.abrechnungs_id = abrechnung.id
+        .values(abrechnungs_id=neue_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
 
     abrechnung.zeitstempel = datetime.now()
+    db.session.flush()
+    zusammenfassen(abrechnung.id)
     db.session.commit()
-    return jsonify(success=True)
+    return jsonify(success=True, geaendert=anzahl)
 
 
 @abrechnung_bp.route("/<int:abrechnung_id>/refresh", methods=["POST"])
 @login_required
 def refresh(abrechnung_id):
-    abrechnung = Abrechnung.query.get_or_404(abrechnung_id)
+    abrechnung = _gesperrt(abrechnung_id)
+    antwort = _archiviert_antwort(abrechnung)
+    if antwort:
+        return antwort
     abrechnung.zeitstempel = datetime.now()
+    db.session.flush()
+    zusammenfassen(abrechnung.id)
     db.session.commit()
     return jsonify(success=True)
 
@@ -190,7 +200,10 @@ def refresh(abrechnung_id):
 @abrechnung_bp.route("/<int:abrechnung_id>/delete", methods=["POST"])
 @login_required
 def delete(abrechnung_id):
-    abrechnung = Abrechnung.query.get_or_404(abrechnung_id)
+    abrechnung = _gesperrt(abrechnung_id)
+    antwort = _archiviert_antwort(abrechnung)
+    if antwort:
+        return antwort
     Buchung.query.filter_by(abrechnungs_id=abrechnung.id).update({"abrechnungs_id": None})
     db.session.delete(abrechnung)
     db.session.commit()
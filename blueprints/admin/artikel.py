@@ -3,6 +3,7 @@ from flask_login import login_required
 
 from models import db, Artikel
 from utils.admin import handle_excel_import
+from utils import katalog
 
 artikel_bp = Blueprint(
     "artikel",
@@ -31,6 +32,7 @@ def toggle_artikel(artikel_id):
     artikel = Artikel.query.get_or_404(artikel_id)
     artikel.aktiv = not artikel.aktiv
     db.session.commit()
+    katalog.invalidieren()
     return jsonify({"success": True, "aktiv": artikel.aktiv})
 
 
@@ -73,6 +75,7 @@ def update_artikel(artikel_id):
         artikel.reinalkohol_liter = None
 
     db.session.commit()
+    katalog.invalidieren()
     return jsonify({"success": True})
 
 
@@ -94,6 +97,7 @@ def create():
 
     db.session.add(artikel)
     db.session.commit()
+    katalog.invalidieren()
 
     return jsonify({"success": True, "artikel_id": artikel.id})
 
@@ -101,9 +105,11 @@ def create():
 @artikel_bp.route("/bulk-import", methods=["POST"])
 @login_required
 def bulk_import():
-    return handle_excel_import(
+    response = handle_excel_import(
         db_fields=DB_FIELDS,
         model=Artikel,
         redirect_url=url_for("admin.artikel.index"),
         unique_field="id",
     )
+    katalog.invalidieren()
+    return response
@@ -10,10 +10,14 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required
 from sqlalchemy import text
 
-from models import db, Bericht, Mitglied, Artikel, User, Buchung, Abrechnung, Aussendung
+from models import db, Bericht, Mitglied, Artikel, User, Buchung, Abrechnung, Aussendung, ArchivSumme
 from utils.admin import export_df_to_excel
+from utils.hotlist import hotlist_neu_berechnen
+from utils import archiv, katalog, rollup, suchindex
 
-# Reihenfolge beachtet FK-Abhängigkeiten: Buchung zuletzt (referenziert Mitglied, Artikel, Abrechnung)
+# Reihenfolge beachtet FK-Abhängigkeiten: Buchung zuletzt (referenziert Mitglied, Artikel, Abrechnung).
+# Das Buchungsarchiv selbst (ein JSONB-Wert pro Abrechnung) passt nicht in Excel-Zellen und
+# liegt als JSON Lines daneben (_ARCHIV_DATEI), eine Zeile pro Abrechnung.
 _BACKUP_TABLES = [
     ("users", User),
     ("berichte", Bericht),
@@ -21,8 +25,10 @@ _BACKUP_TABLES = [
     ("abrechnungen", Abrechnung),
     ("mitglieder", Mitglied),
     ("artikel", Artikel),
+    ("archiv_summen", ArchivSumme),
     ("buchungen", Buchung),
 ]
+_ARCHIV_DATEI = "buchung_archiv.jsonl"
 
 export_bp = Blueprint("export", __name__, url_prefix="/export")
 
@@ -63,9 +69,24 @@ def admin_export():
         results=results,
         error=error,
         berichte=berichte,
+        archiv=archiv.statistik(),
     )
 
 
+@export_bp.route("/archivieren", methods=["POST"])
+@login_required
+def archivieren():
+    """Verschiebt die Buchungen von Abrechnungen älter als ARCHIV_MONATE ins Archiv."""
+    try:
+        abrechnungen, buchungen = archiv.archivieren()
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Fehler beim Archivieren: {e}", "error")
+        return redirect(url_for("admin.export.admin_export"))
+    flash(f"{buchungen} Buchungen aus {abrechnungen} Abrechnungen archiviert.", "success")
+    return redirect(url_for("admin.export.admin_export"))
+
+
 @export_bp.route("/export/berichte", methods=["POST"])  # FIX: @login_required nach @route
 @login_required
 def create_berichte():
@@ -122,7 +143,7 @@ def db_backup():
         zf.writestr("ebs_version.txt", _get_db_revision())
 
         for name, model in _BACKUP_TABLES:
-            columns = [c.key for c in model.__table__.columns]
+            columns = [c.key for c in model.__table__.columns if c.computed is None]
             rows = model.query.all()
             df = pd.DataFrame(
                 [{col: getattr(r, col) for col in columns} for r in rows],
@@ -133,6 +154,15 @@ def db_backup():
                 df.to_excel(writer, index=False, sheet_name=name)
             zf.writestr(f"{name}.xlsx", excel_buf.getvalue())
 
+        # Archiv zeilenweise streamen: eine Abrechnung nach der anderen im Speicher
+        zeilen = db.session.execute(
+            text("SELECT to_jsonb(a)::text FROM buchung_archiv a ORDER BY abrechnungs_id"),
+            execution_options={"yield_per": 10},
+        ).scalars()
+        with zf.open(_ARCHIV_DATEI, "w") as datei:
+            for zeile in zeilen:
+                datei.write(zeile.encode() + b"\n")
+
     zip_buffer.seek(0)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return send_file(
@@ -177,7 +207,7 @@ def db_restore():
             for name, model in ordered:
                 df = pd.read_excel(io.BytesIO(zf.read(f"{name}.xlsx")))
                 df = df.replace({np.nan: None})
-                columns = [c.key for c in model.__table__.columns]
+                columns = [c.key for c in model.__table__.columns if c.computed is None]
                 inserted = skipped = 0
 
                 for _, row in df.iterrows():
@@ -202,6 +232,27 @@ def db_restore():
                 db.session.commit()
                 summary.append(f"{name}: {inserted} eingefügt, {skipped} übersprungen")
 
+            if _ARCHIV_DATEI in zf.namelist():
+                inserted = skipped = 0
+                with zf.open(_ARCHIV_DATEI) as datei:
+                    for zeile in datei:
+                        if not zeile.strip():
+                            continue
+                        eingefuegt = db.session.execute(text(
+                            "INSERT INTO buchung_archiv "
+                            "SELECT * FROM jsonb_populate_record(NULL::buchung_archiv, CAST(:zeile AS jsonb)) "
+                            "ON CONFLICT (abrechnungs_id) DO NOTHING"
+                        ), {"zeile": zeile.decode()}).rowcount
+                        inserted += eingefuegt
+                        skipped += 1 - eingefuegt
+                db.session.commit()
+                summary.append(f"archiv: {inserted} eingefügt, {skipped} übersprungen")
+
+            hotlist_neu_berechnen()
+            rollup.neu_berechnen()
+            suchindex.invalidieren()
+            katalog.invalidieren()
+
     except zipfile.BadZipFile:
         flash("Ungültige ZIP-Datei.", "error")
         return redirect(url_for("admin.export.admin_export"))
@@ -1,58 +1,137 @@
 """Buchungen blueprint for admin panel"""
 
+from collections import defaultdict
 from datetime import datetime
 
-from flask import Blueprint, render_template, request, flash, jsonify
+from flask import Blueprint, render_template, request, flash, jsonify, redirect, url_for
 from flask_login import login_required
-from sqlalchemy import desc
-import pandas as pd
+from sqlalchemy import desc, select, tuple_, update
+from sqlalchemy.orm import joinedload
 
-from models import db, Buchung
-from utils.admin import export_df_to_excel, parse_daterange, calc_blacklist
+from models import db, Abrechnung, Artikel, Buchung, Mitglied
+from utils.admin import export_rows_to_csv, export_rows_to_excel, geschaetzte_anzahl, parse_daterange
+from utils.buchung import guthaben_aendern, guthaben_aendern_alle
+from utils.abrechnung import storno_erfassen
+from utils.hotlist import konsum_erfassen
 
 buchungen_bp = Blueprint("buchungen", __name__, url_prefix="/buchungen")
 
 
+_PRO_SEITE = 20
+
+
+def _cursor(buchung) -> str:
+    """Seitenmarke einer Buchung: ``<ISO-Zeitstempel>_<id>``."""
+    return f"{buchung.zeitstempel.isoformat()}_{buchung.id}"
+
+
+def _cursor_lesen(wert):
+    """Gegenstück zu ``_cursor``; None bei fehlender oder ungültiger Marke."""
+    if not wert:
+        return None
+    zeit, _, buchung_id = wert.rpartition("_")
+    try:
+        return datetime.fromisoformat(zeit), int(buchung_id)
+    except ValueError:
+        return None
+
+
+def _bedingungen(start_date, end_date, mitglied_id=None, artikel_id=None) -> list:
+    """Filter der Historie bzw. des Exports (Zeitraum, optional Mitglied und Artikel)."""
+    bedingungen = [Buchung.zeitstempel.between(start_date, end_date)]
+    if mitglied_id:
+        bedingungen.append(Buchung.mitglied_id == mitglied_id)
+    if artikel_id:
+        bedingungen.append(Buchung.artikel_id == artikel_id)
+    return bedingungen
+
+
 @buchungen_bp.route("/")  # FIX: @login_required nach @route
 @login_required
 def history():
-    """Zeigt die Buchungshistorie mit Pagination und Datumsfilter."""
-    page = request.args.get("page", 1, type=int)
-    per_page = 20
+    """
+    Zeigt die Buchungshistorie mit Keyset-Pagination und Filtern.
 
+    Geblättert wird über ``(zeitstempel, id)``: ``nach`` liefert die älteren Buchungen
+    hinter einer Marke, ``vor`` die neueren davor. Jede Seite ist damit ein Indexbereich
+    mit LIMIT, egal wie weit zurück sie liegt. Die Gesamtzahl wird nur geschätzt.
+    """
     start_date, end_date = parse_daterange()
+    mitglied_id = request.args.get("mitglied_id", type=int)
+    artikel_id = request.args.get("artikel_id", type=int)
+    nach = _cursor_lesen(request.args.get("nach"))
+    vor = None if nach else _cursor_lesen(request.args.get("vor"))
 
-    query = (
-        Buchung.query.join(Buchung.mitglied_obj)
-        .outerjoin(Buchung.artikel_obj)
-        .filter(Buchung.zeitstempel.between(start_date, end_date))
-        .order_by(desc(Buchung.zeitstempel))
-    )
+    filter_args = {
+        "start": start_date.strftime("%Y-%m-%dT%H:%M"),
+        "end": end_date.strftime("%Y-%m-%dT%H:%M"),
+        "mitglied_id": mitglied_id,
+        "artikel_id": artikel_id,
+    }
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    buchungen = pagination.items
+    bedingungen = _bedingungen(start_date, end_date, mitglied_id, artikel_id)
+
+    schluessel = tuple_(Buchung.zeitstempel, Buchung.id)
+    query = Buchung.query.options(
+        joinedload(Buchung.mitglied_obj),
+        joinedload(Buchung.artikel_obj),
+        joinedload(Buchung.abrechnung_obj),
+    ).filter(*bedingungen)
+    if vor:
+        query = query.filter(schluessel > vor).order_by(Buchung.zeitstempel, Buchung.id)
+    else:
+        if nach:
+            query = query.filter(schluessel < nach)
+        query = query.order_by(desc(Buchung.zeitstempel), desc(Buchung.id))
+
+    buchungen = query.limit(_PRO_SEITE + 1).all()
+    weitere = len(buchungen) > _PRO_SEITE
+    buchungen = buchungen[:_PRO_SEITE]
+
+    if vor:
+        if not weitere:
+            # Rückwärts am Anfang angekommen: volle erste Seite statt Restseite
+            return redirect(url_for("admin.buchungen.history", **filter_args))
+        buchungen.reverse()
+        hat_neuere, hat_aeltere = True, True
+    else:
+        hat_neuere, hat_aeltere = nach is not None, weitere
+
+    mitglieder = db.session.execute(select(Mitglied.id, Mitglied.name).order_by(Mitglied.name)).all()
+    artikel = db.session.execute(select(Artikel.id, Artikel.name).order_by(Artikel.name)).all()
 
     return render_template(
         "admin/buchungshistorie.html",
         buchungen=buchungen,
-        pagination=pagination,
-        start_date=start_date.strftime("%Y-%m-%dT%H:%M"),
-        end_date=end_date.strftime("%Y-%m-%dT%H:%M"),
+        anzahl=geschaetzte_anzahl(select(Buchung.id).where(*bedingungen)),
+        url_neuer=url_for("admin.buchungen.history", vor=_cursor(buchungen[0]), **filter_args)
+        if hat_neuere and buchungen else None,
+        url_aelter=url_for("admin.buchungen.history", nach=_cursor(buchungen[-1]), **filter_args)
+        if hat_aeltere and buchungen else None,
+        start_date=filter_args["start"],
+        end_date=filter_args["end"],
+        mitglied_id=mitglied_id,
+        artikel_id=artikel_id,
+        mitglieder=mitglieder,
+        artikel=artikel,
     )
 
 
 @buchungen_bp.route("/toggle/<int:buchung_id>", methods=["POST"])  # FIX: @login_required nach @route
 @login_required
 def toggle(buchung_id):
-    buchung = Buchung.query.get_or_404(buchung_id)
+    # Zeile sperren, damit ein Doppelklick nicht zweimal umbucht
+    buchung = Buchung.query.filter_by(id=buchung_id).with_for_update().first_or_404()
     if buchung.storno:
         buchung.storno = False
-        buchung.mitglied_obj.blacklist = calc_blacklist(buchung.mitglied_obj, buchung.gesamtpreis)
-        buchung.mitglied_obj.guthaben += buchung.gesamtpreis
+        guthaben_aendern(buchung.mitglied_id, buchung.gesamtpreis)
+        konsum_erfassen([buchung])
+        storno_erfassen([buchung], 1)
     else:
         buchung.storno = True
-        buchung.mitglied_obj.blacklist = calc_blacklist(buchung.mitglied_obj, -buchung.gesamtpreis)
-        buchung.mitglied_obj.guthaben -= buchung.gesamtpreis
+        guthaben_aendern(buchung.mitglied_id, -buchung.gesamtpreis)
+        konsum_erfassen([buchung], -1)
+        storno_erfassen([buchung], -1)
     buchung.storno_updated_at = datetime.now()
     db.session.commit()
 
@@ -69,35 +148,139 @@ def toggle(buchung_id):
     })
 
 
+_STORNO_MAX_BUCHUNGEN = 1000
+
+
+@buchungen_bp.route("/storno", methods=["POST"])
+@login_required
+def storno():
+    """
+    Storniert (``storno: true``) bzw. reaktiviert (``storno: false``) mehrere Buchungen auf einmal.
+
+    Alles in einer Transaktion: ein ``UPDATE ... RETURNING`` für die Buchungen (nur die,
+    deren Status sich ändert), ein Guthaben-Update für alle betroffenen Mitglieder samt
+    einmaliger Neuberechnung der Schwärzung und ein Fortschreiben der Konsum-Zähler
+    und der Abrechnungs-Kennzahlen.
+
+    Body (JSON): ``{"ids": [...], "storno": true}``
+    """
+    data = request.get_json(silent=True) or {}
+    ziel = data.get("storno")
+    try:
+        ids = sorted({int(i) for i in data.get("ids") or []})
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Ungültige Buchungs-IDs."}), 400
+    if not isinstance(ziel, bool) or not ids:
+        return jsonify({"success": False, "message": "Bitte Buchungen und Ziel-Status angeben."}), 400
+    if len(ids) > _STORNO_MAX_BUCHUNGEN:
+        return jsonify({
+            "success": False,
+            "message": f"Höchstens {_STORNO_MAX_BUCHUNGEN} Buchungen auf einmal.",
+        }), 400
+
+    jetzt = datetime.now()
+    geaendert = db.session.execute(
+        update(Buchung)
+        .where(Buchung.id.in_(ids), Buchung.storno != ziel)
+        .values(storno=ziel, storno_updated_at=jetzt)
+        .returning(
+            Buchung.id, Buchung.mitglied_id, Buchung.artikel_id, Buchung.abrechnungs_id,
+            Buchung.menge, Buchung.gesamtpreis, Buchung.zeitstempel,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    betraege = defaultdict(int)
+    for b in geaendert:
+        betraege[b.mitglied_id] += -b.gesamtpreis if ziel else b.gesamtpreis
+    guthaben_aendern_alle(betraege)
+    konsum_erfassen(geaendert, -1 if ziel else 1)
+    storno_erfassen(geaendert, -1 if ziel else 1)
+
+    # Jede betroffene Abrechnung ist älter als dieser Storno und damit verändert
+    abrechnungs_ids = {b.abrechnungs_id for b in geaendert if b.abrechnungs_id is not None}
+    abrechnungen = db.session.execute(
+        select(Abrechnung.id, Abrechnung.name)
+        .where(Abrechnung.id.in_(abrechnungs_ids), Abrechnung.zeitstempel < jetzt)
+        .order_by(Abrechnung.id)
+    ).all() if abrechnungs_ids else []
+
+    db.session.commit()
+
+    return jsonify({
+        "success": True,
+        "storniert": ziel,
+        "ids": [b.id for b in geaendert],
+        "abrechnungen": [{"id": a.id, "name": a.name} for a in abrechnungen],
+        "message": (
+            "Folgende Abrechnungen haben sich aufgrund des Stornos geändert: "
+            + ", ".join(f'{a.id} "{a.name}"' for a in abrechnungen)
+        ) if abrechnungen else None,
+    })
+
+
+_EXPORT_SPALTEN = (
+    "Datum", "Mitglied", "Artikel", "Beschreibung", "Menge",
+    "Preis/Einheit (€)", "Gesamtpreis (€)", "Storniert",
+)
+
+
 @buchungen_bp.route("/download")
 @login_required
 def download():
-    """Exportiert alle Buchungen im gewählten Zeitraum als Excel."""
+    """
+    Exportiert alle Buchungen im gewählten Zeitraum (und Filter) als Excel oder CSV (``?format=csv``).
+
+    Gelesen wird spaltenweise mit serverseitigem Cursor (``yield_per``), geschrieben
+    zeilenweise – auch ein ganzes Jahr braucht so nur konstanten Speicher.
+    """
     start_date, end_date = parse_daterange()
+    bedingungen = _bedingungen(
+        start_date, end_date,
+        request.args.get("mitglied_id", type=int),
+        request.args.get("artikel_id", type=int),
+    )
 
     # FIX: outerjoin statt join – Buchungen ohne Artikel (Aufbuchungen) werden mitexportiert
-    buchungen = (
-        Buchung.query.join(Buchung.mitglied_obj)
-        .outerjoin(Buchung.artikel_obj)
-        .filter(Buchung.zeitstempel.between(start_date, end_date))
-        .order_by(desc(Buchung.zeitstempel))
-        .all()
+    stmt = (
+        select(
+            Buchung.zeitstempel,
+            Mitglied.name,
+            Artikel.name,
+            Buchung.beschreibung,
+            Buchung.menge,
+            Buchung.preis_pro_einheit,
+            Buchung.gesamtpreis,
+            Buchung.storno,
+        )
+        .join(Mitglied, Mitglied.id == Buchung.mitglied_id)
+        .outerjoin(Artikel, Artikel.id == Buchung.artikel_id)
+        .where(*bedingungen)
+        .order_by(desc(Buchung.zeitstempel), desc(Buchung.id))
+        .execution_options(yield_per=1000)
     )
 
-    data = [
-        {
-            "Datum": b.zeitstempel.strftime("%Y-%m-%d %H:%M"),
-            "Mitglied": b.mitglied_obj.name,
-            "Artikel": b.artikel_obj.name if b.artikel_obj else "",
-            "Beschreibung": b.beschreibung or "",
-            "Menge": b.menge,
-            "Preis/Einheit (€)": round(b.preis_pro_einheit / 100, 2),
-            "Gesamtpreis (€)": round(b.gesamtpreis / 100, 2),
-            "Storniert": "Ja" if b.storno else "Nein",
-        }
-        for b in buchungen
-    ]
-
-    df = pd.DataFrame(data)
-    filename = f"buchungen_{start_date}_{end_date}.xlsx"
-    return export_df_to_excel(df, filename)
+    als_csv = request.args.get("format") == "csv"
+
+    def zeilen():
+        for zeit, mitglied, artikel, beschreibung, menge, preis, gesamt, storno in db.session.execute(stmt):
+            if als_csv:
+                preis = f"{preis / 100:.2f}".replace(".", ",")
+                gesamt = f"{gesamt / 100:.2f}".replace(".", ",")
+            else:
+                preis, gesamt = round(preis / 100, 2), round(gesamt / 100, 2)
+            yield (
+                zeit.strftime("%Y-%m-%d %H:%M"),
+                mitglied,
+                artikel or "",
+                beschreibung or "",
+                menge,
+                preis,
+                gesamt,
+                "Ja" if storno else "Nein",
+            )
+
+    filename = f"buchungen_{start_date:%Y-%m-%d_%H%M}_{end_date:%Y-%m-%d_%H%M}"
+    if als_csv:
+        return export_rows_to_csv(_EXPORT_SPALTEN, zeilen(), f"{filename}.csv")
+    return export_rows_to_excel(_EXPORT_SPALTEN, zeilen(), f"{filename}.xlsx")
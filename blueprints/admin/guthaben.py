@@ -5,7 +5,9 @@ from flask_login import login_required
 import pandas as pd
 
 from models import db, Buchung, Mitglied
-from utils.admin import calc_blacklist, export_df_to_excel
+from utils.admin import export_df_to_excel
+from utils.buchung import guthaben_aendern
+from utils.hotlist import konsum_erfassen
 from datetime import datetime
 
 guthaben_bp = Blueprint("guthaben", __name__, url_prefix="/guthaben")
@@ -66,13 +68,9 @@ def guthaben_import():
             betrag = int(round(float(row[aufbuchung_col]) * 100, 0))
             beschreibung = str(row[beschreibung_col]) if has_beschreibung and row[beschreibung_col] is not None else None
 
-            mitglied = Mitglied.query.get(mitglied_id)
-            if mitglied:
-                mitglied.blacklist = calc_blacklist(mitglied, betrag)
-                mitglied.guthaben += betrag
-
+            if guthaben_aendern(mitglied_id, betrag) is not None:
                 buchung = Buchung(
-                    mitglied_id=mitglied.id,
+                    mitglied_id=mitglied_id,
                     artikel_id=None,
                     menge=1,
                     preis_pro_einheit=betrag,
@@ -82,6 +80,7 @@ def guthaben_import():
                     storno=False,
                 )
                 db.session.add(buchung)
+                konsum_erfassen([buchung])
                 count += 1
         except Exception as e:
             print("Fehler bei Zeile:", e)
@@ -108,8 +107,7 @@ def aufbuchung(mitglied_id):
     try:
         betrag_cent = int(round(float(betrag) * 100, 0))
 
-        mitglied.blacklist = calc_blacklist(mitglied, betrag_cent)
-        mitglied.guthaben += betrag_cent
+        guthaben_aendern(mitglied.id, betrag_cent)
 
         buchung = Buchung(
             mitglied_id=mitglied.id,
@@ -121,7 +119,7 @@ def aufbuchung(mitglied_id):
             zeitstempel=datetime.now(),
         )
         db.session.add(buchung)
-        db.session.add(mitglied)
+        konsum_erfassen([buchung])
         db.session.commit()
 
         flash(f"Guthaben von {mitglied.name} wurde geändert.", "success")
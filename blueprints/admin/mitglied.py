@@ -10,6 +10,7 @@ from flask_login import login_required
 
 from models import db, Mitglied
 from utils.admin import handle_excel_import
+from utils import suchindex
 
 mitglied_bp = Blueprint(
     "mitglied",
@@ -55,6 +56,7 @@ def toggle(id):
     m.aktiv = not m.aktiv
 
     db.session.commit()
+    suchindex.invalidieren()
 
     return jsonify({
         "success": True,
@@ -134,6 +136,7 @@ def update(id):
         m.schwaerzungs_grenze = None
 
     db.session.commit()
+    suchindex.invalidieren()
 
     return jsonify({
         "success": True
@@ -179,6 +182,7 @@ def create():
     db.session.add(m)
 
     db.session.commit()
+    suchindex.invalidieren()
 
     return jsonify({
         "success": True,
@@ -192,9 +196,11 @@ def create():
 @login_required
 def bulk_import():
 
-    return handle_excel_import(
+    response = handle_excel_import(
         db_fields=DB_FIELDS,
         model=Mitglied,
         redirect_url=url_for("admin.mitglied.index"),
         unique_field="id",
     )
+    suchindex.invalidieren()
+    return response
@@ -1,131 +1,24 @@
-import os
-
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, session
-from sqlalchemy import or_, func, text, desc
-from models import db, Mitglied, Artikel, Buchung
+from sqlalchemy import or_, func, select, text, desc
+from models import db, Abrechnung, Mitglied, Artikel, Buchung
 from datetime import datetime, timedelta
-from utils.admin import calc_blacklist, suche_mitglied
+from utils.buchung import guthaben_aendern, guthaben_aendern_alle
+from utils.hotlist import hotlist, konsum_erfassen, stand
+from utils import suchindex
+from utils.katalog import aktive_artikel, artikel_aufloesen
+from utils import gruppencommit, idempotenz, schwaerzung
 
 bar_bp = Blueprint("bar", __name__)
 
 
-def hotlist(limit: int = None):
-    from flask import current_app
-    hotlist_days = current_app.config.get("HOTLIST_DAYS", 14)
-    since = datetime.now() - timedelta(days=hotlist_days)
-
-    # Bucket 1: pinned, sorted A→Z — always included
-    pinned = (
-        Mitglied.query
-        .filter(Mitglied.aktiv == True, Mitglied.gepinnt == True)
-        .order_by(Mitglied.name)
-        .all()
-    )
-    pinned_ids = {m.id for m in pinned}
-
-    remaining = (limit - len(pinned)) if limit is not None else None
-    if remaining is not None and remaining <= 0:
-        return pinned
-
-    # Bucket 2: most consumed last HOTLIST_DAYS days, sorted by sum desc then alph
-    recent_filters = [
-        Mitglied.aktiv == True,
-        Mitglied.gepinnt == False,
-        Buchung.zeitstempel >= since,
-        Buchung.storno == False,
-        Buchung.gesamtpreis < 0,
-    ]
-    if pinned_ids:
-        recent_filters.append(~Mitglied.id.in_(pinned_ids))
-
-    recent_q = (
-        db.session.query(Mitglied)
-        .join(Buchung, Buchung.mitglied_id == Mitglied.id)
-        .filter(*recent_filters)
-        .group_by(Mitglied.id)
-        .order_by(func.sum(Buchung.gesamtpreis).asc(), Mitglied.name)
-    )
-    if remaining is not None:
-        recent_q = recent_q.limit(remaining)
-    recent = recent_q.all()
-    recent_ids = {m.id for m in recent}
-
-    if remaining is not None:
-        remaining -= len(recent)
-        if remaining <= 0:
-            return pinned + recent
-
-    # Bucket 3: most consumed all-time, sorted by sum desc then alph
-    exclude_b3 = pinned_ids | recent_ids
-    alltime_filters = [
-        Mitglied.aktiv == True,
-        Mitglied.gepinnt == False,
-        Buchung.storno == False,
-        Buchung.gesamtpreis < 0,
-    ]
-    if exclude_b3:
-        alltime_filters.append(~Mitglied.id.in_(exclude_b3))
-
-    alltime_q = (
-        db.session.query(Mitglied)
-        .join(Buchung, Buchung.mitglied_id == Mitglied.id)
-        .filter(*alltime_filters)
-        .group_by(Mitglied.id)
-        .order_by(func.sum(Buchung.gesamtpreis).asc(), Mitglied.name)
-    )
-    if remaining is not None:
-        alltime_q = alltime_q.limit(remaining)
-    alltime = alltime_q.all()
-    alltime_ids = {m.id for m in alltime}
-
-    if remaining is not None:
-        remaining -= len(alltime)
-        if remaining <= 0:
-            return pinned + recent + alltime
-
-    # Bucket 4: all remaining active non-pinned, sorted A→Z
-    exclude_b4 = pinned_ids | recent_ids | alltime_ids
-    alpha_filters = [
-        Mitglied.aktiv == True,
-        Mitglied.gepinnt == False,
-    ]
-    if exclude_b4:
-        alpha_filters.append(~Mitglied.id.in_(exclude_b4))
-
-    alpha_q = (
-        Mitglied.query
-        .filter(*alpha_filters)
-        .order_by(Mitglied.name)
-    )
-    if remaining is not None:
-        alpha_q = alpha_q.limit(remaining)
-    alpha = alpha_q.all()
-
-    return pinned + recent + alltime + alpha
-
-
 @bar_bp.route("/", methods=["GET", "POST"])
 def bar_interface():
     """
     Hauptinterface für die Bar.
     Zeigt eine Mitglieder-Suchleiste und nach der Auswahl die Artikel an.
     """
-    # Mitglieder abrufen
-    mitglieder = hotlist()
-
-    return render_template(
-        "bar/bar_interface.html",
-        mitglieder=[
-            {
-                "id": mitglied.id,
-                "name": mitglied.name,
-                "nickname": mitglied.nickname,
-                "guthaben": mitglied.guthaben,
-                "blacklist": mitglied.blacklist,
-            }
-            for mitglied in mitglieder
-        ],
-    )
+    # Die Mitglieder-Kacheln lädt die Seite selbst über /api/members
+    return render_template("bar/bar_interface.html")
 
 
 @bar_bp.route("/api/members", methods=["GET"])
@@ -133,11 +26,24 @@ def get_members_api():
     search_term = request.args.get("search", "")
     limit = request.args.get("limit", type=int)
 
-    if search_term:
-        members = suche_mitglied(search_term, limit=limit)
+    # Unveränderte Liste → 304, ohne Hotlist/Suche zu berechnen
+    etag = stand()
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
     else:
-        members = hotlist(limit=limit)
+        if search_term:
+            members = suchindex.suche(search_term, limit=limit)
+        else:
+            members = hotlist(limit=limit)
+        response = _members_json(members)
+
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 
+def _members_json(members):
     return jsonify(
         {
             "success": True,
@@ -158,6 +64,64 @@ def get_members_api():
     )
 
 
+class _UngueltigeBuchung(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _positionen(artikel_liste) -> list:
+    """Warenkorb-Zeilen → [(artikel_id, menge)]; leere Zeilen werden übersprungen."""
+    positionen = []
+    for item in artikel_liste:
+        artikel_id = item.get("artikel_id")
+        menge = int(item.get("menge", 0))
+        if menge < 0:
+            raise _UngueltigeBuchung("Menge darf nicht negativ sein")
+        if not artikel_id or menge <= 0:
+            continue
+        positionen.append((int(artikel_id), menge))
+    return positionen
+
+
+def _warenkorb(positionen, artikel_map) -> tuple:
+    """Gibt ([(artikel, menge, gesamtpreis)], summe) zurück; Preise sind negativ (Abbuchung)."""
+    eintraege = []
+    for artikel_id, menge in positionen:
+        artikel = artikel_map.get(artikel_id)
+        if not artikel:
+            raise _UngueltigeBuchung(f"Artikel {artikel_id} nicht gefunden.", 404)
+        eintraege.append((artikel, menge, -artikel.preis * menge))
+    if not eintraege:
+        raise _UngueltigeBuchung("Keine gültigen Artikel.")
+    return eintraege, sum(preis for _, _, preis in eintraege)
+
+
+def _wiederholung(antwort: dict):
+    flash(antwort["message"], "success" if antwort.get("success") else "error")
+    return jsonify(antwort)
+
+
+def _zeitstempel(wert, untergrenze=None) -> datetime:
+    """
+    Zeitstempel eines Terminals (ISO, lokal oder mit Zeitzone); nie in der Zukunft.
+
+    Liegt er vor ``untergrenze`` (der letzten Abrechnung), gilt die Buchung als jetzt
+    erfasst – sie darf keinen bereits abgerechneten Zeitraum verändern.
+    """
+    jetzt = datetime.now()
+    try:
+        zeitstempel = datetime.fromisoformat(wert)
+    except (TypeError, ValueError):
+        return jetzt
+    if zeitstempel.tzinfo is not None:
+        zeitstempel = zeitstempel.astimezone().replace(tzinfo=None)
+    if untergrenze is not None and zeitstempel < untergrenze:
+        return jetzt
+    return min(zeitstempel, jetzt)
+
+
 @bar_bp.route("/bar/buchen", methods=["GET", "POST"])
 def buchen():
     if request.method == "GET":
@@ -171,7 +135,7 @@ def buchen():
             flash("Mitglied nicht gefunden!", "error")
             return redirect(url_for("bar.bar_interface"))
 
-        artikel_liste = Artikel.query.where(Artikel.aktiv).order_by(Artikel.reihenfolge, Artikel.name).all()
+        artikel_liste = aktive_artikel()
         buchungen = (
             Buchung.query.filter_by(mitglied_id=mitglied.id)
             .order_by(Buchung.zeitstempel.desc())
@@ -179,12 +143,8 @@ def buchen():
             .all()
         )
 
-        schwaerzung_dir = os.path.join(current_app.static_folder, "schwaerzung")
-        allowed_ext = {".webp", ".png", ".jpg", ".jpeg", ".gif"}
-        images = sorted([
-            f for f in os.listdir(schwaerzung_dir)
-            if os.path.splitext(f)[1].lower() in allowed_ext
-        ])
+        # Bild nur für geschwärzte Mitglieder auswählen; Rotation pro Session
+        images = schwaerzung.bilder() if mitglied.blacklist else ()
         if images:
             idx = session.get("schwaerzung_idx", 0) % len(images)
             session["schwaerzung_idx"] = (idx + 1) % len(images)
@@ -231,6 +191,13 @@ def buchen():
             "message": "Fehlende Daten."
         }), 400
 
+    # Wiederholte Anfrage (z.B. nach Timeout): ursprüngliche Antwort ohne DB-Zugriff
+    schluessel = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    if schluessel:
+        antwort = idempotenz.gespeicherte_antwort(schluessel)
+        if antwort is not None:
+            return _wiederholung(antwort)
+
     mitglied = Mitglied.query.get(mitglied_id)
 
     if not mitglied:
@@ -241,52 +208,39 @@ def buchen():
 
     try:
 
-        gesamte_buchungen = []
-        gesamtpreis = 0
-
         # -------------------------
         # Validierung
         # -------------------------
-        for item in artikel_liste:
-
-            artikel_id = item.get("artikel_id")
-            menge = int(item.get("menge", 0))
-            if menge < 0:
-                return jsonify({
-                    "success": False,
-                    "message": "Menge darf nicht negativ sein"
-                }), 400
-
-            if not artikel_id or menge <= 0:
-                continue
-
-            artikel = Artikel.query.get(artikel_id)
-
-            if not artikel:
-                return jsonify({
-                    "success": False,
-                    "message": f"Artikel {artikel_id} nicht gefunden."
-                }), 404
-
-            preis = artikel.preis * menge
-            gesamtpreis -= preis
-
-            gesamte_buchungen.append({
-                "artikel": artikel,
-                "menge": menge,
-                "gesamtpreis": -1*preis,
-            })
-
-        if len(gesamte_buchungen) == 0:
+        try:
+            positionen = _positionen(artikel_liste)
+            # Alle Artikel auf einmal aus dem Katalog auflösen
+            artikel_map = artikel_aufloesen({artikel_id for artikel_id, _ in positionen})
+            gesamte_buchungen, gesamtpreis = _warenkorb(positionen, artikel_map)
+        except _UngueltigeBuchung as e:
             return jsonify({
                 "success": False,
-                "message": "Keine gültigen Artikel."
-            }), 400
+                "message": e.message
+            }), e.status
+
+        if gruppencommit.aktiv():
+            # Schreib-Thread bucht gesammelt; Antwort kommt nach dessen Commit
+            antwort, status = gruppencommit.buchen(
+                mitglied.id, gesamte_buchungen, gesamtpreis, datetime.now(), schluessel,
+                redirect_url=url_for("bar.bar_interface"),
+            )
+            flash(antwort["message"], "success" if antwort["success"] else "error")
+            return jsonify(antwort), status
+
+        if schluessel:
+            antwort = idempotenz.reservieren(schluessel)
+            if antwort is not None:
+                return _wiederholung(antwort)
 
         # -------------------------
-        # Blacklist / Guthaben
+        # Blacklist / Guthaben (atomar)
         # -------------------------
-        if mitglied.blacklist:
+        if guthaben_aendern(mitglied.id, gesamtpreis, nur_ohne_schwaerzung=True) is None:
+            db.session.rollback()
             message = "Kein Geld 🗿"
             flash(message, "error")
 
@@ -294,46 +248,44 @@ def buchen():
                 "success": False,
                 "message": message
             }), 400
-        else:
-            setattr(mitglied, "blacklist", calc_blacklist(mitglied, gesamtpreis))
-
-        # -------------------------
-        # Guthaben aktualisieren
-        # -------------------------
-        mitglied.guthaben += gesamtpreis
 
         # -------------------------
         # Buchungen anlegen
         # -------------------------
-        for eintrag in gesamte_buchungen:
-
-            artikel = eintrag["artikel"]
-            menge = eintrag["menge"]
+        neue_buchungen = []
+        for artikel, menge, preis in gesamte_buchungen:
 
             neue_buchung = Buchung(
                 mitglied_id=mitglied.id,
                 artikel_id=artikel.id,
                 menge=menge,
                 preis_pro_einheit=artikel.preis,
-                gesamtpreis=eintrag["gesamtpreis"],
+                gesamtpreis=preis,
                 zeitstempel=datetime.now(),
             )
 
             db.session.add(neue_buchung)
-            db.session.add(mitglied)
+            neue_buchungen.append(neue_buchung)
 
-        db.session.commit()
+        konsum_erfassen(neue_buchungen)
 
         betrag = f"{abs(gesamtpreis / 100):.2f}".replace(".", ",")
-        flash(
-            f"Buchung erfolgreich: € {betrag}",
-            "success",
-        )
-
-        return jsonify({
+        antwort = {
             "success": True,
-            "redirect_url": url_for("bar.bar_interface")
-        })
+            "message": f"Buchung erfolgreich: € {betrag}",
+            "redirect_url": url_for("bar.bar_interface"),
+        }
+        if schluessel:
+            idempotenz.speichern(schluessel, antwort)
+
+        db.session.commit()
+
+        if schluessel:
+            idempotenz.merken(schluessel, antwort)
+
+        flash(antwort["message"], "success")
+
+        return jsonify(antwort)
 
     except Exception as e:
         flash(str(e))
@@ -344,3 +296,286 @@ def buchen():
             "success": False,
             "message": "Interner Serverfehler bei der Buchung."
         }), 500
+
+
+_SYNC_MAX_BUCHUNGEN = 1000
+
+
+@bar_bp.route("/bar/buchen/sync", methods=["POST"])
+def buchen_sync():
+    """
+    Übernimmt offline gesammelte Buchungen eines Terminals in einer einzigen Transaktion.
+
+    Erwartet ``{"buchungen": [{idempotency_key, mitglied_id, artikel, zeitstempel}, ...]}``.
+    Die Getränke wurden bereits ausgegeben, daher wird auch bei Schwärzung gebucht;
+    Guthaben und Schwärzung werden pro Mitglied in zeitlicher Reihenfolge fortgeschrieben.
+    Zeitstempel vor der letzten Abrechnung werden auf den Empfangszeitpunkt gesetzt.
+    Antwortet mit einem Ergebnis pro Eintrag, in der Reihenfolge der Anfrage.
+    """
+    eintraege = (request.get_json() or {}).get("buchungen") or []
+    if len(eintraege) > _SYNC_MAX_BUCHUNGEN:
+        return jsonify({
+            "success": False,
+            "message": f"Maximal {_SYNC_MAX_BUCHUNGEN} Buchungen pro Anfrage."
+        }), 413
+
+    ergebnisse = [None] * len(eintraege)
+
+    try:
+        schluessel = [e.get("idempotency_key") for e in eintraege]
+        bekannt = idempotenz.reservieren_alle(k for k in schluessel if k)
+        letzte_abrechnung = db.session.query(func.max(Abrechnung.zeitstempel)).scalar()
+
+        # -------------------------
+        # Validierung
+        # -------------------------
+        kandidaten = []
+        erstes_vorkommen = {}
+        for idx, eintrag in enumerate(eintraege):
+            k = schluessel[idx]
+            if not k:
+                ergebnisse[idx] = {"success": False, "message": "Idempotency-Key fehlt."}
+                continue
+            if k in bekannt:
+                ergebnisse[idx] = bekannt[k]
+                continue
+            if k in erstes_vorkommen:
+                continue  # Duplikat innerhalb der Anfrage, übernimmt unten das erste Ergebnis
+            erstes_vorkommen[k] = idx
+
+            try:
+                mitglied_id = int(eintrag.get("mitglied_id"))
+                positionen = _positionen(eintrag.get("artikel") or [])
+            except (TypeError, ValueError):
+                ergebnisse[idx] = {"success": False, "message": "Fehlende Daten."}
+                continue
+            except _UngueltigeBuchung as e:
+                ergebnisse[idx] = {"success": False, "message": e.message}
+                continue
+            zeitstempel = _zeitstempel(eintrag.get("zeitstempel"), letzte_abrechnung)
+            kandidaten.append((mitglied_id, zeitstempel, idx, positionen))
+
+        artikel_map = artikel_aufloesen({
+            artikel_id for *_, positionen in kandidaten for artikel_id, _ in positionen
+        })
+
+        # -------------------------
+        # Buchen: pro Mitglied chronologisch (Sperren in ID-Reihenfolge)
+        # -------------------------
+        neue_buchungen = []
+        for mitglied_id, zeitstempel, idx, positionen in sorted(kandidaten, key=lambda c: c[:3]):
+            try:
+                warenkorb, gesamtpreis = _warenkorb(positionen, artikel_map)
+            except _UngueltigeBuchung as e:
+                ergebnisse[idx] = {"success": False, "message": e.message}
+                continue
+
+            if guthaben_aendern(mitglied_id, gesamtpreis) is None:
+                ergebnisse[idx] = {"success": False, "message": "Mitglied nicht gefunden."}
+                continue
+
+            for artikel, menge, preis in warenkorb:
+                neue_buchungen.append(Buchung(
+                    mitglied_id=mitglied_id,
+                    artikel_id=artikel.id,
+                    menge=menge,
+                    preis_pro_einheit=artikel.preis,
+                    gesamtpreis=preis,
+                    zeitstempel=zeitstempel,
+                ))
+
+            betrag = f"{abs(gesamtpreis / 100):.2f}".replace(".", ",")
+            ergebnisse[idx] = {"success": True, "message": f"Buchung erfolgreich: € {betrag}"}
+
+        db.session.add_all(neue_buchungen)
+        konsum_erfassen(neue_buchungen)
+
+        neue_antworten = {k: ergebnisse[idx] for k, idx in erstes_vorkommen.items()}
+        idempotenz.speichern_alle(neue_antworten)
+
+        db.session.commit()
+
+        for k, antwort in neue_antworten.items():
+            idempotenz.merken(k, antwort)
+
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Sync der Offline-Buchungen fehlgeschlagen")
+        return jsonify({
+            "success": False,
+            "message": "Interner Serverfehler beim Synchronisieren."
+        }), 500
+
+    for idx, k in enumerate(schluessel):
+        if ergebnisse[idx] is None:
+            ergebnisse[idx] = ergebnisse[erstes_vorkommen[k]]
+
+    return jsonify({"success": True, "ergebnisse": ergebnisse})
+
+
+_RUNDE_MAX_MITGLIEDER = 100
+
+
+@bar_bp.route("/bar/runde", methods=["GET", "POST"])
+def runde():
+    """
+    Runde schmeißen: ein Warenkorb für viele Mitglieder in einer einzigen Transaktion.
+
+    Modi:
+    - ``jeder``: jedes Mitglied aus ``mitglied_ids`` bekommt den Warenkorb und zahlt selbst
+    - ``zahler``: ``zahler_id`` zahlt den Warenkorb einmal pro Mitglied aus ``mitglied_ids``
+
+    Die Runde wird ganz oder gar nicht gebucht; ist ein zahlendes Mitglied geschwärzt
+    oder ein Beteiligter nicht aktiv, wird nichts gebucht. Gesperrt werden nur die
+    zahlenden Mitglieder, die Guthaben ändert ``guthaben_aendern_alle`` in einem UPDATE.
+    """
+    if request.method == "GET":
+        zahler_id = request.args.get("zahler_id", type=int)
+        zahler = Mitglied.query.get(zahler_id) if zahler_id else None
+        return render_template(
+            "bar/runde.html",
+            artikel_liste=aktive_artikel(),
+            zahler=zahler,
+        )
+
+    data = request.get_json() or {}
+    modus = data.get("modus", "jeder")
+
+    try:
+        mitglied_ids = list(dict.fromkeys(int(i) for i in data.get("mitglied_ids") or []))
+        zahler_id = int(data["zahler_id"]) if modus == "zahler" else None
+    except (KeyError, TypeError, ValueError):
+        mitglied_ids = None
+
+    if modus not in ("jeder", "zahler") or not mitglied_ids:
+        return jsonify({
+            "success": False,
+            "message": "Fehlende Daten."
+        }), 400
+
+    if len(mitglied_ids) > _RUNDE_MAX_MITGLIEDER:
+        return jsonify({
+            "success": False,
+            "message": f"Maximal {_RUNDE_MAX_MITGLIEDER} Mitglieder pro Runde."
+        }), 413
+
+    schluessel = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    if schluessel:
+        antwort = idempotenz.gespeicherte_antwort(schluessel)
+        if antwort is not None:
+            return _wiederholung(antwort)
+
+    try:
+        try:
+            positionen = _positionen(data.get("artikel") or [])
+            artikel_map = artikel_aufloesen({artikel_id for artikel_id, _ in positionen})
+            warenkorb, preis_pro_kopf = _warenkorb(positionen, artikel_map)
+        except _UngueltigeBuchung as e:
+            return jsonify({
+                "success": False,
+                "message": e.message
+            }), e.status
+
+        if schluessel:
+            antwort = idempotenz.reservieren(schluessel)
+            if antwort is not None:
+                return _wiederholung(antwort)
+
+        # -------------------------
+        # Alle Beteiligten mit einer Abfrage laden, nur die Zahlenden sperren
+        # -------------------------
+        zahlende = [zahler_id] if modus == "zahler" else mitglied_ids
+        mitglieder = {
+            m.id: m
+            for m in Mitglied.query.filter(Mitglied.id.in_(set(mitglied_ids) | set(zahlende)))
+        }
+
+        if len(mitglieder) < len(set(mitglied_ids) | set(zahlende)):
+            db.session.rollback()
+            return jsonify({
+                "success": False,
+                "message": "Mitglied nicht gefunden."
+            }), 404
+
+        inaktiv = sorted(m.name for m in mitglieder.values() if not m.aktiv)
+        if inaktiv:
+            db.session.rollback()
+            return jsonify({
+                "success": False,
+                "message": f"Mitglied nicht aktiv ({', '.join(inaktiv)})."
+            }), 400
+
+        # Schwärzung unter Zeilensperre prüfen (ID-Reihenfolge, wie guthaben_aendern_alle)
+        geschwaerzt = sorted(
+            mitglieder[row.id].name
+            for row in db.session.execute(
+                select(Mitglied.id, Mitglied.blacklist)
+                .where(Mitglied.id.in_(zahlende))
+                .order_by(Mitglied.id)
+                .with_for_update()
+            )
+            if row.blacklist
+        )
+        if geschwaerzt:
+            db.session.rollback()
+            message = f"Kein Geld 🗿 ({', '.join(geschwaerzt)})"
+            flash(message, "error")
+            return jsonify({
+                "success": False,
+                "message": message
+            }), 400
+
+        # -------------------------
+        # Guthaben fortschreiben und Buchungen gesammelt anlegen
+        # -------------------------
+        faktor = len(mitglied_ids) if modus == "zahler" else 1
+        guthaben_aendern_alle({mitglied_id: preis_pro_kopf * faktor for mitglied_id in zahlende})
+
+        zeitstempel = datetime.now()
+        neue_buchungen = []
+        for mitglied_id in zahlende:
+            for artikel, menge, preis in warenkorb:
+                neue_buchungen.append(Buchung(
+                    mitglied_id=mitglied_id,
+                    artikel_id=artikel.id,
+                    menge=menge * faktor,
+                    preis_pro_einheit=artikel.preis,
+                    gesamtpreis=preis * faktor,
+                    zeitstempel=zeitstempel,
+                ))
+
+        db.session.add_all(neue_buchungen)
+        konsum_erfassen(neue_buchungen)
+
+        betrag = f"{abs(preis_pro_kopf * len(mitglied_ids) / 100):.2f}".replace(".", ",")
+        if modus == "zahler":
+            message = (
+                f"Runde gebucht: € {betrag} für {len(mitglied_ids)} Personen "
+                f"auf {mitglieder[zahler_id].name}"
+            )
+        else:
+            message = f"Runde gebucht: € {betrag} auf {len(mitglied_ids)} Personen"
+        antwort = {
+            "success": True,
+            "message": message,
+            "redirect_url": url_for("bar.bar_interface"),
+        }
+        if schluessel:
+            idempotenz.speichern(schluessel, antwort)
+
+        db.session.commit()
+
+        if schluessel:
+            idempotenz.merken(schluessel, antwort)
+
+        flash(antwort["message"], "success")
+
+        return jsonify(antwort)
+
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Runde fehlgeschlagen")
+        return jsonify({
+            "success": False,
+            "message": "Interner Serverfehler bei der Buchung."
+        }), 500
@@ -1,10 +1,18 @@
+import math
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import NamedTuple
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, session
-from sqlalchemy import func, case
+import numpy as np
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, redirect, url_for, session
+from sqlalchemy import Float, Integer, Numeric, case, cast, func, select
 
 import config as app_config
 from models import db, Artikel, Buchung, Mitglied
+from utils import benachrichtigung, ranking_cache, rollup
+from utils.katalog import artikel_aufloesen
 
 ranking_bp = Blueprint("ranking", __name__, url_prefix="/ranking")
 
@@ -48,94 +56,197 @@ def _get_session_modus():
 _VALID_MODI = ('menge', 'reinalkohol', 'umsatz')
 
 
-@ranking_bp.route("/")
-def index():
-    _check_and_expire_config()
-    stunden     = _get_session_stunden()
-    selected_ids = _get_session_artikel_ids()
-    modus       = _get_session_modus()
-    seit        = datetime.now() - timedelta(hours=stunden)
+class _RankingMitglied(NamedTuple):
+    id: int
+    name: str
+    nickname: str | None
+
+
+def _berechnen(stunden, selected_ids, modus, stand):
+    """
+    Ranking für die gegebene Konfiguration: (artikel_liste, eintraege, seit).
+
+    Das Ergebnis kommt aus dem gemeinsamen Ranking-Cache; der Fensterbeginn wird dafür
+    auf RANKING_CACHE_BUCKET_SEKUNDEN gerundet.
+    """
+    bucket = app_config.RANKING_CACHE_BUCKET_SEKUNDEN
+    jetzt = datetime.fromtimestamp(int(time.time()) // bucket * bucket)
+    seit = jetzt - timedelta(hours=stunden)
+    artikel_ids = tuple(sorted(selected_ids))
+    top = app_config.RANKING_TOP_N or None
+
+    if stand is None:
+        # Listener (noch) nicht verbunden: kein verlässlicher Schlüssel, also nicht cachen
+        artikel_liste, eintraege = _rechnen(seit, artikel_ids, modus, top)
+    else:
+        artikel_liste, eintraege = ranking_cache.holen(
+            (seit, artikel_ids, modus, top, stand),
+            lambda: _rechnen(seit, artikel_ids, modus, top),
+        )
+    return artikel_liste, eintraege, seit
+
 
-    artikel_liste = (
-        Artikel.query
-        .filter(Artikel.id.in_(selected_ids))
-        .order_by(Artikel.reihenfolge)
-        .all()
-    ) if selected_ids else []
+def _rechnen(seit, artikel_ids, modus, top=None):
+    """
+    Aggregiert das Ranking seit ``seit`` in einer Abfrage.
+
+    Gewichtung (Liter, Reinalkohol), Summen pro Mitglied, Sortierung nach ``modus`` und
+    das optionale Top-N passieren in Postgres; Python baut nur noch die Zeilen zusammen.
+    Nur einfache Werte, da das Ergebnis im Cache geteilt wird.
+    """
+    artikel_liste = sorted(
+        artikel_aufloesen(artikel_ids).values(),
+        key=lambda a: (a.reihenfolge is None, a.reihenfolge or 0),
+    )
 
     if not artikel_liste:
-        return render_template(
-            "ranking/index.html",
-            eintraege=[], artikel_liste=[],
-            stunden=stunden, seit=seit, modus=modus,
+        return [], []
+
+    # Pro (Mitglied, Artikel): Stück aus dem stündlichen Rollup, gewichtet wie angezeigt
+    # (Volumen-Artikel → Stück × volumen_liter, Reinalkohol → Stück × reinalkohol_liter × 1000 mL)
+    summen = rollup.summen_seit(seit, [a.id for a in artikel_liste])
+    menge_anzeige = case(
+        (Artikel.typ == 'volumen', summen.c.menge * func.coalesce(Artikel.volumen_liter, 0.5)),
+        else_=summen.c.menge,
+    )
+    pro_artikel = (
+        select(
+            summen.c.mitglied_id,
+            summen.c.artikel_id,
+            summen.c.menge.label("stueck"),
+            func.round(cast(menge_anzeige, Numeric), 3).label("menge"),
+            func.round(cast(
+                summen.c.menge * func.coalesce(Artikel.reinalkohol_liter, 0) * 1000, Numeric
+            ), 1).label("reinalkohol"),
+            summen.c.umsatz,
         )
+        .join(Artikel, Artikel.id == summen.c.artikel_id)
+        .subquery()
+    )
 
-    n = len(artikel_liste)
-    artikel_cols = [
-        func.sum(
-            case((Buchung.artikel_id == a.id, Buchung.menge), else_=0)
-        ).label(f"art_{a.id}")
-        for a in artikel_liste
-    ]
-    gesamt_menge_col  = func.sum(Buchung.menge).label("gesamt_menge")
-    gesamt_umsatz_col = (func.sum(
-        case((Buchung.gesamtpreis < 0, Buchung.gesamtpreis), else_=0)
-    ) * -1).label("gesamt_umsatz")
-
-    rows = (
-        db.session.query(Mitglied, *artikel_cols, gesamt_menge_col, gesamt_umsatz_col)
-        .join(Buchung, Buchung.mitglied_id == Mitglied.id)
-        .filter(
-            Buchung.artikel_id.in_(list(selected_ids)),
-            Buchung.storno == False,
-            Mitglied.aktiv == True,
-            Buchung.zeitstempel >= seit,
+    # Pro Mitglied: Summen, sortiert nach Modus, optional nur die besten ``top``
+    gesamt = (
+        select(
+            pro_artikel.c.mitglied_id,
+            func.sum(pro_artikel.c.menge).label("menge"),
+            func.sum(pro_artikel.c.reinalkohol).label("reinalkohol"),
+            func.sum(pro_artikel.c.umsatz).label("umsatz"),
         )
-        .group_by(Mitglied.id)
-        .all()
+        .join(Mitglied, Mitglied.id == pro_artikel.c.mitglied_id)
+        .where(Mitglied.aktiv == True)
+        .group_by(pro_artikel.c.mitglied_id)
     )
+    sortierung = {
+        'reinalkohol': func.sum(pro_artikel.c.reinalkohol),
+        'umsatz':      func.sum(pro_artikel.c.umsatz),
+    }.get(modus, func.sum(pro_artikel.c.menge))
+    gesamt = gesamt.order_by(sortierung.desc(), pro_artikel.c.mitglied_id)
+    if top:
+        gesamt = gesamt.limit(top)
+    gesamt = gesamt.subquery()
+
+    sortier_spalte = {
+        'reinalkohol': gesamt.c.reinalkohol,
+        'umsatz':      gesamt.c.umsatz,
+    }.get(modus, gesamt.c.menge)
+    rows = db.session.execute(
+        select(
+            Mitglied.id, Mitglied.name, Mitglied.nickname,
+            cast(gesamt.c.menge, Float), cast(gesamt.c.reinalkohol, Float), gesamt.c.umsatz,
+            pro_artikel.c.artikel_id, pro_artikel.c.stueck,
+            cast(pro_artikel.c.menge, Float),
+            cast(pro_artikel.c.reinalkohol, Float),
+        )
+        .select_from(gesamt)
+        .join(Mitglied, Mitglied.id == gesamt.c.mitglied_id)
+        .join(pro_artikel, pro_artikel.c.mitglied_id == gesamt.c.mitglied_id)
+        .order_by(sortier_spalte.desc(), gesamt.c.mitglied_id)
+    ).all()
+
+    # Zeilen kommen nach Mitglied gruppiert in Ranking-Reihenfolge
+    typ = {a.id: a.typ for a in artikel_liste}
+    pro_mitglied = {}
+    for (mitglied_id, name, nickname, gesamt_menge, gesamt_reinalkohol, gesamt_umsatz,
+         artikel_id, stueck, menge, reinalkohol) in rows:
+        eintrag = pro_mitglied.get(mitglied_id)
+        if eintrag is None:
+            eintrag = pro_mitglied[mitglied_id] = {
+                "mitglied":           _RankingMitglied(mitglied_id, name, nickname),
+                "art_stueck":         {a.id: 0 for a in artikel_liste},
+                "art_menge":          {a.id: 0 for a in artikel_liste},
+                "art_reinalkohol":    {a.id: 0 for a in artikel_liste},
+                "gesamt_menge":       gesamt_menge,
+                "gesamt_reinalkohol": gesamt_reinalkohol,
+                # Umsatz aus tatsächlich gebuchten Preisen (Cent)
+                "gesamt_umsatz":      gesamt_umsatz or 0,
+            }
+        eintrag["art_stueck"][artikel_id] = stueck
+        eintrag["art_menge"][artikel_id] = menge if typ[artikel_id] == 'volumen' else stueck
+        eintrag["art_reinalkohol"][artikel_id] = reinalkohol
+
+    return artikel_liste, list(pro_mitglied.values())
+
+
+# Spalten der kompakten JSON-Form (je Mitglied ein Index in jeder Liste)
+_WERT_SPALTEN = ('name', 'nick', 'art_menge', 'menge', 'reinalkohol', 'umsatz')
+
+
+def _spalten(artikel_liste, eintraege) -> dict:
+    """Ranking-Zeilen spaltenweise: {"id": [...], "name": [...], "art_menge": [[...]], ...}."""
+    return {
+        "id":          [e['mitglied'].id for e in eintraege],
+        "name":        [e['mitglied'].name for e in eintraege],
+        "nick":        [e['mitglied'].nickname.split(',')[0] if e['mitglied'].nickname else None
+                        for e in eintraege],
+        "art_menge":   [[e['art_menge'].get(a.id, 0) for a in artikel_liste] for e in eintraege],
+        "menge":       [e['gesamt_menge'] for e in eintraege],
+        "reinalkohol": [e['gesamt_reinalkohol'] for e in eintraege],
+        "umsatz":      [e['gesamt_umsatz'] for e in eintraege],
+    }
+
+
+# Letzte Ergebnisse pro (Konfiguration, Stand) für den Delta-Modus von /api/data
+_SNAPSHOTS_MAX = 64
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def _snapshot_merken(config_key, stand, spalten):
+    zeilen = {
+        mitglied_id: tuple(spalten[k][i] for k in _WERT_SPALTEN)
+        for i, mitglied_id in enumerate(spalten['id'])
+    }
+    if stand is None:
+        return zeilen
+    with _snapshots_lock:
+        _snapshots[(config_key, stand)] = zeilen
+        _snapshots.move_to_end((config_key, stand))
+        while len(_snapshots) > _SNAPSHOTS_MAX:
+            _snapshots.popitem(last=False)
+    return zeilen
+
+
+def _snapshot(config_key, stand):
+    with _snapshots_lock:
+        return _snapshots.get((config_key, stand))
+
+
+def _config_key(stunden, artikel_liste):
+    return stunden, tuple(sorted(a.id for a in artikel_liste))
 
-    eintraege = []
-    for row in rows:
-        mitglied   = row[0]
-        art_stueck    = {a.id: row[i + 1] for i, a in enumerate(artikel_liste)}
-
-        # Menge-Anzeige: Stück-Artikel → Stückzahl, Volumen-Artikel → Stückzahl × volumen_liter
-        art_menge = {}
-        for a in artikel_liste:
-            cnt = art_stueck.get(a.id, 0)
-            if a.typ == 'volumen':
-                art_menge[a.id] = round(cnt * (a.volumen_liter or 0.5), 3)
-            else:
-                art_menge[a.id] = cnt
-        gesamt_menge = round(sum(art_menge.values()), 3)
-
-        # Reinalkohol: Stückzahl × reinalkohol_liter × 1000 (mL)
-        art_reinalkohol = {
-            a.id: round(art_stueck.get(a.id, 0) * (a.reinalkohol_liter or 0) * 1000, 1)
-            for a in artikel_liste
-        }
-        gesamt_reinalkohol = round(sum(art_reinalkohol.values()), 1)
-
-        # Umsatz aus tatsächlich gebuchten Preisen (Cent)
-        gesamt_umsatz = row[n + 2] or 0
-
-        eintraege.append({
-            "mitglied":           mitglied,
-            "art_stueck":         art_stueck,
-            "art_menge":          art_menge,
-            "art_reinalkohol":    art_reinalkohol,
-            "gesamt_menge":       gesamt_menge,
-            "gesamt_reinalkohol": gesamt_reinalkohol,
-            "gesamt_umsatz":      gesamt_umsatz,
-        })
-
-    if modus == 'reinalkohol':
-        eintraege.sort(key=lambda e: e['gesamt_reinalkohol'], reverse=True)
-    elif modus == 'umsatz':
-        eintraege.sort(key=lambda e: e['gesamt_umsatz'], reverse=True)
-    else:
-        eintraege.sort(key=lambda e: e['gesamt_menge'], reverse=True)
+
+@ranking_bp.route("/")
+def index():
+    _check_and_expire_config()
+    stunden      = _get_session_stunden()
+    selected_ids = _get_session_artikel_ids()
+    modus        = _get_session_modus()
+    # vor der Berechnung lesen: eine Buchung währenddessen löst sonst kein Update aus
+    stand        = benachrichtigung.stand()
+
+    artikel_liste, eintraege, seit = _berechnen(stunden, selected_ids, modus, stand)
+    spalten = _spalten(artikel_liste, eintraege)
+    _snapshot_merken(_config_key(stunden, artikel_liste), stand, spalten)
 
     return render_template(
         "ranking/index.html",
@@ -144,9 +255,169 @@ def index():
         stunden=stunden,
         seit=seit,
         modus=modus,
+        stand=stand,
+        spalten=spalten,
     )
 
 
+@ranking_bp.route("/api/data")
+def api_data():
+    """
+    Ranking als kompaktes, spaltenweises JSON.
+
+    Mit ``seit_v=<stand>`` (Delta-Modus) enthält ``mitglieder`` nur Mitglieder, deren Werte
+    sich seit diesem Stand geändert haben, und ``entfernt`` die IDs, die herausgefallen sind.
+    Ist der Basis-Stand in diesem Prozess nicht (mehr) bekannt, kommt die volle Liste
+    (``voll: true``).
+    """
+    _check_and_expire_config()
+    stunden      = _get_session_stunden()
+    selected_ids = _get_session_artikel_ids()
+    modus        = _get_session_modus()
+    stand        = benachrichtigung.stand()
+
+    artikel_liste, eintraege, seit = _berechnen(stunden, selected_ids, modus, stand)
+    spalten = _spalten(artikel_liste, eintraege)
+    config_key = _config_key(stunden, artikel_liste)
+    zeilen = _snapshot_merken(config_key, stand, spalten)
+
+    antwort = {
+        "v":       stand,
+        "modus":   modus,
+        "seit":    seit.isoformat(timespec="minutes"),
+        "artikel": {
+            "id":   [a.id for a in artikel_liste],
+            "name": [a.name for a in artikel_liste],
+        },
+    }
+
+    basis_stand = request.args.get("seit_v")
+    basis = _snapshot(config_key, basis_stand) if basis_stand is not None else None
+    if basis is None:
+        return jsonify({**antwort, "voll": True, "mitglieder": spalten, "entfernt": []})
+
+    geaendert = [i for i, mitglied_id in enumerate(spalten['id']) if basis.get(mitglied_id) != zeilen[mitglied_id]]
+    return jsonify({
+        **antwort,
+        "voll": False,
+        "mitglieder": {k: [v[i] for i in geaendert] for k, v in spalten.items()},
+        "entfernt": [mitglied_id for mitglied_id in basis if mitglied_id not in zeilen],
+    })
+
+
+_RACE_BUCKET_MINUTEN = (5, 10, 15, 30, 60)
+
+
+def _race(stunden, artikel_ids, modus, bucket_minuten):
+    """
+    Kumulierter Verlauf pro Mitglied über das Fenster, in Buckets zu ``bucket_minuten``.
+
+    Eine Aggregation in Postgres liefert (Mitglied, Bucket, Wert); Lücken auffüllen und
+    kumulieren passiert in einem NumPy-Durchgang.
+
+    Returns:
+        (seit, zeiten, mitglieder [(id, name, nickname)], werte [[kumuliert pro Bucket]])
+    """
+    bucket_sekunden = bucket_minuten * 60
+    jetzt = datetime.now()
+    seit = jetzt - timedelta(hours=stunden)
+    anzahl = math.ceil(stunden * 3600 / bucket_sekunden)
+
+    wert = {
+        'reinalkohol': Buchung.menge * func.coalesce(Artikel.reinalkohol_liter, 0) * 1000,
+        'umsatz':      case((Buchung.gesamtpreis < 0, -Buchung.gesamtpreis), else_=0) / 100.0,
+    }.get(modus, case(
+        (Artikel.typ == 'volumen', Buchung.menge * func.coalesce(Artikel.volumen_liter, 0.5)),
+        else_=Buchung.menge,
+    ))
+    bucket = cast(
+        func.floor(func.extract("epoch", Buchung.zeitstempel - seit) / bucket_sekunden), Integer
+    )
+
+    rows = db.session.execute(
+        select(Buchung.mitglied_id, bucket, cast(func.sum(wert), Float))
+        .join(Artikel, Artikel.id == Buchung.artikel_id)
+        .join(Mitglied, Mitglied.id == Buchung.mitglied_id)
+        .where(
+            Buchung.zeitstempel >= seit,
+            Buchung.storno == False,
+            Buchung.artikel_id.in_(artikel_ids),
+            Mitglied.aktiv == True,
+        )
+        .group_by(Buchung.mitglied_id, bucket)
+    ).all()
+
+    zeiten = [
+        (seit + timedelta(seconds=bucket_sekunden * (i + 1))).isoformat(timespec="minutes")
+        for i in range(anzahl)
+    ]
+    if not rows:
+        return seit, zeiten, [], []
+
+    mitglied_ids, buckets, betraege = zip(*rows)
+    ids = sorted(set(mitglied_ids))
+    position = {mitglied_id: i for i, mitglied_id in enumerate(ids)}
+
+    matrix = np.zeros((len(ids), anzahl))
+    np.add.at(
+        matrix,
+        (
+            np.fromiter((position[m] for m in mitglied_ids), dtype=int, count=len(rows)),
+            np.clip(np.array(buckets, dtype=int), 0, anzahl - 1),
+        ),
+        np.array(betraege, dtype=float),
+    )
+    werte = np.cumsum(matrix, axis=1).round(2)
+
+    namen = dict(
+        (m.id, m) for m in db.session.execute(
+            select(Mitglied.id, Mitglied.name, Mitglied.nickname).where(Mitglied.id.in_(ids))
+        )
+    )
+    mitglieder = [(i, namen[i].name, namen[i].nickname) for i in ids]
+    return seit, zeiten, mitglieder, werte.tolist()
+
+
+@ranking_bp.route("/race")
+def race():
+    _check_and_expire_config()
+    bucket = request.args.get("bucket", 15, type=int)
+    if bucket not in _RACE_BUCKET_MINUTEN:
+        bucket = 15
+    return render_template(
+        "ranking/race.html",
+        stunden=_get_session_stunden(),
+        modus=_get_session_modus(),
+        bucket=bucket,
+        bucket_optionen=_RACE_BUCKET_MINUTEN,
+    )
+
+
+@ranking_bp.route("/api/race")
+def api_race():
+    """Race-Daten spaltenweise: Zeitachse, Mitglieder und kumulierte Werte pro Bucket."""
+    _check_and_expire_config()
+    stunden      = _get_session_stunden()
+    selected_ids = _get_session_artikel_ids()
+    modus        = _get_session_modus()
+    bucket = request.args.get("bucket", 15, type=int)
+    if bucket not in _RACE_BUCKET_MINUTEN:
+        bucket = 15
+
+    seit, zeiten, mitglieder, werte = _race(stunden, list(selected_ids), modus, bucket)
+    return jsonify({
+        "modus":  modus,
+        "seit":   seit.isoformat(timespec="minutes"),
+        "zeiten": zeiten,
+        "mitglieder": {
+            "id":   [m[0] for m in mitglieder],
+            "name": [m[1] for m in mitglieder],
+            "nick": [m[2].split(',')[0] if m[2] else None for m in mitglieder],
+        },
+        "werte": werte,
+    })
+
+
 @ranking_bp.route("/config", methods=["GET"])
 def config():
     _check_and_expire_config()
@@ -220,11 +491,46 @@ def alle_abwaehlen():
 
 @ranking_bp.route("/api/version")
 def api_version():
-    """Lightweight fingerprint of current booking state for polling."""
-    max_id      = db.session.query(func.max(Buchung.id)).scalar() or 0
-    max_storno  = db.session.query(func.max(Buchung.storno_updated_at)).scalar()
-    fingerprint = f"{max_id}_{max_storno.isoformat() if max_storno else 'none'}"
-    return jsonify({"v": fingerprint})
+    """Lightweight fingerprint of current booking state (fallback for clients without SSE)."""
+    return jsonify({"v": benachrichtigung.stand()})
+
+
+@ranking_bp.route("/api/cache")
+def api_cache():
+    """Treffer-/Fehlschlag-Zähler des gemeinsamen Ranking-Caches (dieses Prozesses)."""
+    return jsonify(ranking_cache.statistik())
+
+
+_SSE_HEARTBEAT_SEKUNDEN = 15
+
+
+@ranking_bp.route("/api/events")
+def api_events():
+    """
+    Server-Sent Events: meldet jeden neuen Buchungsstand, sobald die Buchung committed ist.
+
+    ``v`` (bzw. ``Last-Event-ID`` beim automatischen Reconnect) ist der zuletzt bekannte Stand;
+    ist der aktuelle Stand ein anderer, wird er sofort gemeldet.
+    """
+    benachrichtigung.starten(current_app._get_current_object())
+    bekannt = request.headers.get("Last-Event-ID") or request.args.get("v")
+
+    def stream():
+        stand = bekannt
+        yield "retry: 3000\n\n"
+        while True:
+            neu = benachrichtigung.warten(stand, _SSE_HEARTBEAT_SEKUNDEN)
+            if neu is not None and neu != stand:
+                stand = neu
+                yield f"id: {neu}\ndata: {neu}\n\n"
+            else:
+                yield ": ping\n\n"
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @ranking_bp.route("/config/reset", methods=["POST"])
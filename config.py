@@ -31,14 +31,41 @@ MINDEST_GUTHABEN = int(100*float(_guthaben)) if _guthaben else None
 
 
 SCHWAERZUNGS_TEXT = os.environ.get("SCHWAERZUNGS_TEXT", "Du bist geschwärzt!")
+# Wie oft (höchstens) static/schwaerzung auf neue Bilder geprüft wird
+SCHWAERZUNG_PRUEF_SEKUNDEN = int(os.environ.get("SCHWAERZUNG_PRUEF_SEKUNDEN", 10))
 
 # Ranking
 RANKING_DEFAULT_STUNDEN = int(os.environ.get("RANKING_DEFAULT_STUNDEN", 24))
 RANKING_CONFIG_TTL_STUNDEN = int(os.environ.get("RANKING_CONFIG_TTL_STUNDEN", 12))
+# Gemeinsamer Ranking-Cache: Anzahl Ergebnisse und Raster, auf das das Fenster gerundet wird
+RANKING_CACHE_GROESSE = int(os.environ.get("RANKING_CACHE_GROESSE", 32))
+RANKING_CACHE_BUCKET_SEKUNDEN = int(os.environ.get("RANKING_CACHE_BUCKET_SEKUNDEN", 30))
+# Nur die besten N Mitglieder im Ranking anzeigen (0 = alle); begrenzt auch, was pro
+# Aktualisierung gerechnet, gecacht und ausgeliefert wird
+RANKING_TOP_N = int(os.environ.get("RANKING_TOP_N", 50))
 
 # Hotlist
 HOTLIST_DAYS = int(os.environ.get("HOTLIST_DAYS", 14))
 
+# Mitgliedersuche (In-Process-Index der Bar-Terminals)
+MITGLIED_INDEX_TTL_SEKUNDEN = int(os.environ.get("MITGLIED_INDEX_TTL_SEKUNDEN", 300))
+
+# Idempotency-Keys für /bar/buchen (wie lange Wiederholungen erkannt werden)
+IDEMPOTENZ_TTL_STUNDEN = int(os.environ.get("IDEMPOTENZ_TTL_STUNDEN", 24))
+
+# Gruppen-Commit für /bar/buchen (optional): Buchungen mehrerer Terminals werden
+# von einem Schreib-Thread gesammelt und alle BUCHUNG_GRUPPENCOMMIT_MS gemeinsam committed
+BUCHUNG_GRUPPENCOMMIT = os.environ.get("BUCHUNG_GRUPPENCOMMIT", "0").lower() in ["1", "true"]
+BUCHUNG_GRUPPENCOMMIT_MS = int(os.environ.get("BUCHUNG_GRUPPENCOMMIT_MS", 5))
+
+# Partitionierung von buchung (nur nach `flask buchung-partitionieren`):
+# so viele Monatspartitionen legt der tägliche Job im Voraus an
+BUCHUNG_PARTITIONEN_VORAUS = int(os.environ.get("BUCHUNG_PARTITIONEN_VORAUS", 3))
+
+# Kaltes Archiv: Buchungen von Abrechnungen, die älter als so viele Monate sind,
+# werden mit `flask buchungen-archivieren` (oder in der Bericht-Verwaltung) archiviert
+ARCHIV_MONATE = int(os.environ.get("ARCHIV_MONATE", 24))
+
 # Aussendungen specials
 BREVO_SECRET = os.environ.get("BREVO_SECRET")
 BREVO_SENDER_MAIL = os.environ.get("BREVO_SENDER_MAIL")
@@ -0,0 +1,46 @@
+"""add indexes for the hot buchung predicates
+
+Revision ID: a2b3c4d5e6f7
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'a2b3c4d5e6f7'
+down_revision = 'f1a2b3c4d5e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Buchungen eines Mitglieds im Zeitraum: Buchungsseite (letzte 5), Brevo-Verbrauch
+    op.create_index('ix_buchung_mitglied_zeitstempel', 'buchung', ['mitglied_id', 'zeitstempel'])
+    # Nicht stornierte Artikelbuchungen im Zeitraum: Ranking (angebrochene Stunde), Race
+    op.create_index(
+        'ix_buchung_zeitstempel_aktiv', 'buchung', ['zeitstempel', 'artikel_id'],
+        postgresql_where=sa.text('storno = false'),
+    )
+    # Große Zeiträume (Historie, Export, Abrechnung): BRIN ist winzig, da Buchungen
+    # in zeitlicher Reihenfolge eingefügt werden
+    op.create_index(
+        'ix_buchung_zeitstempel_brin', 'buchung', ['zeitstempel'],
+        postgresql_using='brin',
+    )
+    op.create_index('ix_buchung_artikel_zeitstempel', 'buchung', ['artikel_id', 'zeitstempel'])
+    op.create_index('ix_buchung_abrechnungs_id', 'buchung', ['abrechnungs_id'])
+    op.create_index(
+        'ix_buchung_storno_updated_at', 'buchung', ['storno_updated_at'],
+        postgresql_where=sa.text('storno_updated_at IS NOT NULL'),
+    )
+    op.execute("ANALYZE buchung")
+
+
+def downgrade():
+    op.drop_index('ix_buchung_storno_updated_at', table_name='buchung')
+    op.drop_index('ix_buchung_abrechnungs_id', table_name='buchung')
+    op.drop_index('ix_buchung_artikel_zeitstempel', table_name='buchung')
+    op.drop_index('ix_buchung_zeitstempel_brin', table_name='buchung')
+    op.drop_index('ix_buchung_zeitstempel_aktiv', table_name='buchung')
+    op.drop_index('ix_buchung_mitglied_zeitstempel', table_name='buchung')
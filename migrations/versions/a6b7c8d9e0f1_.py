@@ -0,0 +1,52 @@
+"""add konsum_gesamt to mitglied and konsum_tag for hotlist
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'a6b7c8d9e0f1'
+down_revision = 'f5a6b7c8d9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('mitglied', sa.Column('konsum_gesamt', sa.Integer(), nullable=False, server_default='0'))
+    op.create_table(
+        'konsum_tag',
+        sa.Column('mitglied_id', sa.Integer(), sa.ForeignKey('mitglied.id'), nullable=False),
+        sa.Column('tag', sa.Date(), nullable=False),
+        sa.Column('summe', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('mitglied_id', 'tag'),
+    )
+    op.create_index('ix_konsum_tag_tag', 'konsum_tag', ['tag'])
+
+    # Bestandsdaten: Zähler aus den bisherigen Buchungen aufbauen
+    op.execute("""
+        INSERT INTO konsum_tag (mitglied_id, tag, summe)
+        SELECT mitglied_id, zeitstempel::date, -SUM(gesamtpreis)
+        FROM buchung
+        WHERE storno = false AND gesamtpreis < 0
+        GROUP BY mitglied_id, zeitstempel::date
+    """)
+    op.execute("""
+        UPDATE mitglied m
+        SET konsum_gesamt = s.summe
+        FROM (
+            SELECT mitglied_id, -SUM(gesamtpreis) AS summe
+            FROM buchung
+            WHERE storno = false AND gesamtpreis < 0
+            GROUP BY mitglied_id
+        ) s
+        WHERE s.mitglied_id = m.id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_konsum_tag_tag', table_name='konsum_tag')
+    op.drop_table('konsum_tag')
+    op.drop_column('mitglied', 'konsum_gesamt')
@@ -0,0 +1,44 @@
+"""stand counter for artikel (shared catalog version)
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'a8b9c0d1e2f3'
+down_revision = 'f7a8b9c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Jede Änderung an artikel zählt stand('artikel') hoch; alle Worker prüfen diesen Wert,
+    # bevor sie ihren Artikelkatalog (utils/katalog.py) verwenden
+    op.execute("INSERT INTO stand (name, wert) VALUES ('artikel', 0)")
+    op.execute("""
+        CREATE FUNCTION artikel_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'artikel';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER artikel_stand
+        AFTER INSERT OR UPDATE OR DELETE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_erhoehen()
+    """)
+    op.execute("""
+        CREATE TRIGGER artikel_stand_truncate
+        AFTER TRUNCATE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_erhoehen()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER artikel_stand_truncate ON artikel")
+    op.execute("DROP TRIGGER artikel_stand ON artikel")
+    op.execute("DROP FUNCTION artikel_stand_erhoehen()")
+    op.execute("DELETE FROM stand WHERE name = 'artikel'")
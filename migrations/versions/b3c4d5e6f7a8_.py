@@ -0,0 +1,39 @@
+"""keyset indexes for the buchungshistorie
+
+Revision ID: b3c4d5e6f7a8
+Revises: a2b3c4d5e6f7
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'b3c4d5e6f7a8'
+down_revision = 'a2b3c4d5e6f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Historie ohne Filter: Seiten über (zeitstempel, id) als Indexbereich
+    op.create_index('ix_buchung_zeitstempel_id', 'buchung', ['zeitstempel', 'id'])
+    # Deckt alle Zeitbereiche ab, die bisher der BRIN-Index bedient hat; der Planer wählt
+    # ihn ohnehin, und jeder weitere Index kostet bei jedem Buchungs-INSERT
+    op.drop_index('ix_buchung_zeitstempel_brin', table_name='buchung')
+    # Mitglied-/Artikelfilter: id anhängen, damit auch die Sortierung aus dem Index kommt
+    op.drop_index('ix_buchung_mitglied_zeitstempel', table_name='buchung')
+    op.create_index('ix_buchung_mitglied_zeitstempel', 'buchung', ['mitglied_id', 'zeitstempel', 'id'])
+    op.drop_index('ix_buchung_artikel_zeitstempel', table_name='buchung')
+    op.create_index('ix_buchung_artikel_zeitstempel', 'buchung', ['artikel_id', 'zeitstempel', 'id'])
+    op.execute("ANALYZE buchung")
+
+
+def downgrade():
+    op.drop_index('ix_buchung_artikel_zeitstempel', table_name='buchung')
+    op.create_index('ix_buchung_artikel_zeitstempel', 'buchung', ['artikel_id', 'zeitstempel'])
+    op.drop_index('ix_buchung_mitglied_zeitstempel', table_name='buchung')
+    op.create_index('ix_buchung_mitglied_zeitstempel', 'buchung', ['mitglied_id', 'zeitstempel'])
+    op.create_index(
+        'ix_buchung_zeitstempel_brin', 'buchung', ['zeitstempel'],
+        postgresql_using='brin',
+    )
+    op.drop_index('ix_buchung_zeitstempel_id', table_name='buchung')
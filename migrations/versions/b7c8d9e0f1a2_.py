@@ -0,0 +1,32 @@
+"""add generated suchvektor and trigram indexes to mitglied
+
+Revision ID: b7c8d9e0f1a2
+Revises: a6b7c8d9e0f1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'b7c8d9e0f1a2'
+down_revision = 'a6b7c8d9e0f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        ALTER TABLE mitglied
+        ADD COLUMN suchvektor tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', name || ' ' || coalesce(nickname, ''))) STORED
+    """)
+    op.execute("CREATE INDEX ix_mitglied_suchvektor ON mitglied USING gin (suchvektor)")
+    op.execute("CREATE INDEX ix_mitglied_name_trgm ON mitglied USING gin (name gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_mitglied_nickname_trgm ON mitglied USING gin (nickname gin_trgm_ops)")
+
+
+def downgrade():
+    op.drop_index('ix_mitglied_nickname_trgm', table_name='mitglied')
+    op.drop_index('ix_mitglied_name_trgm', table_name='mitglied')
+    op.drop_index('ix_mitglied_suchvektor', table_name='mitglied')
+    op.drop_column('mitglied', 'suchvektor')
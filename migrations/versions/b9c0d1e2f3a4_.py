@@ -0,0 +1,43 @@
+"""buchung_stand: notify only, no shared counter row
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'b9c0d1e2f3a4'
+down_revision = 'a8b9c0d1e2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Die Zählerzeile stand('buchung') wurde von jeder Buchung gesperrt und hat alle Buchungen,
+    # Stornos und Syncs serialisiert. Die Meldung allein genügt: sie wird erst nach dem Commit
+    # zugestellt, den Stand zählt der Listener jedes Prozesses (utils/benachrichtigung.py).
+    op.execute("""
+        CREATE OR REPLACE FUNCTION buchung_stand_melden() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('buchung_stand', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DELETE FROM stand WHERE name = 'buchung'")
+
+
+def downgrade():
+    op.execute("INSERT INTO stand (name, wert) VALUES ('buchung', 0)")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION buchung_stand_melden() RETURNS trigger AS $$
+        DECLARE
+            neu bigint;
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'buchung' RETURNING wert INTO neu;
+            PERFORM pg_notify('buchung_stand', neu::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
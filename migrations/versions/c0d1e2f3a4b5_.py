@@ -0,0 +1,65 @@
+"""mitglied_stand: notify only, no shared counter row
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'c0d1e2f3a4b5'
+down_revision = 'b9c0d1e2f3a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Wie bei buchung: stand('mitglied') wurde in jeder Buchung gesperrt und konnte mit
+    # stand('buchung') verklemmen (bar.buchen und admin/buchungen.toggle in umgekehrter Reihenfolge)
+    op.execute("""
+        CREATE FUNCTION mitglied_stand_melden() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('mitglied_stand', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER mitglied_stand_truncate ON mitglied")
+    op.execute("DROP TRIGGER mitglied_stand ON mitglied")
+    op.execute("DROP FUNCTION mitglied_stand_erhoehen()")
+    op.execute("""
+        CREATE TRIGGER mitglied_stand
+        AFTER INSERT OR UPDATE OR DELETE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_melden()
+    """)
+    op.execute("""
+        CREATE TRIGGER mitglied_stand_truncate
+        AFTER TRUNCATE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_melden()
+    """)
+    op.execute("DELETE FROM stand WHERE name = 'mitglied'")
+
+
+def downgrade():
+    op.execute("INSERT INTO stand (name, wert) VALUES ('mitglied', 0)")
+    op.execute("""
+        CREATE FUNCTION mitglied_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'mitglied';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER mitglied_stand_truncate ON mitglied")
+    op.execute("DROP TRIGGER mitglied_stand ON mitglied")
+    op.execute("DROP FUNCTION mitglied_stand_melden()")
+    op.execute("""
+        CREATE TRIGGER mitglied_stand
+        AFTER INSERT OR UPDATE OR DELETE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_erhoehen()
+    """)
+    op.execute("""
+        CREATE TRIGGER mitglied_stand_truncate
+        AFTER TRUNCATE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_erhoehen()
+    """)
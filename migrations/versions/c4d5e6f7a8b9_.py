@@ -0,0 +1,73 @@
+"""add cold archive for settled buchungen
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = 'c4d5e6f7a8b9'
+down_revision = 'b3c4d5e6f7a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'buchung_archiv',
+        sa.Column('abrechnungs_id', sa.Integer(), sa.ForeignKey('abrechnung.id'), primary_key=True),
+        sa.Column('archiviert_am', sa.DateTime(), nullable=False),
+        sa.Column('anzahl', sa.Integer(), nullable=False),
+        sa.Column('von_datum', sa.DateTime(), nullable=False),
+        sa.Column('bis_datum', sa.DateTime(), nullable=False),
+        sa.Column('summe_eingaenge', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('summe_ausgaenge', sa.Integer(), nullable=False, server_default='0'),
+        # Große JSONB-Werte landen komprimiert im TOAST-Speicher
+        sa.Column('buchungen', postgresql.JSONB(), nullable=False),
+    )
+    op.create_table(
+        'buchung_archiv_summe',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('mitglied_id', sa.Integer(), sa.ForeignKey('mitglied.id'), nullable=False),
+        sa.Column('artikel_id', sa.Integer(), sa.ForeignKey('artikel.id'), nullable=True),
+        sa.Column('anzahl', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('menge', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('summe', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('konsum', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'ux_buchung_archiv_summe', 'buchung_archiv_summe',
+        ['mitglied_id', sa.text('COALESCE(artikel_id, 0)')], unique=True,
+    )
+
+    # Für die Bericht-Verwaltung: Archiv zeilenweise, und aktive + archivierte Buchungen zusammen
+    op.execute("""
+        CREATE VIEW buchung_archiv_zeilen AS
+        SELECT z.id, z.mitglied_id, z.artikel_id, a.abrechnungs_id, z.beschreibung, z.menge,
+               z.preis_pro_einheit, z.gesamtpreis, z.zeitstempel, z.storno, z.storno_updated_at
+        FROM buchung_archiv a,
+             jsonb_to_recordset(a.buchungen) AS z(
+                 id integer, mitglied_id integer, artikel_id integer, beschreibung text,
+                 menge integer, preis_pro_einheit integer, gesamtpreis integer,
+                 zeitstempel timestamp, storno boolean, storno_updated_at timestamp
+             )
+    """)
+    op.execute("""
+        CREATE VIEW buchung_alle AS
+        SELECT id, mitglied_id, artikel_id, abrechnungs_id, beschreibung, menge,
+               preis_pro_einheit, gesamtpreis, zeitstempel, storno, storno_updated_at
+        FROM buchung
+        UNION ALL
+        SELECT * FROM buchung_archiv_zeilen
+    """)
+
+
+def downgrade():
+    op.execute("DROP VIEW buchung_alle")
+    op.execute("DROP VIEW buchung_archiv_zeilen")
+    op.drop_index('ux_buchung_archiv_summe', table_name='buchung_archiv_summe')
+    op.drop_table('buchung_archiv_summe')
+    op.drop_table('buchung_archiv')
@@ -0,0 +1,30 @@
+"""add idempotenz table for booking requests
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'c8d9e0f1a2b3'
+down_revision = 'b7c8d9e0f1a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotenz',
+        sa.Column('schluessel', sa.Text(), nullable=False),
+        sa.Column('zeitstempel', sa.DateTime(), nullable=False),
+        sa.Column('antwort', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('schluessel'),
+    )
+    op.create_index('ix_idempotenz_zeitstempel', 'idempotenz', ['zeitstempel'])
+
+
+def downgrade():
+    op.drop_index('ix_idempotenz_zeitstempel', table_name='idempotenz')
+    op.drop_table('idempotenz')
@@ -0,0 +1,71 @@
+"""artikel_stand: notify only, drop the stand table
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'd1e2f3a4b5c6'
+down_revision = 'c0d1e2f3a4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Den Katalogstand zählt der Listener jedes Prozesses (utils/benachrichtigung.py); eine
+    # Sequenz allein wäre vor dem Commit sichtbar und könnte einen alten Katalog festschreiben
+    op.execute("""
+        CREATE FUNCTION artikel_stand_melden() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('artikel_stand', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER artikel_stand_truncate ON artikel")
+    op.execute("DROP TRIGGER artikel_stand ON artikel")
+    op.execute("DROP FUNCTION artikel_stand_erhoehen()")
+    op.execute("""
+        CREATE TRIGGER artikel_stand
+        AFTER INSERT OR UPDATE OR DELETE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_melden()
+    """)
+    op.execute("""
+        CREATE TRIGGER artikel_stand_truncate
+        AFTER TRUNCATE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_melden()
+    """)
+    op.drop_table('stand')
+
+
+def downgrade():
+    op.create_table(
+        'stand',
+        sa.Column('name', sa.Text(), primary_key=True),
+        sa.Column('wert', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute("INSERT INTO stand (name, wert) VALUES ('artikel', 0)")
+    op.execute("""
+        CREATE FUNCTION artikel_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'artikel';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER artikel_stand_truncate ON artikel")
+    op.execute("DROP TRIGGER artikel_stand ON artikel")
+    op.execute("DROP FUNCTION artikel_stand_melden()")
+    op.execute("""
+        CREATE TRIGGER artikel_stand
+        AFTER INSERT OR UPDATE OR DELETE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_erhoehen()
+    """)
+    op.execute("""
+        CREATE TRIGGER artikel_stand_truncate
+        AFTER TRUNCATE ON artikel
+        FOR EACH STATEMENT EXECUTE FUNCTION artikel_stand_erhoehen()
+    """)
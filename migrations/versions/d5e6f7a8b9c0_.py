@@ -0,0 +1,70 @@
+"""store summary columns on abrechnung
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'd5e6f7a8b9c0'
+down_revision = 'c4d5e6f7a8b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('abrechnung', sa.Column('anzahl', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('abrechnung', sa.Column('summe_eingaenge', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('abrechnung', sa.Column('summe_ausgaenge', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('abrechnung', sa.Column('von_datum', sa.DateTime(), nullable=True))
+    op.add_column('abrechnung', sa.Column('bis_datum', sa.DateTime(), nullable=True))
+    op.add_column('abrechnung', sa.Column('veraendert', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_abrechnung_zeitstempel', 'abrechnung', ['zeitstempel'])
+
+    # Bestandsdaten: aus den Buchungen bzw. aus dem Archiv übernehmen
+    op.execute("""
+        UPDATE abrechnung a
+        SET anzahl          = s.anzahl,
+            summe_eingaenge = s.summe_eingaenge,
+            summe_ausgaenge = s.summe_ausgaenge,
+            von_datum       = s.von_datum,
+            bis_datum       = s.bis_datum,
+            veraendert      = s.veraendert
+        FROM (
+            SELECT b.abrechnungs_id,
+                   count(b.id) AS anzahl,
+                   COALESCE(sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis > 0 AND NOT b.storno), 0)
+                       AS summe_eingaenge,
+                   COALESCE(-sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis < 0 AND NOT b.storno), 0)
+                       AS summe_ausgaenge,
+                   min(b.zeitstempel) AS von_datum,
+                   max(b.zeitstempel) AS bis_datum,
+                   COALESCE(bool_or(b.storno_updated_at > a2.zeitstempel), FALSE) AS veraendert
+            FROM buchung b
+            JOIN abrechnung a2 ON a2.id = b.abrechnungs_id
+            GROUP BY b.abrechnungs_id
+        ) s
+        WHERE a.id = s.abrechnungs_id
+    """)
+    op.execute("""
+        UPDATE abrechnung a
+        SET anzahl          = ba.anzahl,
+            summe_eingaenge = ba.summe_eingaenge,
+            summe_ausgaenge = ba.summe_ausgaenge,
+            von_datum       = ba.von_datum,
+            bis_datum       = ba.bis_datum
+        FROM buchung_archiv ba
+        WHERE ba.abrechnungs_id = a.id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_abrechnung_zeitstempel', table_name='abrechnung')
+    op.drop_column('abrechnung', 'veraendert')
+    op.drop_column('abrechnung', 'bis_datum')
+    op.drop_column('abrechnung', 'von_datum')
+    op.drop_column('abrechnung', 'summe_ausgaenge')
+    op.drop_column('abrechnung', 'summe_eingaenge')
+    op.drop_column('abrechnung', 'anzahl')
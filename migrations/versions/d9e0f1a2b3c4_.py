@@ -0,0 +1,44 @@
+"""add mitglied_stand sequence bumped by a statement trigger on mitglied
+
+Revision ID: d9e0f1a2b3c4
+Revises: c8d9e0f1a2b3
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'd9e0f1a2b3c4'
+down_revision = 'c8d9e0f1a2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Jede Änderung an mitglied (Guthaben, Konsum, Stammdaten, Restore) zählt den Stand hoch;
+    # dient als ETag für /api/members, ohne die Hotlist berechnen zu müssen.
+    op.execute("CREATE SEQUENCE mitglied_stand_seq")
+    op.execute("""
+        CREATE FUNCTION mitglied_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            PERFORM nextval('mitglied_stand_seq');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER mitglied_stand
+        AFTER INSERT OR UPDATE OR DELETE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_erhoehen()
+    """)
+    op.execute("""
+        CREATE TRIGGER mitglied_stand_truncate
+        AFTER TRUNCATE ON mitglied
+        FOR EACH STATEMENT EXECUTE FUNCTION mitglied_stand_erhoehen()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER mitglied_stand_truncate ON mitglied")
+    op.execute("DROP TRIGGER mitglied_stand ON mitglied")
+    op.execute("DROP FUNCTION mitglied_stand_erhoehen()")
+    op.execute("DROP SEQUENCE mitglied_stand_seq")
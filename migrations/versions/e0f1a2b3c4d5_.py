@@ -0,0 +1,42 @@
+"""add konsum_stunde rollup for ranking
+
+Revision ID: e0f1a2b3c4d5
+Revises: d9e0f1a2b3c4
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'e0f1a2b3c4d5'
+down_revision = 'd9e0f1a2b3c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'konsum_stunde',
+        sa.Column('mitglied_id', sa.Integer(), sa.ForeignKey('mitglied.id'), nullable=False),
+        sa.Column('artikel_id', sa.Integer(), sa.ForeignKey('artikel.id'), nullable=False),
+        sa.Column('stunde', sa.DateTime(), nullable=False),
+        sa.Column('menge', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('umsatz', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('mitglied_id', 'artikel_id', 'stunde'),
+    )
+    op.create_index('ix_konsum_stunde_stunde', 'konsum_stunde', ['stunde'])
+
+    # Bestandsdaten: Rollup aus den bisherigen Buchungen aufbauen
+    op.execute("""
+        INSERT INTO konsum_stunde (mitglied_id, artikel_id, stunde, menge, umsatz)
+        SELECT mitglied_id, artikel_id, date_trunc('hour', zeitstempel),
+               SUM(menge), SUM(CASE WHEN gesamtpreis < 0 THEN -gesamtpreis ELSE 0 END)
+        FROM buchung
+        WHERE storno = false AND artikel_id IS NOT NULL
+        GROUP BY mitglied_id, artikel_id, date_trunc('hour', zeitstempel)
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_konsum_stunde_stunde', table_name='konsum_stunde')
+    op.drop_table('konsum_stunde')
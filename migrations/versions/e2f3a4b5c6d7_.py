@@ -0,0 +1,28 @@
+"""add partial index for the active buchungen of a mitglied
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'e2f3a4b5c6d7'
+down_revision = 'd1e2f3a4b5c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Verbrauch eines Mitglieds im Zeitraum (Brevo-Verbrauch) liest nur gültige Buchungen;
+    # ohne storno im Index müsste jede Zeile aus dem Heap nachgeprüft werden
+    op.create_index(
+        'ix_buchung_mitglied_zeitstempel_aktiv', 'buchung', ['mitglied_id', 'zeitstempel'],
+        postgresql_where=sa.text('storno = false'),
+    )
+    op.execute("ANALYZE buchung")
+
+
+def downgrade():
+    op.drop_index('ix_buchung_mitglied_zeitstempel_aktiv', table_name='buchung')
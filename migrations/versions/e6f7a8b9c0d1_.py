@@ -0,0 +1,52 @@
+"""transactional stand counter instead of buchung_stand_seq
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-18
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = 'e6f7a8b9c0d1'
+down_revision = 'd5e6f7a8b9c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sequenzen sind nicht transaktional: nextval() ist vor dem Commit sichtbar. Eine
+    # Zählerzeile wird dagegen erst mit der Buchung sichtbar; das NOTIFY mit demselben
+    # Wert wird ebenfalls erst beim Commit zugestellt.
+    op.create_table(
+        'stand',
+        sa.Column('name', sa.Text(), primary_key=True),
+        sa.Column('wert', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute("INSERT INTO stand (name, wert) SELECT 'buchung', last_value FROM buchung_stand_seq")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION buchung_stand_melden() RETURNS trigger AS $$
+        DECLARE
+            neu bigint;
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'buchung' RETURNING wert INTO neu;
+            PERFORM pg_notify('buchung_stand', neu::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP SEQUENCE buchung_stand_seq")
+
+
+def downgrade():
+    op.execute("CREATE SEQUENCE buchung_stand_seq")
+    op.execute("SELECT setval('buchung_stand_seq', GREATEST(wert, 1)) FROM stand WHERE name = 'buchung'")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION buchung_stand_melden() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('buchung_stand', nextval('buchung_stand_seq')::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.drop_table('stand')
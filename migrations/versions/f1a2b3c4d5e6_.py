@@ -0,0 +1,46 @@
+"""add buchung_stand sequence and NOTIFY trigger on buchung
+
+Revision ID: f1a2b3c4d5e6
+Revises: e0f1a2b3c4d5
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'f1a2b3c4d5e6'
+down_revision = 'e0f1a2b3c4d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Jede neue/stornierte Buchung zählt den Stand hoch und meldet ihn per NOTIFY
+    # (wird erst beim Commit zugestellt); siehe utils/benachrichtigung.py
+    op.execute("CREATE SEQUENCE buchung_stand_seq")
+    op.execute("""
+        CREATE FUNCTION buchung_stand_melden() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('buchung_stand', nextval('buchung_stand_seq')::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER buchung_stand
+        AFTER INSERT OR DELETE
+           OR UPDATE OF storno, menge, gesamtpreis, zeitstempel, mitglied_id, artikel_id
+        ON buchung
+        FOR EACH STATEMENT EXECUTE FUNCTION buchung_stand_melden()
+    """)
+    op.execute("""
+        CREATE TRIGGER buchung_stand_truncate
+        AFTER TRUNCATE ON buchung
+        FOR EACH STATEMENT EXECUTE FUNCTION buchung_stand_melden()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER buchung_stand_truncate ON buchung")
+    op.execute("DROP TRIGGER buchung_stand ON buchung")
+    op.execute("DROP FUNCTION buchung_stand_melden()")
+    op.execute("DROP SEQUENCE buchung_stand_seq")
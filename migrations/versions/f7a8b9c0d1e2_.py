@@ -0,0 +1,41 @@
+"""transactional stand counter instead of mitglied_stand_seq
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = 'f7a8b9c0d1e2'
+down_revision = 'e6f7a8b9c0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Wie bei buchung: der ETag von /api/members darf erst mit dem Commit der Änderung weiterzählen
+    op.execute("INSERT INTO stand (name, wert) SELECT 'mitglied', last_value FROM mitglied_stand_seq")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION mitglied_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            UPDATE stand SET wert = wert + 1 WHERE name = 'mitglied';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP SEQUENCE mitglied_stand_seq")
+
+
+def downgrade():
+    op.execute("CREATE SEQUENCE mitglied_stand_seq")
+    op.execute("SELECT setval('mitglied_stand_seq', GREATEST(wert, 1)) FROM stand WHERE name = 'mitglied'")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION mitglied_stand_erhoehen() RETURNS trigger AS $$
+        BEGIN
+            PERFORM nextval('mitglied_stand_seq');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DELETE FROM stand WHERE name = 'mitglied'")
@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from config import MINDEST_GUTHABEN
@@ -16,7 +18,13 @@ class Mitglied(db.Model):
     blacklist = db.Column(db.Boolean, default=False)
     aktiv = db.Column(db.Boolean, nullable=False, default=True)
     gepinnt = db.Column(db.Boolean, nullable=False, default=False)
+    konsum_gesamt = db.Column(db.Integer, nullable=False, default=0)
     schwaerzungs_grenze = db.Column(db.Integer, nullable=True, default=MINDEST_GUTHABEN)
+    # Von Postgres gepflegt (GIN-indiziert), siehe utils.admin.suche_mitglied
+    suchvektor = deferred(db.Column(
+        TSVECTOR,
+        db.Computed("to_tsvector('simple', name || ' ' || coalesce(nickname, ''))", persisted=True),
+    ))
     buchungen_von_mitglied = db.relationship(
         "Buchung", back_populates="mitglied_obj", lazy=True
     )
@@ -88,6 +96,21 @@ class Buchung(db.Model):
     artikel_obj = db.relationship("Artikel", back_populates="buchungen_von_artikel")
     abrechnung_obj = db.relationship("Abrechnung", back_populates="buchungen")
 
+    # Nach `flask buchung-partitionieren` ist der Primärschlüssel in der DB (id, zeitstempel);
+    # die Indizes hier werden dann auf der partitionierten Tabelle angelegt (utils/partitionen.py)
+    __table_args__ = (
+        db.Index("ix_buchung_mitglied_zeitstempel", "mitglied_id", "zeitstempel", "id"),
+        db.Index("ix_buchung_mitglied_zeitstempel_aktiv", "mitglied_id", "zeitstempel",
+                 postgresql_where=db.text("storno = false")),
+        db.Index("ix_buchung_zeitstempel_aktiv", "zeitstempel", "artikel_id",
+                 postgresql_where=db.text("storno = false")),
+        db.Index("ix_buchung_artikel_zeitstempel", "artikel_id", "zeitstempel", "id"),
+        db.Index("ix_buchung_zeitstempel_id", "zeitstempel", "id"),
+        db.Index("ix_buchung_abrechnungs_id", "abrechnungs_id"),
+        db.Index("ix_buchung_storno_updated_at", "storno_updated_at",
+                 postgresql_where=db.text("storno_updated_at IS NOT NULL")),
+    )
+
     def __repr__(self):
         artikel_name = self.artikel_obj.name if self.artikel_obj is not None else None
         return f"<Buchung {self.id} - {self.beschreibung}: {self.menge}x {artikel_name} für {self.mitglied_obj.name}>"
@@ -96,13 +119,77 @@ class Buchung(db.Model):
 class Abrechnung(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.Text, nullable=False)
-    zeitstempel = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    zeitstempel = db.Column(db.DateTime, default=datetime.now, nullable=False, index=True)
     buchungen = db.relationship("Buchung", back_populates="abrechnung_obj", lazy=True)
 
+    # Kennzahlen für die Übersicht, gepflegt von utils/abrechnung.py
+    anzahl = db.Column(db.Integer, nullable=False, default=0)
+    summe_eingaenge = db.Column(db.Integer, nullable=False, default=0)
+    summe_ausgaenge = db.Column(db.Integer, nullable=False, default=0)
+    von_datum = db.Column(db.DateTime, nullable=True)
+    bis_datum = db.Column(db.DateTime, nullable=True)
+    veraendert = db.Column(db.Boolean, nullable=False, default=False)
+
     def __repr__(self):
         return f"<Abrechnung {self.id} {self.name}>"
 
 
+class KonsumTag(db.Model):
+    """Konsum (Cent, positiv) pro Mitglied und Tag – Grundlage der Hotlist."""
+    mitglied_id = db.Column(db.Integer, db.ForeignKey("mitglied.id"), primary_key=True)
+    tag = db.Column(db.Date, primary_key=True)
+    summe = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index("ix_konsum_tag_tag", "tag"),)
+
+
+class KonsumStunde(db.Model):
+    """Stündlicher Rollup der Artikelbuchungen pro Mitglied – Grundlage des Rankings."""
+    mitglied_id = db.Column(db.Integer, db.ForeignKey("mitglied.id"), primary_key=True)
+    artikel_id = db.Column(db.Integer, db.ForeignKey("artikel.id"), primary_key=True)
+    stunde = db.Column(db.DateTime, primary_key=True)
+    menge = db.Column(db.Integer, nullable=False, default=0)
+    umsatz = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index("ix_konsum_stunde_stunde", "stunde"),)
+
+
+class BuchungArchiv(db.Model):
+    """Archivierte Buchungen einer Abrechnung (``utils/archiv.py``), als ein JSONB-Array pro Abrechnung."""
+    abrechnungs_id = db.Column(db.Integer, db.ForeignKey("abrechnung.id"), primary_key=True)
+    archiviert_am = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    anzahl = db.Column(db.Integer, nullable=False)
+    von_datum = db.Column(db.DateTime, nullable=False)
+    bis_datum = db.Column(db.DateTime, nullable=False)
+    summe_eingaenge = db.Column(db.Integer, nullable=False, default=0)
+    summe_ausgaenge = db.Column(db.Integer, nullable=False, default=0)
+    buchungen = deferred(db.Column(JSONB, nullable=False))
+
+
+class ArchivSumme(db.Model):
+    """Fortgeschriebene Summen der archivierten Buchungen pro Mitglied und Artikel (ohne Stornos)."""
+    __tablename__ = "buchung_archiv_summe"
+
+    id = db.Column(db.Integer, primary_key=True)
+    mitglied_id = db.Column(db.Integer, db.ForeignKey("mitglied.id"), nullable=False)
+    artikel_id = db.Column(db.Integer, db.ForeignKey("artikel.id"), nullable=True)
+    anzahl = db.Column(db.Integer, nullable=False, default=0)
+    menge = db.Column(db.Integer, nullable=False, default=0)
+    summe = db.Column(db.Integer, nullable=False, default=0)
+    konsum = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ux_buchung_archiv_summe", "mitglied_id", db.text("COALESCE(artikel_id, 0)"), unique=True),
+    )
+
+
+class Idempotenz(db.Model):
+    """Bereits verarbeitete Buchungsanfragen (Idempotency-Key → Antwort)."""
+    schluessel = db.Column(db.Text, primary_key=True)
+    zeitstempel = db.Column(db.DateTime, default=datetime.now, nullable=False, index=True)
+    antwort = db.Column(db.JSON, nullable=True)
+
+
 class Bericht(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.Text, nullable=False)
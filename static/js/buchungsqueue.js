@@ -0,0 +1,101 @@
+// Offline-Warteschlange für Buchungen der Bar-Terminals.
+//
+// Ist der Server nicht erreichbar (Netzwerkfehler oder Timeout, z.B. WLAN weg oder
+// Server neu gestartet), wird die Buchung mit Zeitstempel und Idempotency-Key im
+// localStorage abgelegt und später gesammelt an /bar/buchen/sync geschickt. Dank des
+// Keys wird eine Buchung, die der Server doch schon erhalten hat, nicht doppelt verbucht.
+// Antwortet der Server mit einem Fehler (5xx), wird nicht vorgemerkt: die Buchung ist
+// dann nicht erfolgt und soll nicht unbemerkt nachgetragen werden. Der Server setzt
+// Zeitstempel vor der letzten Abrechnung auf den Sync-Zeitpunkt.
+const BuchungsQueue = (function () {
+  const STORAGE_KEY = "buchungsqueue";
+  const SYNC_URL = "/bar/buchen/sync";
+  const BATCH = 200;
+  const INTERVAL_MS = 30000;
+
+  let laeuft = false;
+
+  function laden() {
+    try {
+      return JSON.parse(localStorage.getItem(STORAGE_KEY)) || [];
+    } catch (_) {
+      return [];
+    }
+  }
+
+  function speichern(queue) {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(queue));
+    anzeigen(queue.length);
+  }
+
+  // Lokale Zeit ohne Zeitzone, wie sie auch der Server speichert
+  function lokaleZeit() {
+    const d = new Date();
+    return new Date(d.getTime() - d.getTimezoneOffset() * 60000).toISOString().slice(0, 19);
+  }
+
+  function anzeigen(anzahl) {
+    let badge = document.getElementById("buchungsqueue-badge");
+    if (!anzahl) {
+      if (badge) badge.remove();
+      return;
+    }
+    if (!badge) {
+      badge = document.createElement("div");
+      badge.id = "buchungsqueue-badge";
+      badge.className = "badge bg-warning text-dark position-fixed bottom-0 start-0 m-3 p-2";
+      badge.style.zIndex = "3000";
+      document.body.appendChild(badge);
+    }
+    badge.textContent = `${anzahl} Buchung${anzahl === 1 ? "" : "en"} offline gespeichert`;
+  }
+
+  function hinzufuegen(payload, schluessel) {
+    const queue = laden();
+    queue.push({
+      idempotency_key: schluessel,
+      mitglied_id: payload.mitglied_id,
+      artikel: payload.artikel,
+      zeitstempel: lokaleZeit(),
+    });
+    speichern(queue);
+  }
+
+  async function synchronisieren() {
+    if (laeuft) return;
+    laeuft = true;
+    try {
+      let queue = laden();
+      while (queue.length) {
+        const batch = queue.slice(0, BATCH);
+        const res = await fetch(SYNC_URL, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ buchungen: batch }),
+        });
+        if (!res.ok) return;
+        const data = await res.json();
+        if (!data.success) return;
+
+        // Jeder Eintrag hat ein endgültiges Ergebnis → aus der Queue entfernen
+        const erledigt = new Set(batch.map(b => b.idempotency_key));
+        data.ergebnisse.forEach((e, i) => {
+          if (!e.success) console.warn("Offline-Buchung abgelehnt", batch[i], e.message);
+        });
+        queue = laden().filter(b => !erledigt.has(b.idempotency_key));
+        speichern(queue);
+      }
+    } catch (_) {
+      // weiterhin offline – nächster Versuch im Intervall
+    } finally {
+      laeuft = false;
+    }
+  }
+
+  document.addEventListener("DOMContentLoaded", () => anzeigen(laden().length));
+  window.addEventListener("online", synchronisieren);
+  setInterval(synchronisieren, INTERVAL_MS);
+  synchronisieren();
+
+  return { hinzufuegen, synchronisieren };
+})();
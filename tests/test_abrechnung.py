@@ -0,0 +1,129 @@
+"""Gespeicherte Kennzahlen der Abrechnungen (utils/abrechnung.py)."""
+from datetime import datetime, timedelta
+
+from models import db, Abrechnung, Buchung
+from utils.abrechnung import zusammenfassen
+
+
+def _kennzahlen(abrechnungs_id):
+    db.session.expire_all()
+    a = db.session.get(Abrechnung, abrechnungs_id)
+    return a.anzahl, a.summe_eingaenge, a.summe_ausgaenge, a.von_datum, a.bis_datum, a.veraendert
+
+
+def _neu_berechnet(abrechnungs_id):
+    zusammenfassen(abrechnungs_id)
+    db.session.commit()
+    return _kennzahlen(abrechnungs_id)
+
+
+def _anlegen(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, artikel_id = mitglied_anlegen(guthaben=5000).id, artikel_anlegen().id
+    basis = datetime.now() - timedelta(days=2)
+    buchungen = [
+        Buchung(mitglied_id=mitglied_id, artikel_id=artikel_id if preis < 0 else None, menge=1,
+                preis_pro_einheit=abs(preis), gesamtpreis=preis, zeitstempel=basis + timedelta(hours=i))
+        for i, preis in enumerate((-250, -300, 1000, -250, 2000))
+    ]
+    db.session.add_all(buchungen)
+    db.session.commit()
+    ids = [b.id for b in buchungen]
+
+    # Storno vor dem Anlegen der Abrechnung: nicht "verändert"
+    client.post(f"/admin/buchungen/toggle/{ids[3]}")
+    assert client.post("/admin/abrechnung/create", json={"name": "Monat", "modus": "alle"}).get_json()["anzahl"] == 5
+    return Abrechnung.query.one().id, ids
+
+
+def test_storno_fortschreiben_wie_neu_berechnen(client, mitglied_anlegen, artikel_anlegen):
+    abrechnungs_id, ids = _anlegen(client, mitglied_anlegen, artikel_anlegen)
+    vorher = _kennzahlen(abrechnungs_id)
+    assert vorher[:3] == (5, 3000, 550) and vorher[5] is False
+
+    schritte = [
+        lambda: client.post(f"/admin/buchungen/toggle/{ids[0]}"),  # Ausgang
+        lambda: client.post(f"/admin/buchungen/toggle/{ids[2]}"),  # Eingang
+        lambda: client.post("/admin/buchungen/storno", json={"ids": ids, "storno": False}),
+        lambda: client.post("/admin/buchungen/storno", json={"ids": ids[1:], "storno": True}),
+    ]
+    erwartet = [(5, 3000, 300), (5, 2000, 300), (5, 3000, 800), (5, 0, 250)]
+    for schritt, summen in zip(schritte, erwartet):
+        assert schritt().status_code == 200
+        inkrementell = _kennzahlen(abrechnungs_id)
+        assert inkrementell[:3] == summen
+        assert inkrementell[5] is True
+        assert inkrementell == _neu_berechnet(abrechnungs_id)
+
+
+def test_veraendert(client, mitglied_anlegen, artikel_anlegen):
+    abrechnungs_id, ids = _anlegen(client, mitglied_anlegen, artikel_anlegen)
+    assert _kennzahlen(abrechnungs_id)[5] is False
+
+    client.post(f"/admin/buchungen/toggle/{ids[0]}")
+    assert _kennzahlen(abrechnungs_id)[5] is True
+
+    # Aktualisieren übernimmt den Storno: nicht mehr verändert, auch nach Neuberechnung
+    assert client.post(f"/admin/abrechnung/{abrechnungs_id}/refresh").status_code == 200
+    assert _kennzahlen(abrechnungs_id)[5] is False
+    assert _neu_berechnet(abrechnungs_id)[5] is False
+
+    # Buchungen ohne Abrechnung ändern nichts
+    db.session.add(Buchung(mitglied_id=db.session.get(Buchung, ids[0]).mitglied_id, menge=1,
+                           preis_pro_einheit=100, gesamtpreis=-100))
+    db.session.commit()
+    frei = Buchung.query.filter(Buchung.abrechnungs_id.is_(None)).one().id
+    res = client.post("/admin/buchungen/storno", json={"ids": [frei], "storno": True})
+    assert res.get_json()["abrechnungen"] == []
+    assert _kennzahlen(abrechnungs_id)[5] is False
+
+    res = client.post(f"/admin/buchungen/toggle/{ids[0]}")
+    assert "Monat" in res.get_json()["message"]
+    assert _kennzahlen(abrechnungs_id)[5] is True
+
+
+def _zugeordnet():
+    db.session.expire_all()
+    return {b.id: b.abrechnungs_id for b in Buchung.query}
+
+
+def test_anlegen_und_zeitraum_aendern(client, mitglied_anlegen):
+    mitglied_id = mitglied_anlegen().id
+    basis = datetime(2026, 5, 1, 12, 0)
+    db.session.add_all(
+        Buchung(mitglied_id=mitglied_id, menge=1, preis_pro_einheit=100, gesamtpreis=-100,
+                zeitstempel=basis + timedelta(days=i))
+        for i in range(10)
+    )
+    db.session.commit()
+    ids = sorted(_zugeordnet())
+
+    # Tage 2–4 im Zeitraum, danach alles übrige
+    res = client.post("/admin/abrechnung/create", json={
+        "name": "Mai", "modus": "zeitraum",
+        "start": (basis + timedelta(days=2)).isoformat(), "end": (basis + timedelta(days=4)).isoformat(),
+    })
+    assert res.get_json() == {"success": True, "anzahl": 3}
+    mai = Abrechnung.query.filter_by(name="Mai").one().id
+    assert client.post("/admin/abrechnung/create", json={"name": "Rest", "modus": "alle"}).get_json()["anzahl"] == 7
+    rest = Abrechnung.query.filter_by(name="Rest").one().id
+
+    # Tage 3–6: Tag 2 wird frei, Tage 5–6 gehören schon "Rest" und bleiben dort
+    zeitraum = {"start": (basis + timedelta(days=3)).isoformat(), "ende": (basis + timedelta(days=6)).isoformat()}
+    res = client.post(f"/admin/abrechnung/{mai}/update", json=zeitraum)
+
+    assert res.get_json() == {"success": True, "geaendert": 1}
+    zuordnung = _zugeordnet()
+    assert [zuordnung[i] for i in ids] == [rest, rest, None, mai, mai, rest, rest, rest, rest, rest]
+    assert _kennzahlen(mai)[:3] == (2, 0, 200)
+
+    # Gleicher Zeitraum noch einmal: nichts zu ändern
+    res = client.post(f"/admin/abrechnung/{mai}/update", json=zeitraum)
+    assert res.get_json() == {"success": True, "geaendert": 0}
+    assert _zugeordnet() == zuordnung
+
+    # Zeitraum erweitern: nur die freie Buchung von Tag 2 kommt hinzu
+    zeitraum["start"] = basis.isoformat()
+    res = client.post(f"/admin/abrechnung/{mai}/update", json=zeitraum)
+    assert res.get_json() == {"success": True, "geaendert": 1}
+    assert _zugeordnet()[ids[2]] == mai
+    assert _kennzahlen(mai)[:3] == _neu_berechnet(mai)[:3] == (3, 0, 300)
@@ -0,0 +1,111 @@
+"""Kaltes Archiv (utils/archiv.py) samt Sicherung und Wiederherstellung."""
+import io
+import zipfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from models import db, Abrechnung, ArchivSumme, Buchung, BuchungArchiv, Mitglied
+from utils import archiv
+from utils.abrechnung import zusammenfassen
+from utils.hotlist import hotlist_neu_berechnen
+
+
+def _abrechnung_mit_buchungen(name, zeitpunkt, mitglied_id, artikel_id, preise):
+    abrechnung = Abrechnung(name=name, zeitstempel=zeitpunkt)
+    db.session.add(abrechnung)
+    db.session.flush()
+    db.session.add_all(
+        Buchung(
+            mitglied_id=mitglied_id, artikel_id=artikel_id, abrechnungs_id=abrechnung.id,
+            menge=1, preis_pro_einheit=abs(preis), gesamtpreis=preis, storno=storno,
+            zeitstempel=zeitpunkt - timedelta(days=1, minutes=i),
+        )
+        for i, (preis, storno) in enumerate(preise)
+    )
+    db.session.flush()
+    zusammenfassen(abrechnung.id)
+    db.session.commit()
+    return abrechnung.id
+
+
+def _konsum(mitglied_id):
+    db.session.expire_all()
+    return db.session.get(Mitglied, mitglied_id).konsum_gesamt
+
+
+def _anlegen(mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen()
+    a = artikel_anlegen()
+    alt = _abrechnung_mit_buchungen(
+        "alt", datetime.now() - timedelta(days=3 * 365), m.id, a.id,
+        [(-250, False), (-250, False), (-250, True), (1000, False)],
+    )
+    neu = _abrechnung_mit_buchungen("neu", datetime.now() - timedelta(days=10), m.id, a.id, [(-250, False)])
+    hotlist_neu_berechnen()
+    return m.id, a.id, alt, neu
+
+
+def test_archivieren_und_summen(mitglied_anlegen, artikel_anlegen):
+    mitglied_id, artikel_id, alt, neu = _anlegen(mitglied_anlegen, artikel_anlegen)
+    konsum_vorher = _konsum(mitglied_id)
+
+    assert archiv.kandidaten(24) == [alt]
+    assert archiv.archivieren(24) == (1, 4)
+
+    assert Buchung.query.filter_by(abrechnungs_id=alt).count() == 0
+    assert Buchung.query.filter_by(abrechnungs_id=neu).count() == 1
+
+    kopf = archiv.archiviert(alt)
+    assert (kopf.anzahl, kopf.summe_eingaenge, kopf.summe_ausgaenge) == (4, 1000, 500)
+    assert len(kopf.buchungen) == 4
+
+    summe = ArchivSumme.query.filter_by(mitglied_id=mitglied_id, artikel_id=artikel_id).one()
+    assert (summe.anzahl, summe.summe, summe.konsum) == (3, 500, 500)  # ohne Storno
+
+    # Gesamtwerte bleiben nach einem Neuaufbau gleich, das Archiv bleibt abfragbar
+    hotlist_neu_berechnen()
+    assert _konsum(mitglied_id) == konsum_vorher == 750
+    assert db.session.execute(text("SELECT count(*) FROM buchung_alle")).scalar() == 5
+
+    # Zweiter Lauf: nichts mehr zu tun
+    assert archiv.archivieren(24) == (0, 0)
+
+
+def test_archivierte_abrechnung_ist_gesperrt(client, mitglied_anlegen, artikel_anlegen):
+    _, _, alt, _ = _anlegen(mitglied_anlegen, artikel_anlegen)
+    archiv.archivieren(24)
+
+    antwort = client.post(f"/admin/abrechnung/{alt}/refresh")
+
+    assert antwort.status_code == 400
+    db.session.expire_all()
+    assert db.session.get(Abrechnung, alt).anzahl == 4
+
+
+def test_sicherung_und_wiederherstellung(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, _, alt, _ = _anlegen(mitglied_anlegen, artikel_anlegen)
+    archiv.archivieren(24)
+    db.session.expire_all()
+    kopf = db.session.get(BuchungArchiv, alt)
+    vorher = (kopf.anzahl, kopf.von_datum, kopf.bis_datum, kopf.buchungen)
+    summen_vorher = [(s.mitglied_id, s.artikel_id, s.konsum) for s in ArchivSumme.query.all()]
+
+    sicherung = client.get("/admin/export/db-backup").data
+    assert "buchung_archiv.jsonl" in zipfile.ZipFile(io.BytesIO(sicherung)).namelist()
+
+    tabellen = ", ".join(t.name for t in db.metadata.sorted_tables)
+    db.session.execute(text(f"TRUNCATE {tabellen} RESTART IDENTITY CASCADE"))
+    db.session.commit()
+
+    client.post(
+        "/admin/export/db-restore",
+        data={"file": (io.BytesIO(sicherung), "sicherung.zip")},
+        content_type="multipart/form-data",
+    )
+
+    db.session.expire_all()
+    kopf = db.session.get(BuchungArchiv, alt)
+    assert (kopf.anzahl, kopf.von_datum, kopf.bis_datum, kopf.buchungen) == vorher
+    assert [(s.mitglied_id, s.artikel_id, s.konsum) for s in ArchivSumme.query.all()] == summen_vorher
+    assert _konsum(mitglied_id) == 750
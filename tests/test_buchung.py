@@ -0,0 +1,121 @@
+"""Atomare Guthabenänderungen (utils/buchung.py) und parallele Buchungen."""
+
+import pytest
+
+from models import db, Buchung, Mitglied
+from utils.buchung import guthaben_aendern, guthaben_aendern_alle
+
+
+def _stand(mitglied_id):
+    db.session.expire_all()
+    m = db.session.get(Mitglied, mitglied_id)
+    return m.guthaben, m.blacklist
+
+
+def test_ohne_grenze_nie_geschwaerzt(mitglied_anlegen):
+    m = mitglied_anlegen(guthaben=100, schwaerzungs_grenze=None)
+
+    assert guthaben_aendern(m.id, -500) == (-400, False)
+    db.session.commit()
+    assert _stand(m.id) == (-400, False)
+
+
+@pytest.mark.parametrize("guthaben, blacklist, betrag, erwartet", [
+    (100, False, -50, (50, False)),     # bleibt über der Grenze
+    (100, False, -150, (-50, True)),    # unterschreitet die Grenze
+    (-100, False, -50, (-150, False)),  # war schon darunter, ohne Schwärzung: bleibt frei
+    (-100, True, 50, (-50, True)),      # geschwärzt, Guthaben noch negativ
+    (-100, True, 100, (0, False)),      # geschwärzt, Guthaben ausgeglichen
+])
+def test_schwaerzung_uebergaenge(mitglied_anlegen, guthaben, blacklist, betrag, erwartet):
+    m = mitglied_anlegen(guthaben=guthaben, blacklist=blacklist, schwaerzungs_grenze=0)
+
+    assert guthaben_aendern(m.id, betrag) == erwartet
+    db.session.commit()
+    assert _stand(m.id) == erwartet
+
+
+def test_nur_ohne_schwaerzung(mitglied_anlegen):
+    m = mitglied_anlegen(guthaben=-100, blacklist=True, schwaerzungs_grenze=0)
+
+    assert guthaben_aendern(m.id, -50, nur_ohne_schwaerzung=True) is None
+    db.session.commit()
+    assert _stand(m.id) == (-100, True)
+
+
+def test_unbekanntes_mitglied():
+    assert guthaben_aendern(4711, -50) is None
+
+
+def test_geladenes_objekt_wird_aktualisiert(mitglied_anlegen):
+    m = mitglied_anlegen(guthaben=100, schwaerzungs_grenze=0)
+
+    guthaben_aendern(m.id, -150)
+
+    assert (m.guthaben, m.blacklist) == (-50, True)
+
+
+def test_guthaben_aendern_alle(mitglied_anlegen):
+    a = mitglied_anlegen("A", guthaben=100, schwaerzungs_grenze=0)
+    b = mitglied_anlegen("B", guthaben=-100, blacklist=True, schwaerzungs_grenze=0)
+    c = mitglied_anlegen("C", guthaben=0, schwaerzungs_grenze=None)
+
+    ergebnis = guthaben_aendern_alle({a.id: -150, b.id: 200, c.id: -10})
+    db.session.commit()
+
+    assert ergebnis == {a.id: (-50, True), b.id: (100, False), c.id: (-10, False)}
+    assert _stand(a.id) == (-50, True)
+    assert _stand(b.id) == (100, False)
+    assert guthaben_aendern_alle({}) == {}
+
+
+def test_parallele_buchungen_verlieren_kein_guthaben(app, parallel, mitglied_anlegen, artikel_anlegen):
+    """Viele Terminals buchen gleichzeitig auf dasselbe Mitglied: jedes Cent kommt an."""
+    mitglied_id = mitglied_anlegen(guthaben=0, schwaerzungs_grenze=None).id
+    artikel_id = artikel_anlegen(preis=150).id
+    threads, pro_thread = 16, 25
+
+    def buchen(_):
+        client = app.test_client()
+        for _ in range(pro_thread):
+            res = client.post("/bar/buchen", json={
+                "mitglied_id": mitglied_id,
+                "artikel": [{"artikel_id": artikel_id, "menge": 1}],
+            })
+            assert res.status_code == 200, res.get_json()
+
+    parallel(buchen, threads)
+
+    anzahl = threads * pro_thread
+    assert _stand(mitglied_id) == (-150 * anzahl, False)
+    assert Buchung.query.filter_by(mitglied_id=mitglied_id).count() == anzahl
+
+
+def test_storno_und_buchung_parallel(app, parallel, mitglied_anlegen, artikel_anlegen):
+    """admin/buchungen.toggle und bar.buchen gleichzeitig auf dasselbe Mitglied: keine Verklemmung."""
+    mitglied_id = mitglied_anlegen(guthaben=0, schwaerzungs_grenze=None).id
+    artikel_id = artikel_anlegen(preis=100).id
+    client = app.test_client()
+    for _ in range(8):
+        client.post("/bar/buchen", json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": artikel_id, "menge": 1}]})
+    buchung_ids = [b.id for b in Buchung.query.order_by(Buchung.id)]
+    threads, runden = 16, 10
+
+    def lauf(i):
+        client = app.test_client()
+        for _ in range(runden):
+            if i % 2:
+                # gerade Anzahl Umschaltungen: am Ende wieder gültig
+                res = client.post(f"/admin/buchungen/toggle/{buchung_ids[i // 2]}")
+            else:
+                res = client.post("/bar/buchen", json={
+                    "mitglied_id": mitglied_id,
+                    "artikel": [{"artikel_id": artikel_id, "menge": 1}],
+                })
+            assert res.status_code == 200, res.get_data(as_text=True)
+
+    parallel(lauf, threads)
+
+    anzahl = len(buchung_ids) + threads // 2 * runden
+    assert Buchung.query.filter_by(storno=True).count() == 0
+    assert _stand(mitglied_id) == (-100 * anzahl, False)
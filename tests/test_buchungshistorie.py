@@ -0,0 +1,85 @@
+"""Keyset-Pagination der Buchungshistorie (blueprints/admin/buchungen.history)."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import template_rendered
+
+from models import db, Buchung
+
+_URL = "/admin/buchungen/"
+
+
+@contextmanager
+def _kontext(app):
+    """Sammelt den Template-Kontext jeder gerenderten Seite."""
+    seiten = []
+
+    def merken(sender, template, context, **extra):
+        seiten.append(context)
+
+    template_rendered.connect(merken, app)
+    try:
+        yield seiten
+    finally:
+        template_rendered.disconnect(merken, app)
+
+
+def _seite(client, app, url):
+    with _kontext(app) as seiten:
+        res = client.get(url, follow_redirects=True)
+    assert res.status_code == 200
+    return seiten[-1]
+
+
+def _buchungen_anlegen(mitglied_id, anzahl, artikel_id=None):
+    # Je drei Buchungen teilen sich einen Zeitstempel: die id entscheidet die Reihenfolge
+    basis = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    db.session.add_all(
+        Buchung(
+            mitglied_id=mitglied_id, artikel_id=artikel_id, menge=1, preis_pro_einheit=100,
+            gesamtpreis=-100, zeitstempel=basis + timedelta(minutes=i // 3),
+        )
+        for i in range(anzahl)
+    )
+    db.session.commit()
+
+
+def test_vor_und_zurueck_blaettern(app, client, mitglied_anlegen):
+    _buchungen_anlegen(mitglied_anlegen().id, 45)
+    erwartet = [b.id for b in Buchung.query.order_by(Buchung.zeitstempel.desc(), Buchung.id.desc())]
+
+    seiten, url = [], _URL
+    while url:
+        kontext = _seite(client, app, url)
+        seiten.append([b.id for b in kontext["buchungen"]])
+        url = kontext["url_aelter"]
+
+    assert [len(s) for s in seiten] == [20, 20, 5]
+    assert sum(seiten, []) == erwartet
+
+    # Von der letzten Seite zurück: gleiche Seiten in umgekehrter Reihenfolge
+    zurueck = []
+    url = kontext["url_neuer"]
+    while url:
+        kontext = _seite(client, app, url)
+        zurueck.append([b.id for b in kontext["buchungen"]])
+        url = kontext["url_neuer"]
+    assert zurueck == seiten[-2::-1]
+
+
+def test_filter_und_ungueltige_marke(app, client, mitglied_anlegen, artikel_anlegen):
+    a, b = mitglied_anlegen("A").id, mitglied_anlegen("B").id
+    artikel_id = artikel_anlegen().id
+    _buchungen_anlegen(a, 10, artikel_id)
+    _buchungen_anlegen(b, 10)
+
+    kontext = _seite(client, app, f"{_URL}?mitglied_id={a}")
+    assert {x.mitglied_id for x in kontext["buchungen"]} == {a}
+    assert kontext["url_aelter"] is None
+
+    kontext = _seite(client, app, f"{_URL}?artikel_id={artikel_id}")
+    assert len(kontext["buchungen"]) == 10
+
+    # Kaputte Marke: erste Seite statt Fehler
+    kontext = _seite(client, app, f"{_URL}?nach=kaputt")
+    assert len(kontext["buchungen"]) == 20
@@ -0,0 +1,89 @@
+"""Export der Buchungshistorie als Excel und CSV (blueprints/admin/buchungen.download)."""
+import csv
+import io
+from datetime import datetime, timedelta
+
+import openpyxl
+
+from models import db, Buchung
+
+_URL = "/admin/buchungen/download"
+_KOPF = [
+    "Datum", "Mitglied", "Artikel", "Beschreibung", "Menge",
+    "Preis/Einheit (€)", "Gesamtpreis (€)", "Storniert",
+]
+
+
+def _anlegen(mitglied_anlegen, artikel_anlegen):
+    """Buchungen über 10 Tage, davon einige außerhalb des exportierten Zeitraums."""
+    a, b = mitglied_anlegen("Anna").id, mitglied_anlegen("Ben").id
+    bier = artikel_anlegen("Bier", preis=250).id
+    basis = datetime(2026, 3, 1, 18, 0)
+    db.session.add_all([
+        Buchung(mitglied_id=a if i % 2 else b, artikel_id=bier, menge=1 + i % 3, preis_pro_einheit=250,
+                gesamtpreis=-250 * (1 + i % 3), zeitstempel=basis + timedelta(days=i, minutes=i),
+                storno=i == 4)
+        for i in range(10)
+    ])
+    # Aufbuchung ohne Artikel, muss trotzdem exportiert werden
+    db.session.add(Buchung(mitglied_id=a, menge=1, preis_pro_einheit=1234, gesamtpreis=1234,
+                           beschreibung="Aufbuchung", zeitstempel=basis + timedelta(days=5, hours=1)))
+    db.session.commit()
+    return a, basis + timedelta(days=2), basis + timedelta(days=8, hours=1)
+
+
+def _erwartet(von, bis, mitglied_id=None):
+    abfrage = Buchung.query.filter(Buchung.zeitstempel.between(von, bis))
+    if mitglied_id:
+        abfrage = abfrage.filter_by(mitglied_id=mitglied_id)
+    return abfrage.order_by(Buchung.zeitstempel.desc(), Buchung.id.desc()).all()
+
+
+def _parameter(von, bis, **weitere):
+    return {"start": f"{von:%Y-%m-%dT%H:%M}", "end": f"{bis:%Y-%m-%dT%H:%M}", **weitere}
+
+
+def test_excel(client, mitglied_anlegen, artikel_anlegen):
+    _, von, bis = _anlegen(mitglied_anlegen, artikel_anlegen)
+
+    res = client.get(_URL, query_string=_parameter(von, bis))
+
+    assert res.status_code == 200
+    assert res.headers["Content-Disposition"].endswith(".xlsx")
+    blatt = openpyxl.load_workbook(io.BytesIO(res.data)).active
+    kopf, *zeilen = [[wert if wert is not None else "" for wert in zeile] for zeile in blatt.iter_rows(values_only=True)]
+    assert kopf == _KOPF
+    assert zeilen == [
+        [
+            f"{b.zeitstempel:%Y-%m-%d %H:%M}", b.mitglied_obj.name,
+            b.artikel_obj.name if b.artikel_obj else "", b.beschreibung or "", b.menge,
+            b.preis_pro_einheit / 100, b.gesamtpreis / 100, "Ja" if b.storno else "Nein",
+        ]
+        for b in _erwartet(von, bis)
+    ]
+    assert len(zeilen) == 8
+    assert ["Ja" in z for z in zeilen].count(True) == 1
+
+
+def test_csv_mit_filter(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, von, bis = _anlegen(mitglied_anlegen, artikel_anlegen)
+
+    res = client.get(_URL, query_string=_parameter(von, bis, format="csv", mitglied_id=mitglied_id))
+
+    assert res.status_code == 200
+    assert res.mimetype == "text/csv"
+    text = res.get_data(as_text=True)
+    assert text.startswith("\ufeff")
+    kopf, *zeilen = list(csv.reader(io.StringIO(text[1:]), delimiter=";"))
+    assert kopf == _KOPF
+    assert zeilen == [
+        [
+            f"{b.zeitstempel:%Y-%m-%d %H:%M}", "Anna", b.artikel_obj.name if b.artikel_obj else "",
+            b.beschreibung or "", str(b.menge),
+            f"{b.preis_pro_einheit / 100:.2f}".replace(".", ","),
+            f"{b.gesamtpreis / 100:.2f}".replace(".", ","),
+            "Ja" if b.storno else "Nein",
+        ]
+        for b in _erwartet(von, bis, mitglied_id)
+    ]
+    assert ["", "Aufbuchung", "1", "12,34", "12,34", "Nein"] in [z[2:] for z in zeilen]
@@ -0,0 +1,121 @@
+"""Gruppen-Commit für Buchungen (utils/gruppencommit.py)."""
+import time
+
+import pytest
+
+from models import db, Buchung, Idempotenz, Mitglied
+from utils import gruppencommit
+
+
+@pytest.fixture
+def gruppencommit_an(app, monkeypatch):
+    monkeypatch.setitem(app.config, "BUCHUNG_GRUPPENCOMMIT", True)
+    monkeypatch.setitem(app.config, "BUCHUNG_GRUPPENCOMMIT_MS", 20)
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Größen der vom Schreib-Thread verarbeiteten Batches."""
+    groessen = []
+    verarbeiten = gruppencommit._verarbeiten
+
+    def zaehlen(batch):
+        groessen.append(len(batch))
+        return verarbeiten(batch)
+
+    monkeypatch.setattr(gruppencommit, "_verarbeiten", zaehlen)
+    return groessen
+
+
+def _buchen(client, mitglied_id, artikel_id, schluessel=None):
+    return client.post(
+        "/bar/buchen",
+        json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": artikel_id, "menge": 1}]},
+        headers={"Idempotency-Key": schluessel} if schluessel else {},
+    )
+
+
+def _guthaben(mitglied_id):
+    db.session.expire_all()
+    return db.session.get(Mitglied, mitglied_id).guthaben
+
+
+def test_parallele_buchungen_werden_gesammelt(
+    app, gruppencommit_an, batches, parallel, mitglied_anlegen, artikel_anlegen
+):
+    ids = [mitglied_anlegen(f"M{i}", guthaben=0, schwaerzungs_grenze=None).id for i in range(4)]
+    artikel_id = artikel_anlegen(preis=100).id
+    threads, pro_thread = 20, 5
+
+    def buchen(i):
+        client = app.test_client()
+        for _ in range(pro_thread):
+            res = _buchen(client, ids[i % len(ids)], artikel_id)
+            assert res.status_code == 200, res.get_json()
+            assert res.get_json()["redirect_url"]
+
+    parallel(buchen, threads)
+
+    assert sum(batches) == threads * pro_thread
+    assert len(batches) < threads * pro_thread  # mindestens ein Batch mit mehreren Buchungen
+    assert Buchung.query.count() == threads * pro_thread
+    for mitglied_id in ids:
+        assert _guthaben(mitglied_id) == -100 * threads * pro_thread // len(ids)
+
+
+def test_wiederholung_liefert_urspruengliche_antwort(client, gruppencommit_an, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen(guthaben=1000)
+    mitglied_id, artikel_id = m.id, artikel_anlegen(preis=250).id
+
+    erste = _buchen(client, mitglied_id, artikel_id, "g-1")
+    zweite = _buchen(client, mitglied_id, artikel_id, "g-1")
+
+    assert erste.status_code == zweite.status_code == 200
+    assert zweite.get_json() == erste.get_json()
+    assert "redirect_url" in erste.get_json()
+    assert Buchung.query.count() == 1
+    assert _guthaben(mitglied_id) == 750
+
+
+def test_kein_geld_wird_nicht_gespeichert(client, gruppencommit_an, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen(guthaben=-100, blacklist=True, schwaerzungs_grenze=0)
+    mitglied_id, artikel_id = m.id, artikel_anlegen(preis=250).id
+
+    antwort = _buchen(client, mitglied_id, artikel_id, "g-2")
+
+    assert antwort.status_code == 400
+    assert db.session.get(Idempotenz, "g-2") is None
+
+    db.session.get(Mitglied, mitglied_id).blacklist = False
+    db.session.commit()
+    wiederholung = _buchen(client, mitglied_id, artikel_id, "g-2")
+
+    assert wiederholung.status_code == 200
+    assert Buchung.query.count() == 1
+
+
+@pytest.mark.benchmark
+def test_benchmark_mit_und_ohne_gruppencommit(app, parallel, record_property, mitglied_anlegen, artikel_anlegen):
+    ids = [mitglied_anlegen(f"M{i}", guthaben=0, schwaerzungs_grenze=None).id for i in range(10)]
+    artikel_id = artikel_anlegen(preis=100).id
+    threads, pro_thread = 32, 50
+
+    def buchen(i):
+        client = app.test_client()
+        for _ in range(pro_thread):
+            assert _buchen(client, ids[i % len(ids)], artikel_id).status_code == 200
+
+    raten = {}
+    for modus in (False, True):
+        app.config["BUCHUNG_GRUPPENCOMMIT"] = modus
+        try:
+            start = time.perf_counter()
+            parallel(buchen, threads)
+            raten[modus] = threads * pro_thread / (time.perf_counter() - start)
+        finally:
+            app.config["BUCHUNG_GRUPPENCOMMIT"] = False
+
+    record_property("buchungen_pro_s_ohne_gruppencommit", round(raten[False]))
+    record_property("buchungen_pro_s_mit_gruppencommit", round(raten[True]))
+    assert Buchung.query.count() == 2 * threads * pro_thread
+    assert raten[True] > raten[False]
@@ -0,0 +1,89 @@
+"""Idempotency-Keys für /bar/buchen (utils/idempotenz.py)."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models import db, Buchung, Idempotenz, Mitglied
+from utils import idempotenz
+
+
+def _buchen(client, mitglied_id, artikel_id, schluessel):
+    return client.post(
+        "/bar/buchen",
+        json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": artikel_id, "menge": 1}]},
+        headers={"Idempotency-Key": schluessel},
+    )
+
+
+class _Abfragen:
+    """Zählt die SQL-Anweisungen, die innerhalb des Blocks an die Datenbank gehen."""
+
+    def __enter__(self):
+        self.anzahl = 0
+        event.listen(db.engine, "before_cursor_execute", self._zaehlen)
+        return self
+
+    def __exit__(self, *_):
+        event.remove(db.engine, "before_cursor_execute", self._zaehlen)
+
+    def _zaehlen(self, *_):
+        self.anzahl += 1
+
+
+def test_wiederholung_bucht_nicht_doppelt(client, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen(guthaben=1000)
+    a = artikel_anlegen(preis=250)
+
+    erste = _buchen(client, m.id, a.id, "k-1")
+    with _Abfragen() as abfragen:
+        zweite = _buchen(client, m.id, a.id, "k-1")
+
+    assert erste.status_code == zweite.status_code == 200
+    assert zweite.get_json() == erste.get_json()
+    assert abfragen.anzahl == 0  # aus dem prozesslokalen Cache
+    assert Buchung.query.count() == 1
+    db.session.expire_all()
+    assert db.session.get(Mitglied, m.id).guthaben == 750
+
+
+def test_wiederholung_aus_der_datenbank(client, mitglied_anlegen, artikel_anlegen):
+    """Ein anderer Worker kennt die Antwort nur aus der Tabelle idempotenz."""
+    m = mitglied_anlegen(guthaben=1000)
+    a = artikel_anlegen(preis=250)
+
+    erste = _buchen(client, m.id, a.id, "k-2").get_json()
+    with idempotenz._lock:
+        idempotenz._cache.clear()
+    zweite = _buchen(client, m.id, a.id, "k-2").get_json()
+
+    assert zweite == erste
+    assert Buchung.query.count() == 1
+
+
+def test_gescheiterte_buchung_gibt_schluessel_frei(client, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen(guthaben=-100, blacklist=True, schwaerzungs_grenze=0)
+    a = artikel_anlegen(preis=250)
+
+    assert _buchen(client, m.id, a.id, "k-3").status_code == 400
+    assert db.session.get(Idempotenz, "k-3") is None
+
+    m.guthaben, m.blacklist = 1000, False
+    db.session.commit()
+    antwort = _buchen(client, m.id, a.id, "k-3")
+
+    assert antwort.status_code == 200
+    assert antwort.get_json()["success"]
+    assert Buchung.query.count() == 1
+
+
+def test_cronjob_loescht_abgelaufene_schluessel(app):
+    db.session.add_all([
+        Idempotenz(schluessel="alt", zeitstempel=datetime.now() - timedelta(days=30), antwort={}),
+        Idempotenz(schluessel="neu", zeitstempel=datetime.now(), antwort={}),
+    ])
+    db.session.commit()
+
+    idempotenz.cronjob(app)
+
+    db.session.expire_all()
+    assert [i.schluessel for i in Idempotenz.query.all()] == ["neu"]
@@ -0,0 +1,80 @@
+"""Planer-Check: die heißen Abfragen auf ``buchung`` laufen über die vorgesehenen Indizes."""
+from sqlalchemy import text
+
+from models import db
+
+# Abfrage → erwarteter Index; Zeitpunkte relativ zu now(), passend zu _befuellen
+_ABFRAGEN = {
+    # letzte Buchungen eines Mitglieds (Buchungsseite, Brevo-Verbrauch)
+    "SELECT * FROM buchung WHERE mitglied_id = 7 ORDER BY zeitstempel DESC, id DESC LIMIT 10":
+        "ix_buchung_mitglied_zeitstempel",
+    # Verbrauch eines Mitglieds, nur gültige Buchungen (Brevo)
+    "SELECT artikel_id, menge, preis_pro_einheit FROM buchung "
+    "WHERE mitglied_id = 7 AND storno = false AND zeitstempel >= now() - interval '30 days'":
+        "ix_buchung_mitglied_zeitstempel_aktiv",
+    # Historie ohne Filter, eine Seite
+    "SELECT * FROM buchung WHERE zeitstempel BETWEEN now() - interval '30 days' AND now() "
+    "ORDER BY zeitstempel DESC, id DESC LIMIT 21":
+        "ix_buchung_zeitstempel_id",
+    # Historie mit Artikelfilter
+    "SELECT * FROM buchung WHERE artikel_id = 3 AND zeitstempel BETWEEN now() - interval '30 days' AND now() "
+    "ORDER BY zeitstempel DESC, id DESC LIMIT 21":
+        "ix_buchung_artikel_zeitstempel",
+    # Ranking-Rollup: angebrochene Stunde, nur gültige Buchungen (utils/rollup.py)
+    "SELECT mitglied_id, artikel_id, menge FROM buchung "
+    "WHERE zeitstempel >= now() - interval '40 minutes' AND zeitstempel < now() "
+    "AND storno = false AND artikel_id IN (1, 2, 3)":
+        "ix_buchung_zeitstempel_aktiv",
+    # Abrechnung: Übersicht/Detail
+    "SELECT * FROM buchung WHERE abrechnungs_id = 42":
+        "ix_buchung_abrechnungs_id",
+    # Storno-Änderungen
+    "SELECT id FROM buchung WHERE storno_updated_at > now() - interval '1 day'":
+        "ix_buchung_storno_updated_at",
+}
+
+
+def _befuellen():
+    """200k Buchungen über rund 9 Monate, 500 Mitglieder, 50 Artikel, 100 Abrechnungen."""
+    for sql in (
+        "INSERT INTO mitglied (name, guthaben, blacklist, aktiv, gepinnt, konsum_gesamt) "
+        "SELECT 'M' || i, 0, false, true, false, 0 FROM generate_series(1, 500) AS i",
+        "INSERT INTO artikel (name, preis, aktiv, typ, volumen_liter, reinalkohol_liter) "
+        "SELECT 'A' || i, 100, true, 'volumen', 0.5, 0.02 FROM generate_series(1, 50) AS i",
+        "INSERT INTO abrechnung (name, zeitstempel, anzahl, summe_eingaenge, summe_ausgaenge, veraendert) "
+        "SELECT 'R' || i, now(), 0, 0, 0, false FROM generate_series(1, 100) AS i",
+        """
+        INSERT INTO buchung (mitglied_id, artikel_id, abrechnungs_id, menge, preis_pro_einheit,
+                             gesamtpreis, zeitstempel, storno, storno_updated_at)
+        SELECT i % 500 + 1, i % 50 + 1, CASE WHEN i <= 180000 THEN i % 100 + 1 END, 1, 100, -100,
+               now() - (200000 - i) * interval '2 minutes',
+               i % 1000 = 0,
+               CASE WHEN i % 1000 = 0 THEN now() - (200000 - i) * interval '2 minutes' END
+        FROM generate_series(1, 200000) AS i
+        """,
+    ):
+        db.session.execute(text(sql))
+    db.session.commit()
+    # VACUUM läuft nicht in einer Transaktion; setzt auch die Visibility Map wie im Betrieb
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+
+def _indizes(plan) -> set:
+    """Alle Indexnamen eines EXPLAIN-(FORMAT JSON)-Plans, auch aus Unterknoten."""
+    namen = {plan["Index Name"]} if "Index Name" in plan else set()
+    for unterplan in plan.get("Plans", []):
+        namen |= _indizes(unterplan)
+    return namen
+
+
+def test_heisse_abfragen_nutzen_indizes():
+    _befuellen()
+
+    falsch = {}
+    for sql, index in _ABFRAGEN.items():
+        plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        benutzt = _indizes(plan[0]["Plan"])
+        if index not in benutzt:
+            falsch[sql] = benutzt
+    assert not falsch, falsch
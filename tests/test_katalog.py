@@ -0,0 +1,89 @@
+"""Prozesslokaler Artikelkatalog (utils/katalog.py)."""
+import time
+
+from sqlalchemy import text
+
+from models import db, Artikel
+from utils import benachrichtigung, katalog
+
+_KANAL = "artikel_stand"
+
+
+def _preise():
+    return {a.name: a.preis for a in katalog.aktive_artikel()}
+
+
+def _anderer_worker(sql):
+    """Ändert Artikel über eine eigene Verbindung, ohne diesen Prozess zu invalidieren."""
+    with db.engine.begin() as conn:
+        conn.execute(text(sql))
+
+
+def _ruhig():
+    benachrichtigung.stand(_KANAL)
+    time.sleep(0.5)
+    return benachrichtigung.stand(_KANAL)
+
+
+def test_invalidieren(artikel_anlegen):
+    bier = artikel_anlegen("Bier", preis=250)
+    artikel_anlegen("Saft", preis=150, aktiv=False)
+    _ruhig()
+    assert _preise() == {"Bier": 250}
+    assert katalog._aktuell() is katalog._aktuell()  # unverändert: derselbe Katalog
+
+    bier.preis = 300
+    db.session.commit()
+    katalog.invalidieren()
+
+    assert _preise() == {"Bier": 300}
+
+
+def test_aenderung_in_anderem_worker(artikel_anlegen):
+    artikel_anlegen("Bier", preis=250)
+    stand = _ruhig()
+    assert _preise() == {"Bier": 250}
+
+    _anderer_worker("UPDATE artikel SET preis = 280 WHERE name = 'Bier'")
+    benachrichtigung.warten(stand, 5, _KANAL)
+
+    assert _preise() == {"Bier": 280}
+
+
+def test_unbekannte_ids_werden_nachgeladen(artikel_anlegen):
+    bier = artikel_anlegen("Bier")
+    katalog.aktive_artikel()
+    # Von einem anderen Worker angelegt: auch ohne Meldung per IN-Abfrage aufgelöst
+    _anderer_worker("INSERT INTO artikel (name, preis, aktiv, typ) VALUES ('Wein', 400, true, 'volumen')")
+    wein_id = Artikel.query.filter_by(name="Wein").one().id
+
+    gefunden = katalog.artikel_aufloesen({bier.id, wein_id, 4711})
+
+    assert {a.name for a in gefunden.values()} == {"Bier", "Wein"}
+
+
+def test_laden_vor_invalidierung_wird_verworfen(monkeypatch, artikel_anlegen):
+    artikel_anlegen("Bier", preis=250)
+    eintrag = katalog._eintrag
+
+    def invalidieren_waehrend_laden(a):
+        katalog.invalidieren()
+        return eintrag(a)
+
+    monkeypatch.setattr(katalog, "_eintrag", invalidieren_waehrend_laden)
+    assert _preise() == {"Bier": 250}  # der Aufrufer bekommt seinen Stand
+    assert katalog._katalog is None   # veröffentlicht wird er nicht
+
+    monkeypatch.setattr(katalog, "_eintrag", eintrag)
+    _preise()
+    assert katalog._katalog is not None
+
+
+def test_ohne_listener_jedes_mal_aus_postgres(monkeypatch, artikel_anlegen):
+    artikel_anlegen("Bier", preis=250)
+    monkeypatch.setattr(benachrichtigung, "stand", lambda kanal=benachrichtigung.KANAL: None)
+    assert _preise() == {"Bier": 250}
+
+    _anderer_worker("UPDATE artikel SET preis = 260 WHERE name = 'Bier'")
+
+    assert _preise() == {"Bier": 260}  # ohne auf eine Meldung zu warten
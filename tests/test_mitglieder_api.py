@@ -0,0 +1,53 @@
+"""ETag der Mitgliederliste /api/members (blueprints/bar.get_members_api, utils/hotlist.stand)."""
+import time
+
+from utils import benachrichtigung
+
+_URL = "/api/members"
+_KANAL = "mitglied_stand"
+
+
+def _ruhig():
+    """Wartet, bis die Meldungen der Vorbereitung (TRUNCATE, Anlegen) angekommen sind."""
+    benachrichtigung.stand(_KANAL)
+    time.sleep(0.5)
+    return benachrichtigung.stand(_KANAL)
+
+
+def _abrufen(client, etag=None):
+    return client.get(_URL, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_etag_bis_zur_naechsten_aenderung(client, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen("Anna", guthaben=1000)
+    mitglied_id, artikel_id = m.id, artikel_anlegen().id
+    stand = _ruhig()
+
+    erste = _abrufen(client)
+    etag = erste.headers["ETag"]
+    assert erste.status_code == 200
+    assert etag.startswith(f'W/"{stand}-')
+
+    zweite = _abrufen(client, etag)
+    assert zweite.status_code == 304
+    assert zweite.headers["ETag"] == etag
+    assert zweite.data == b""
+
+    # Buchung ändert Guthaben und Konsum: neue Liste
+    client.post("/bar/buchen", json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": artikel_id, "menge": 1}]})
+    stand = benachrichtigung.warten(stand, 5, _KANAL)
+    dritte = _abrufen(client, etag)
+    assert dritte.status_code == 200
+    assert dritte.headers["ETag"] != etag
+    etag = dritte.headers["ETag"]
+    assert _abrufen(client, etag).status_code == 304
+
+    # Stammdaten geändert
+    client.post(f"/admin/mitglied/{mitglied_id}", json={
+        "name": "Anna", "nickname": "Anni", "email": None, "aktiv": True, "gepinnt": True,
+    })
+    benachrichtigung.warten(stand, 5, _KANAL)
+    vierte = _abrufen(client, etag)
+    assert vierte.status_code == 200
+    assert vierte.headers["ETag"] != etag
+
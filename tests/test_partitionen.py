@@ -0,0 +1,89 @@
+"""Umstellung von ``buchung`` auf Monatspartitionen (utils/partitionen.py)."""
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from models import db, Buchung
+from utils import benachrichtigung, partitionen
+
+WURZEL = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def schema_neu_aufbauen(app):
+    """Die Umstellung ist endgültig: danach das Schema für die übrigen Tests neu anlegen."""
+    yield
+    from flask_migrate import upgrade
+
+    db.session.remove()
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    upgrade(directory=os.path.join(WURZEL, "migrations"))
+
+
+def _werte(sql):
+    return db.session.execute(text(sql)).all()
+
+
+def _partitionen():
+    return sorted(
+        name for (name,) in _werte(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'buchung'::regclass"
+        )
+    )
+
+
+def test_umstellen(app, client, schema_neu_aufbauen, mitglied_anlegen, artikel_anlegen):
+    mitglied_id = mitglied_anlegen(guthaben=10000).id
+    artikel_id = artikel_anlegen().id
+    jetzt = datetime.now()
+    db.session.add_all(
+        Buchung(mitglied_id=mitglied_id, artikel_id=artikel_id, menge=1, preis_pro_einheit=250,
+                gesamtpreis=-250, storno=i % 7 == 0, zeitstempel=jetzt - timedelta(hours=13 * i))
+        for i in range(200)
+    )
+    db.session.commit()
+
+    kennzahlen = "SELECT count(*), sum(gesamtpreis), count(*) FILTER (WHERE storno), max(id) FROM buchung"
+    vorher = _werte(kennzahlen)
+    alle_vorher = db.session.execute(text("SELECT count(*) FROM buchung_alle")).scalar()
+    trigger = "SELECT tgname FROM pg_trigger WHERE tgrelid = 'buchung'::regclass AND NOT tgisinternal ORDER BY 1"
+    trigger_vorher = _werte(trigger)
+    assert not partitionen.partitioniert()
+    assert partitionen.anlegen() == 0
+
+    partitionen.umstellen()
+
+    assert partitionen.partitioniert()
+    assert _werte("SELECT relkind FROM pg_class WHERE oid = 'buchung'::regclass") == [("p",)]
+    assert _werte(kennzahlen) == vorher
+    assert _werte(trigger) == trigger_vorher
+    assert db.session.execute(text("SELECT count(*) FROM buchung_alle")).scalar() == alle_vorher
+    indizes = {name for (name,) in _werte("SELECT indexname FROM pg_indexes WHERE tablename = 'buchung'")}
+    assert indizes >= {index.name for index in Buchung.__table__.indexes} | {"buchung_pkey"}
+    assert "buchung_default" in _partitionen()
+    # Keine Zeile im Auffangnetz: jeder Monat hat seine Partition
+    assert db.session.execute(text("SELECT count(*) FROM buchung_default")).scalar() == 0
+    with pytest.raises(RuntimeError):
+        partitionen.umstellen()
+
+    # Neue Buchung: landet in der Monatspartition, der Trigger meldet sie, die Ansicht zeigt sie
+    stand = benachrichtigung.stand()
+    res = client.post("/bar/buchen", json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": artikel_id, "menge": 1}]})
+    assert res.status_code == 200
+    assert benachrichtigung.warten(stand, 5) != stand
+    neu = db.session.execute(text("SELECT id, tableoid::regclass::text AS partition FROM buchung ORDER BY id DESC LIMIT 1")).one()
+    assert neu.id > vorher[0][3]
+    assert neu.partition == f"buchung_{date.today():%Y_%m}"
+    assert db.session.execute(text("SELECT count(*) FROM buchung_alle")).scalar() == alle_vorher + 1
+
+    # anlegen() ist idempotent und ergänzt nur fehlende Monate
+    assert partitionen.anlegen(6) == 7
+    nach_erstem = _partitionen()
+    assert partitionen.anlegen(6) == 7
+    assert _partitionen() == nach_erstem
+    assert f"buchung_{partitionen._monat(date.today(), 6):%Y_%m}" in nach_erstem
@@ -0,0 +1,243 @@
+"""Ranking (blueprints/ranking.py), Ranking-Cache und Buchungsstand per LISTEN/NOTIFY (utils/ranking_cache.py, utils/benachrichtigung.py)."""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from models import db, Buchung, Mitglied
+from utils import benachrichtigung, ranking_cache
+
+
+def _ruhiger_stand():
+    """Stand, nachdem die Meldungen der Vorbereitung (TRUNCATE, Anlegen) angekommen sind."""
+    benachrichtigung.stand()
+    time.sleep(0.5)
+    return benachrichtigung.stand()
+
+
+def _ranking(client):
+    daten = client.get("/ranking/api/data").get_json()
+    return daten["v"], dict(zip(daten["mitglieder"]["id"], daten["mitglieder"]["menge"]))
+
+
+def test_neue_buchung_aendert_den_cache_schluessel(client, mitglied_anlegen, artikel_anlegen):
+    m = mitglied_anlegen(guthaben=1000)
+    a = artikel_anlegen(preis=250, reinalkohol_liter=0.025)
+    _ruhiger_stand()
+
+    stand_vorher, ranking_vorher = _ranking(client)
+    assert stand_vorher is not None
+    assert _ranking(client) == (stand_vorher, ranking_vorher)  # Cache-Treffer, gleicher Stand
+
+    client.post("/bar/buchen", json={"mitglied_id": m.id, "artikel": [{"artikel_id": a.id, "menge": 2}]})
+    assert benachrichtigung.warten(stand_vorher, 5) != stand_vorher
+    stand_nachher, ranking_nachher = _ranking(client)
+
+    assert stand_nachher != stand_vorher
+    assert ranking_vorher.get(m.id) is None
+    assert ranking_nachher[m.id] == 2
+    # Beide Stände liegen unter eigenem Schlüssel im Cache
+    assert {k[-1] for k in ranking_cache._cache} >= {stand_vorher, stand_nachher}
+
+
+def test_stand_zaehlt_erst_mit_dem_commit(mitglied_anlegen):
+    m = mitglied_anlegen()
+    vorher = _ruhiger_stand()
+
+    with db.engine.connect() as conn:
+        conn.execute(text(
+            "INSERT INTO buchung (mitglied_id, menge, preis_pro_einheit, gesamtpreis, zeitstempel, storno) "
+            "VALUES (:m, 1, 100, -100, now(), false)"
+        ), {"m": m.id})
+        assert benachrichtigung.warten(vorher, 0.5) == vorher  # noch nicht committet
+        conn.commit()
+
+    assert benachrichtigung.warten(vorher, 5) != vorher
+
+
+def test_buchungen_sperren_keine_gemeinsame_zeile(mitglied_anlegen):
+    a, b = mitglied_anlegen("A").id, mitglied_anlegen("B").id
+    einfuegen = text(
+        "INSERT INTO buchung (mitglied_id, menge, preis_pro_einheit, gesamtpreis, zeitstempel, storno) "
+        "VALUES (:m, 1, 100, -100, now(), false)"
+    )
+
+    # Zwei offene Transaktionen buchen für verschiedene Mitglieder, ohne aufeinander zu warten
+    with db.engine.connect() as erste, db.engine.connect() as zweite:
+        erste.execute(einfuegen, {"m": a})
+        zweite.execute(text("SET LOCAL lock_timeout = '1s'"))
+        zweite.execute(einfuegen, {"m": b})
+        zweite.commit()
+        erste.commit()
+
+    assert db.session.execute(text("SELECT count(*) FROM buchung")).scalar() == 2
+
+
+def test_delta_seit_stand(client, mitglied_anlegen, artikel_anlegen):
+    a = mitglied_anlegen("A", guthaben=5000).id
+    b = mitglied_anlegen("B", guthaben=5000).id
+    bier = artikel_anlegen(preis=250, reinalkohol_liter=0.025).id
+
+    def buchen(mitglied_id, menge=1):
+        client.post("/bar/buchen", json={"mitglied_id": mitglied_id, "artikel": [{"artikel_id": bier, "menge": menge}]})
+
+    buchen(a, 2)
+    buchen(b)
+    _ruhiger_stand()
+    voll = client.get("/ranking/api/data").get_json()
+    assert voll["voll"] is True
+    assert voll["mitglieder"]["id"] == [a, b]
+
+    # Nur A hat gebucht: das Delta enthält nur A
+    buchen(a)
+    benachrichtigung.warten(voll["v"], 5)
+    delta = client.get("/ranking/api/data", query_string={"seit_v": voll["v"]}).get_json()
+    assert delta["voll"] is False
+    assert delta["mitglieder"]["id"] == [a]
+    assert delta["mitglieder"]["menge"] == [1.5]
+    assert delta["entfernt"] == []
+
+    # B storniert seine einzige Buchung: fällt heraus
+    storno_id = Buchung.query.filter_by(mitglied_id=b).one().id
+    client.post(f"/admin/buchungen/toggle/{storno_id}")
+    benachrichtigung.warten(delta["v"], 5)
+    danach = client.get("/ranking/api/data", query_string={"seit_v": delta["v"]}).get_json()
+    assert danach["voll"] is False
+    assert danach["mitglieder"]["id"] == []
+    assert danach["entfernt"] == [b]
+
+    # Unverändert: leeres Delta; unbekannter Stand: volle Liste
+    gleich = client.get("/ranking/api/data", query_string={"seit_v": danach["v"]}).get_json()
+    assert (gleich["voll"], gleich["mitglieder"]["id"], gleich["entfernt"]) == (False, [], [])
+    unbekannt = client.get("/ranking/api/data", query_string={"seit_v": "fremder-worker-1"}).get_json()
+    assert unbekannt["voll"] is True
+    assert unbekannt["mitglieder"]["id"] == [a]
+
+
+def _alt_berechnet(seit, artikel_liste, modus):
+    """Das Ranking, wie es vor der Aggregation in Postgres in Python berechnet wurde."""
+    stueck, umsatz = {}, {}
+    for b in Buchung.query.filter(Buchung.storno == False, Buchung.zeitstempel >= seit):
+        if b.artikel_id not in {a.id for a in artikel_liste} or not b.mitglied_obj.aktiv:
+            continue
+        zaehler = stueck.setdefault(b.mitglied_id, {})
+        zaehler[b.artikel_id] = zaehler.get(b.artikel_id, 0) + b.menge
+        umsatz[b.mitglied_id] = umsatz.get(b.mitglied_id, 0) - min(b.gesamtpreis, 0)
+
+    eintraege = []
+    for mitglied_id, art_stueck in stueck.items():
+        art_menge = {
+            a.id: round(art_stueck.get(a.id, 0) * (a.volumen_liter or 0.5), 3) if a.typ == 'volumen'
+            else art_stueck.get(a.id, 0)
+            for a in artikel_liste
+        }
+        art_reinalkohol = {
+            a.id: round(art_stueck.get(a.id, 0) * (a.reinalkohol_liter or 0) * 1000, 1) for a in artikel_liste
+        }
+        eintraege.append({
+            "id":                 mitglied_id,
+            "art_menge":          art_menge,
+            "gesamt_menge":       round(sum(art_menge.values()), 3),
+            "gesamt_reinalkohol": round(sum(art_reinalkohol.values()), 1),
+            "gesamt_umsatz":      umsatz[mitglied_id],
+        })
+    eintraege.sort(key=lambda e: e[f"gesamt_{modus}"], reverse=True)
+    return eintraege
+
+
+@pytest.mark.parametrize("modus", ["menge", "reinalkohol", "umsatz"])
+def test_sql_ranking_wie_bisher(modus, client, mitglied_anlegen, artikel_anlegen):
+    from blueprints.ranking import _rechnen
+
+    a, b, c, d = (mitglied_anlegen(n, guthaben=0, schwaerzungs_grenze=None).id for n in "ABCD")
+    inaktiv = mitglied_anlegen("Inaktiv", guthaben=0, schwaerzungs_grenze=None).id
+    bier = artikel_anlegen("Bier", preis=250, volumen_liter=0.5, reinalkohol_liter=0.025).id
+    wein = artikel_anlegen("Wein", preis=900, volumen_liter=0.2, reinalkohol_liter=0.024).id
+    shot = artikel_anlegen("Shot", preis=200, typ="stueck", volumen_liter=None, reinalkohol_liter=0.008).id
+    saft = artikel_anlegen("Saft", preis=150).id
+    jetzt = datetime.now()
+
+    buchungen = [
+        # (Mitglied, Artikel, Menge, vor Stunden)
+        (a, bier, 6, 2), (a, bier, 5, 3),        # die zweite wird storniert
+        (b, wein, 2, 23.9),                       # angebrochene erste Stunde
+        (b, wein, 4, 30),                         # vor dem Fenster
+        (c, shot, 10, 1),
+        (d, bier, 3, 5), (d, shot, 3, 0.5), (d, saft, 8, 0.5),  # Saft nicht ausgewählt
+        (inaktiv, bier, 20, 1),
+    ]
+    client.post("/bar/buchen/sync", json={"buchungen": [
+        {
+            "idempotency_key": f"r-{i}", "mitglied_id": m,
+            "artikel": [{"artikel_id": art, "menge": menge}],
+            "zeitstempel": (jetzt - timedelta(hours=stunden)).isoformat(),
+        }
+        for i, (m, art, menge, stunden) in enumerate(buchungen)
+    ]})
+    client.post(f"/admin/buchungen/toggle/{Buchung.query.filter_by(mitglied_id=a, menge=5).one().id}")
+    db.session.get(Mitglied, inaktiv).aktiv = False
+    db.session.commit()
+
+    seit = jetzt - timedelta(hours=24)
+    artikel_liste, eintraege = _rechnen(seit, (bier, wein, shot), modus)
+    alt = _alt_berechnet(seit, artikel_liste, modus)
+
+    # Die Testdaten sind so gewählt, dass jeder Modus eine andere Reihenfolge ergibt
+    assert [e["id"] for e in alt] == {
+        "menge":       [c, d, a, b],
+        "reinalkohol": [a, d, c, b],
+        "umsatz":      [c, b, a, d],
+    }[modus]
+    assert [e["mitglied"].id for e in eintraege] == [e["id"] for e in alt]
+    for neu, erwartet in zip(eintraege, alt):
+        assert neu["art_menge"] == pytest.approx(erwartet["art_menge"])
+        assert neu["gesamt_menge"] == pytest.approx(erwartet["gesamt_menge"])
+        assert neu["gesamt_reinalkohol"] == pytest.approx(erwartet["gesamt_reinalkohol"])
+        assert neu["gesamt_umsatz"] == erwartet["gesamt_umsatz"]
+
+    _, top = _rechnen(seit, (bier, wein, shot), modus, top=2)
+    assert [e["mitglied"].id for e in top] == [e["id"] for e in alt[:2]]
+    assert top == eintraege[:2]
+
+
+def test_race_kumuliert_pro_bucket(client, mitglied_anlegen, artikel_anlegen):
+    a, b, c = (mitglied_anlegen(n, guthaben=0, schwaerzungs_grenze=None).id for n in "ABC")
+    bier = artikel_anlegen("Bier", preis=250, volumen_liter=0.5, reinalkohol_liter=0.025).id
+    wein = artikel_anlegen("Wein", preis=900, volumen_liter=0.2, reinalkohol_liter=0.024).id
+    saft = artikel_anlegen("Saft", preis=150).id  # ohne Reinalkohol: nicht vorausgewählt
+    jetzt = datetime.now()
+
+    buchungen = [
+        # (Mitglied, Artikel, Menge, vor Stunden) – bei 24 h und Stunden-Buckets Bucket 24 - ceil(h)
+        (a, bier, 1, 10.5), (a, bier, 2, 1.5),
+        (b, wein, 1, 23.5), (b, wein, 3, 30),  # vor dem Fenster
+        (c, saft, 4, 2),
+    ]
+    client.post("/bar/buchen/sync", json={"buchungen": [
+        {
+            "idempotency_key": f"r-{i}", "mitglied_id": m,
+            "artikel": [{"artikel_id": art, "menge": menge}],
+            "zeitstempel": (jetzt - timedelta(hours=stunden)).isoformat(),
+        }
+        for i, (m, art, menge, stunden) in enumerate(buchungen)
+    ]})
+
+    race = client.get("/ranking/api/race", query_string={"bucket": 60}).get_json()
+
+    assert race["modus"] == "menge"
+    assert len(race["zeiten"]) == 24
+    assert race["mitglieder"]["id"] == [a, b]
+    assert race["werte"] == [
+        [0] * 13 + [0.5] * 9 + [1.5] * 2,
+        [0.2] * 24,
+    ]
+
+    client.post("/ranking/config/modus", json={"modus": "umsatz"})
+    race = client.get("/ranking/api/race", query_string={"bucket": 60}).get_json()
+
+    assert race["modus"] == "umsatz"
+    assert race["werte"] == [
+        [0] * 13 + [2.5] * 9 + [7.5] * 2,
+        [9.0] * 24,
+    ]
@@ -0,0 +1,75 @@
+"""Stündlicher Konsum-Rollup (utils/rollup.py)."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from models import db, Buchung, KonsumStunde
+from utils import rollup
+from utils.hotlist import konsum_erfassen
+
+
+def _buchen(mitglied_id, artikel_id, menge, zeitstempel, preis=250):
+    buchung = Buchung(mitglied_id=mitglied_id, artikel_id=artikel_id, menge=menge, preis_pro_einheit=preis,
+                      gesamtpreis=-preis * menge, zeitstempel=zeitstempel)
+    db.session.add(buchung)
+    konsum_erfassen([buchung])
+    db.session.commit()
+    return buchung.id
+
+
+def _rollup():
+    db.session.expire_all()
+    return sorted(
+        (k.mitglied_id, k.artikel_id, k.stunde, k.menge, k.umsatz)
+        for k in KonsumStunde.query if k.menge or k.umsatz
+    )
+
+
+def _summen(seit, artikel_ids):
+    summen = rollup.summen_seit(seit, artikel_ids)
+    return sorted(db.session.execute(select(summen)).all())
+
+
+def _direkt(seit, artikel_ids):
+    """Dieselben Summen direkt aus ``buchung``."""
+    return sorted(db.session.execute(text(
+        "SELECT mitglied_id, artikel_id, sum(menge), sum(-gesamtpreis) FROM buchung "
+        "WHERE zeitstempel >= :seit AND NOT storno AND artikel_id = ANY(:ids) "
+        "GROUP BY mitglied_id, artikel_id"
+    ), {"seit": seit, "ids": list(artikel_ids)}).all())
+
+
+def test_inkrementell_wie_neu_berechnet(client, mitglied_anlegen, artikel_anlegen):
+    a, b = mitglied_anlegen("A", guthaben=10000).id, mitglied_anlegen("B", guthaben=10000).id
+    bier, wein, saft = artikel_anlegen("Bier").id, artikel_anlegen("Wein", preis=400).id, artikel_anlegen("Saft").id
+    stunde = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    ids = [
+        _buchen(a, bier, 2, stunde - timedelta(hours=6, minutes=-10)),
+        _buchen(a, bier, 1, stunde - timedelta(hours=6, minutes=-50)),  # gleiche Stunde
+        _buchen(b, wein, 3, stunde - timedelta(hours=5, minutes=-20), preis=400),
+        _buchen(b, bier, 1, stunde - timedelta(hours=3)),
+        _buchen(a, saft, 4, stunde - timedelta(hours=1, minutes=-59)),
+    ]
+    client.post("/bar/buchen", json={"mitglied_id": a, "artikel": [{"artikel_id": wein, "menge": 2}]})
+    client.post("/bar/buchen", json={"mitglied_id": b, "artikel": [{"artikel_id": bier, "menge": 1}]})
+
+    # Storno, Storno einer ganzen Stunde, Storno zurückgenommen
+    client.post(f"/admin/buchungen/toggle/{ids[0]}")
+    client.post(f"/admin/buchungen/toggle/{ids[3]}")
+    client.post("/admin/buchungen/storno", json={"ids": [ids[2], ids[4]], "storno": True})
+    client.post(f"/admin/buchungen/toggle/{ids[4]}")
+
+    inkrementell = _rollup()
+    artikel_ids = [bier, wein, saft]
+    # Fensterbeginn mitten in einer Stunde: angebrochene erste Stunde kommt aus buchung
+    fenster = [stunde - timedelta(hours=6, minutes=-30), stunde - timedelta(hours=5, minutes=-10),
+               stunde - timedelta(hours=8), stunde]
+    summen = {seit: _summen(seit, artikel_ids) for seit in fenster}
+
+    rollup.neu_berechnen()
+
+    assert _rollup() == inkrementell
+    for seit in fenster:
+        assert summen[seit] == _summen(seit, artikel_ids) == _direkt(seit, artikel_ids), seit
+    assert _summen(stunde - timedelta(hours=8), [saft]) == [(a, saft, 4, 1000)]
@@ -0,0 +1,105 @@
+"""Runde schmeißen (blueprints/bar.runde)."""
+from models import db, Buchung, Mitglied
+
+_URL = "/bar/runde"
+
+
+def _guthaben():
+    db.session.expire_all()
+    return {m.name: (m.guthaben, m.blacklist) for m in Mitglied.query}
+
+
+def _buchungen():
+    return sorted((b.mitglied_obj.name, b.artikel_id, b.menge, b.gesamtpreis) for b in Buchung.query)
+
+
+def test_jeder_zahlt_selbst(client, mitglied_anlegen, artikel_anlegen):
+    ids = [mitglied_anlegen(name, guthaben=1000, schwaerzungs_grenze=0).id for name in ("A", "B", "C")]
+    bier, schnaps = artikel_anlegen("Bier", preis=250).id, artikel_anlegen("Schnaps", preis=200).id
+
+    res = client.post(_URL, json={
+        "modus": "jeder", "mitglied_ids": ids + [ids[0]],  # doppelte ID zählt einmal
+        "artikel": [{"artikel_id": bier, "menge": 1}, {"artikel_id": schnaps, "menge": 2}],
+    })
+
+    assert res.status_code == 200
+    assert res.get_json()["message"] == "Runde gebucht: € 19,50 auf 3 Personen"
+    assert _guthaben() == {n: (350, False) for n in ("A", "B", "C")}
+    assert _buchungen() == sorted(
+        [(n, bier, 1, -250) for n in ("A", "B", "C")] + [(n, schnaps, 2, -400) for n in ("A", "B", "C")]
+    )
+
+
+def test_zahler_zahlt_menge_mal_faktor(client, mitglied_anlegen, artikel_anlegen):
+    zahler = mitglied_anlegen("Zahler", guthaben=1000, schwaerzungs_grenze=0).id
+    # Geschwärzte Gäste dürfen eingeladen werden, nur der Zahler muss zahlen können
+    gaeste = [
+        mitglied_anlegen("Gast", guthaben=0).id,
+        mitglied_anlegen("Schwarz", guthaben=-900, blacklist=True, schwaerzungs_grenze=0).id,
+        zahler,
+    ]
+    bier = artikel_anlegen("Bier", preis=250).id
+
+    res = client.post(_URL, json={
+        "modus": "zahler", "zahler_id": zahler, "mitglied_ids": gaeste,
+        "artikel": [{"artikel_id": bier, "menge": 2}],
+    })
+
+    assert res.status_code == 200
+    assert res.get_json()["message"] == "Runde gebucht: € 15,00 für 3 Personen auf Zahler"
+    assert _buchungen() == [("Zahler", bier, 6, -1500)]
+    assert _guthaben() == {"Zahler": (-500, True), "Gast": (0, False), "Schwarz": (-900, True)}
+
+
+def test_ganz_oder_gar_nicht(client, mitglied_anlegen, artikel_anlegen):
+    a = mitglied_anlegen("A", guthaben=1000).id
+    schwarz = mitglied_anlegen("Schwarz", guthaben=-100, blacklist=True, schwaerzungs_grenze=0).id
+    inaktiv = mitglied_anlegen("Inaktiv", aktiv=False).id
+    bier = artikel_anlegen().id
+    artikel = [{"artikel_id": bier, "menge": 1}]
+    vorher = _guthaben()
+
+    res = client.post(_URL, json={"modus": "jeder", "mitglied_ids": [a, schwarz], "artikel": artikel})
+    assert (res.status_code, res.get_json()["message"]) == (400, "Kein Geld 🗿 (Schwarz)")
+
+    res = client.post(_URL, json={"modus": "zahler", "zahler_id": schwarz, "mitglied_ids": [a], "artikel": artikel})
+    assert (res.status_code, res.get_json()["message"]) == (400, "Kein Geld 🗿 (Schwarz)")
+
+    res = client.post(_URL, json={"modus": "jeder", "mitglied_ids": [a, inaktiv], "artikel": artikel})
+    assert (res.status_code, res.get_json()["message"]) == (400, "Mitglied nicht aktiv (Inaktiv).")
+
+    res = client.post(_URL, json={"modus": "jeder", "mitglied_ids": [a, 4711], "artikel": artikel})
+    assert res.status_code == 404
+
+    res = client.post(_URL, json={"modus": "zahler", "mitglied_ids": [a], "artikel": artikel})
+    assert res.status_code == 400  # zahler_id fehlt
+
+    assert Buchung.query.count() == 0
+    assert _guthaben() == vorher
+
+
+def test_hoechstens_100_mitglieder(client, mitglied_anlegen, artikel_anlegen):
+    ids = [mitglied_anlegen(f"M{i}", guthaben=1000).id for i in range(101)]
+    bier = artikel_anlegen().id
+    artikel = [{"artikel_id": bier, "menge": 1}]
+
+    res = client.post(_URL, json={"modus": "jeder", "mitglied_ids": ids, "artikel": artikel})
+    assert res.status_code == 413
+    assert Buchung.query.count() == 0
+
+    res = client.post(_URL, json={"modus": "zahler", "zahler_id": ids[0], "mitglied_ids": ids[:100], "artikel": artikel})
+    assert res.status_code == 200
+    assert _buchungen() == [("M0", bier, 100, -25000)]
+
+
+def test_wiederholung(client, mitglied_anlegen, artikel_anlegen):
+    ids = [mitglied_anlegen(name, guthaben=1000).id for name in ("A", "B")]
+    daten = {"modus": "jeder", "mitglied_ids": ids, "artikel": [{"artikel_id": artikel_anlegen().id, "menge": 1}]}
+
+    erste = client.post(_URL, json=daten, headers={"Idempotency-Key": "r-1"})
+    zweite = client.post(_URL, json=daten, headers={"Idempotency-Key": "r-1"})
+
+    assert erste.status_code == zweite.status_code == 200
+    assert zweite.get_json() == erste.get_json()
+    assert Buchung.query.count() == 2
+    assert _guthaben() == {"A": (750, False), "B": (750, False)}
@@ -0,0 +1,129 @@
+"""Sammel-Storno der Buchungshistorie (blueprints/admin/buchungen.storno)."""
+from datetime import datetime, timedelta
+
+from models import db, Abrechnung, Buchung, KonsumStunde, KonsumTag, Mitglied
+from utils import rollup
+from utils.abrechnung import zusammenfassen
+from utils.buchung import guthaben_aendern
+from utils.hotlist import hotlist_neu_berechnen, konsum_erfassen
+
+_URL = "/admin/buchungen/storno"
+
+
+def _buchen(mitglied_id, artikel_id, gesamtpreis, zeitstempel, menge=1):
+    """Bucht wie die Bar: Buchung, Guthaben und Konsum-Zähler in einer Transaktion."""
+    buchung = Buchung(
+        mitglied_id=mitglied_id, artikel_id=artikel_id, menge=menge,
+        preis_pro_einheit=abs(gesamtpreis) // menge, gesamtpreis=gesamtpreis, zeitstempel=zeitstempel,
+    )
+    db.session.add(buchung)
+    guthaben_aendern(mitglied_id, gesamtpreis)
+    konsum_erfassen([buchung])
+    db.session.commit()
+    return buchung.id
+
+
+def _abrechnen(name, zeitpunkt):
+    abrechnung = Abrechnung(name=name, zeitstempel=zeitpunkt)
+    db.session.add(abrechnung)
+    db.session.flush()
+    Buchung.query.filter(Buchung.abrechnungs_id.is_(None), Buchung.zeitstempel < zeitpunkt).update(
+        {"abrechnungs_id": abrechnung.id}, synchronize_session=False
+    )
+    zusammenfassen(abrechnung.id)
+    db.session.commit()
+    return abrechnung.id
+
+
+def _zaehler():
+    """Konsum-Zähler, Rollup und Abrechnungs-Kennzahlen (ohne Nullzeilen)."""
+    db.session.expire_all()
+    return (
+        sorted((m.id, m.konsum_gesamt) for m in Mitglied.query),
+        sorted((k.mitglied_id, k.tag, k.summe) for k in KonsumTag.query if k.summe),
+        sorted(
+            (k.mitglied_id, k.artikel_id, k.stunde, k.menge, k.umsatz)
+            for k in KonsumStunde.query if k.menge or k.umsatz
+        ),
+        sorted(
+            (a.id, a.anzahl, a.summe_eingaenge, a.summe_ausgaenge, a.veraendert)
+            for a in Abrechnung.query
+        ),
+    )
+
+
+def _neu_berechnet():
+    hotlist_neu_berechnen()
+    rollup.neu_berechnen()
+    for a in Abrechnung.query.all():
+        zusammenfassen(a.id)
+    db.session.commit()
+    return _zaehler()
+
+
+def _guthaben():
+    db.session.expire_all()
+    return {m.name: (m.guthaben, m.blacklist) for m in Mitglied.query}
+
+
+def test_storno_und_reaktivierung(client, mitglied_anlegen, artikel_anlegen):
+    a = mitglied_anlegen("A", guthaben=300, schwaerzungs_grenze=0).id
+    b = mitglied_anlegen("B", guthaben=100, schwaerzungs_grenze=0).id
+    c = mitglied_anlegen("C", guthaben=1000, schwaerzungs_grenze=None).id
+    bier, wein = artikel_anlegen("Bier").id, artikel_anlegen("Wein", preis=400).id
+    gestern = datetime.now() - timedelta(days=1)
+
+    ids_a = [
+        _buchen(a, bier, -250, gestern),
+        _buchen(a, wein, -800, gestern + timedelta(minutes=30), menge=2),
+    ]
+    id_b = _buchen(b, bier, -250, gestern + timedelta(hours=2))
+    id_c = _buchen(c, None, 500, gestern)  # Aufbuchung
+    abrechnungs_id = _abrechnen("Woche", datetime.now() - timedelta(hours=1))
+    ohne_abrechnung = _buchen(c, bier, -250, datetime.now())
+    assert _guthaben() == {"A": (-750, True), "B": (-150, True), "C": (1250, False)}
+
+    # Schon stornierte Buchungen und unbekannte IDs werden übersprungen
+    client.post(f"/admin/buchungen/toggle/{ohne_abrechnung}")
+    ids = ids_a + [id_b, id_c, ohne_abrechnung, 4711]
+    res = client.post(_URL, json={"ids": ids, "storno": True})
+
+    assert res.status_code == 200
+    daten = res.get_json()
+    assert sorted(daten["ids"]) == sorted(ids_a + [id_b, id_c])
+    assert daten["abrechnungen"] == [{"id": abrechnungs_id, "name": "Woche"}]
+    assert _guthaben() == {"A": (300, False), "B": (100, False), "C": (1000, False)}
+    inkrementell = _zaehler()
+    assert inkrementell[3] == [(abrechnungs_id, 4, 0, 0, True)]
+    assert inkrementell == _neu_berechnet()
+
+    # Zweiter Aufruf: nichts mehr zu ändern
+    assert client.post(_URL, json={"ids": ids, "storno": True}).get_json()["ids"] == []
+
+    res = client.post(_URL, json={"ids": ids, "storno": False})
+
+    assert sorted(res.get_json()["ids"]) == sorted(ids_a + [id_b, id_c, ohne_abrechnung])
+    assert _guthaben() == {"A": (-750, True), "B": (-150, True), "C": (1250, False)}
+    inkrementell = _zaehler()
+    assert inkrementell[3] == [(abrechnungs_id, 4, 500, 1300, True)]
+    assert inkrementell == _neu_berechnet()
+
+
+def test_ungueltige_anfragen(client, mitglied_anlegen, artikel_anlegen):
+    buchung_id = _buchen(mitglied_anlegen(guthaben=1000).id, artikel_anlegen().id, -250, datetime.now())
+
+    for daten in (
+        {"ids": list(range(1, 1002)), "storno": True},  # mehr als 1000
+        {"ids": [buchung_id, "x"], "storno": True},
+        {"ids": [{"id": buchung_id}], "storno": True},
+        {"ids": [buchung_id], "storno": "ja"},
+        {"ids": [], "storno": True},
+        {},
+    ):
+        res = client.post(_URL, json=daten)
+        assert res.status_code == 400, daten
+        assert res.get_json()["success"] is False
+
+    assert client.post(_URL, data="kein json").status_code == 400
+    assert db.session.get(Buchung, buchung_id).storno is False
+    assert client.post(_URL, json={"ids": list(range(1, 1001)), "storno": True}).status_code == 200
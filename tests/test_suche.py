@@ -0,0 +1,60 @@
+"""Mitgliedersuche über suchvektor und Trigramm-Indizes (utils/admin.suche_mitglied)."""
+import statistics
+import time
+
+import pytest
+from sqlalchemy import text
+
+from models import db
+from utils.admin import suche_mitglied
+
+
+def test_suche_findet_name_nickname_und_teilstrings(mitglied_anlegen):
+    mitglied_anlegen("Anna Berger", nickname="Bergziege")
+    mitglied_anlegen("Bernd Anders")
+    mitglied_anlegen("Inaktiv Berger", aktiv=False)
+
+    assert [m.name for m in suche_mitglied("Anna Berger")] == ["Anna Berger"]
+    assert [m.name for m in suche_mitglied("ziege")] == ["Anna Berger"]
+    # Teilstring trifft beide aktiven Mitglieder, inaktive nie
+    assert {m.name for m in suche_mitglied("er")} == {"Anna Berger", "Bernd Anders"}
+
+
+def test_volltexttreffer_vor_teilstring(mitglied_anlegen):
+    mitglied_anlegen("Maximilian")
+    mitglied_anlegen("Max Muster")
+
+    assert suche_mitglied("max")[0].name == "Max Muster"
+
+
+def test_sonderzeichen_sind_kein_tsquery_fehler(mitglied_anlegen):
+    mitglied_anlegen("Anna")
+
+    assert suche_mitglied("a & | !") == []
+
+
+@pytest.mark.benchmark
+def test_benchmark_p95_bei_100k_mitgliedern(record_property):
+    db.session.execute(text(
+        """
+        INSERT INTO mitglied (name, nickname, guthaben, blacklist, aktiv, gepinnt, konsum_gesamt)
+        SELECT 'Mitglied ' || md5(i::text), 'nick' || i, 0, false, true, false, 0
+        FROM generate_series(1, 100000) AS i
+        """
+    ))
+    db.session.commit()
+    db.session.execute(text("ANALYZE mitglied"))
+    db.session.commit()
+
+    begriffe = ["nick4711", "a1b", "Mitglied", "ffe", "nick99999", "zz", "3c", "nick1"]
+    dauer = []
+    for i in range(200):
+        start = time.perf_counter()
+        suche_mitglied(begriffe[i % len(begriffe)], limit=20)
+        dauer.append(time.perf_counter() - start)
+        db.session.rollback()
+
+    p95 = statistics.quantiles(dauer, n=20)[18]
+    record_property("p50_ms", round(statistics.median(dauer) * 1000, 1))
+    record_property("p95_ms", round(p95 * 1000, 1))
+    assert p95 < 0.1
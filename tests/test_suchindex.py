@@ -0,0 +1,95 @@
+"""Prozesslokaler Suchindex der Bar (utils/suchindex.py)."""
+import threading
+import time
+
+from models import db, Mitglied
+from utils import suchindex
+
+
+def _warten(bedingung, timeout=5):
+    ende = time.monotonic() + timeout
+    while not bedingung():
+        assert time.monotonic() < ende, "Zeitüberschreitung"
+        time.sleep(0.01)
+
+
+def _namen(mitglieder):
+    return [m.name for m in mitglieder]
+
+
+def _postgres_zaehlen(monkeypatch):
+    """Zählt die Suchen, die mangels Index an Postgres gehen."""
+    aufrufe = []
+    suche_mitglied = suchindex.suche_mitglied
+
+    def zaehlen(*args, **kwargs):
+        aufrufe.append(args)
+        return suche_mitglied(*args, **kwargs)
+
+    monkeypatch.setattr(suchindex, "suche_mitglied", zaehlen)
+    return aufrufe
+
+
+def test_kaltstart_antwortet_aus_postgres(monkeypatch, mitglied_anlegen):
+    mitglied_anlegen("Anna Berger", nickname="Bergziege")
+    mitglied_anlegen("Bernd Anders")
+    mitglied_anlegen("Inaktiv Berger", aktiv=False)
+    postgres = _postgres_zaehlen(monkeypatch)
+
+    kalt = _namen(suchindex.suche("berg"))
+    assert len(postgres) == 1
+    _warten(lambda: suchindex._index is not None)
+
+    warm = _namen(suchindex.suche("berg"))
+    assert len(postgres) == 1  # jetzt aus dem Index
+    assert kalt == warm == ["Anna Berger"]
+    assert _namen(suchindex.suche("er", limit=1)) == ["Anna Berger"]
+
+
+def test_invalidieren(monkeypatch, mitglied_anlegen):
+    mitglied_anlegen("Anna")
+    suchindex.suche("anna")
+    _warten(lambda: suchindex._index is not None)
+    postgres = _postgres_zaehlen(monkeypatch)
+
+    neu = mitglied_anlegen("Annabell")
+    assert _namen(suchindex.suche("anna")) == ["Anna"]  # bis zur Invalidierung der alte Stand
+    suchindex.invalidieren()
+
+    assert _namen(suchindex.suche("anna")) == ["Anna", "Annabell"]
+    assert len(postgres) == 1
+    _warten(lambda: suchindex._index is not None)
+    assert _namen(suchindex.suche("anna")) == ["Anna", "Annabell"]
+    assert len(postgres) == 1
+
+    # Inaktiv gesetzt, aber noch im Index: Treffer werden trotzdem aus der DB gefiltert
+    db.session.get(Mitglied, neu.id).aktiv = False
+    db.session.commit()
+    assert _namen(suchindex.suche("anna")) == ["Anna"]
+
+
+def test_aufbau_vor_invalidierung_wird_verworfen(monkeypatch, mitglied_anlegen):
+    mitglied_anlegen("Anna")
+    gestartet, weiter = threading.Event(), threading.Event()
+    index_klasse = suchindex._Index
+
+    def langsam(mitglieder):
+        gestartet.set()
+        weiter.wait(5)
+        return index_klasse(mitglieder)
+
+    monkeypatch.setattr(suchindex, "_Index", langsam)
+    suchindex.suche("anna")
+    assert gestartet.wait(5)
+
+    # Der Aufbau hat die Mitglieder schon gelesen; die Invalidierung kommt danach
+    mitglied_anlegen("Annabell")
+    suchindex.invalidieren()
+    weiter.set()
+    _warten(lambda: not suchindex._laedt)
+
+    assert suchindex._index is None
+    monkeypatch.setattr(suchindex, "_Index", index_klasse)
+    suchindex.suche("anna")
+    _warten(lambda: suchindex._index is not None)
+    assert _namen(suchindex.suche("anna")) == ["Anna", "Annabell"]
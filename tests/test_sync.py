@@ -0,0 +1,111 @@
+"""Offline-Sync der Terminals (blueprints/bar.buchen_sync)."""
+from datetime import datetime, timedelta
+
+from models import db, Abrechnung, Buchung, Mitglied
+
+_URL = "/bar/buchen/sync"
+
+
+def _eintrag(schluessel, mitglied_id, artikel_id, zeitstempel=None, menge=1):
+    return {
+        "idempotency_key": schluessel,
+        "mitglied_id": mitglied_id,
+        "artikel": [{"artikel_id": artikel_id, "menge": menge}],
+        "zeitstempel": zeitstempel.isoformat() if isinstance(zeitstempel, datetime) else zeitstempel,
+    }
+
+
+def _mitglied(mitglied_id):
+    db.session.expire_all()
+    m = db.session.get(Mitglied, mitglied_id)
+    return m.guthaben, m.blacklist
+
+
+def test_wiederholung_bucht_nicht_doppelt(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, artikel_id = mitglied_anlegen(guthaben=1000).id, artikel_anlegen(preis=250).id
+    vorhin = datetime.now() - timedelta(minutes=10)
+    eintraege = [
+        _eintrag("s-1", mitglied_id, artikel_id, vorhin),
+        _eintrag("s-2", mitglied_id, artikel_id, vorhin, menge=2),
+        _eintrag("s-1", mitglied_id, artikel_id, vorhin),  # Duplikat in derselben Anfrage
+        _eintrag(None, mitglied_id, artikel_id, vorhin),
+        _eintrag("s-3", mitglied_id, 4711, vorhin),
+    ]
+
+    erste = client.post(_URL, json={"buchungen": eintraege}).get_json()
+
+    ergebnisse = erste["ergebnisse"]
+    assert [e["success"] for e in ergebnisse] == [True, True, True, False, False]
+    assert ergebnisse[2] == ergebnisse[0]
+    assert ergebnisse[3]["message"] == "Idempotency-Key fehlt."
+    assert Buchung.query.count() == 2
+    assert _mitglied(mitglied_id) == (250, False)
+
+    # Terminal schickt dieselben Einträge nach einem Timeout noch einmal, plus einen neuen
+    zweite = client.post(_URL, json={"buchungen": eintraege + [_eintrag("s-4", mitglied_id, artikel_id)]}).get_json()
+
+    assert zweite["ergebnisse"][:5] == ergebnisse
+    assert zweite["ergebnisse"][5]["success"] is True
+    assert Buchung.query.count() == 3
+    assert _mitglied(mitglied_id) == (0, False)
+
+
+def test_schwaerzung_chronologisch(client, mitglied_anlegen, artikel_anlegen):
+    """Die Getränke sind schon ausgegeben: auch geschwärzte Mitglieder werden gebucht."""
+    frei = mitglied_anlegen("Frei", guthaben=300, schwaerzungs_grenze=0).id
+    schwarz = mitglied_anlegen("Schwarz", guthaben=-500, blacklist=True, schwaerzungs_grenze=0).id
+    artikel_id = artikel_anlegen(preis=250).id
+    basis = datetime.now() - timedelta(hours=1)
+
+    # Absichtlich nicht in zeitlicher Reihenfolge
+    res = client.post(_URL, json={"buchungen": [
+        _eintrag("b-2", frei, artikel_id, basis + timedelta(minutes=20)),
+        _eintrag("b-1", frei, artikel_id, basis),
+        _eintrag("b-3", schwarz, artikel_id, basis),
+    ]})
+
+    assert all(e["success"] for e in res.get_json()["ergebnisse"])
+    assert _mitglied(frei) == (-200, True)
+    assert _mitglied(schwarz) == (-750, True)
+    assert sorted(b.zeitstempel for b in Buchung.query.filter_by(mitglied_id=frei)) == [
+        basis, basis + timedelta(minutes=20),
+    ]
+
+
+def test_zeitstempel_vor_der_letzten_abrechnung(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, artikel_id = mitglied_anlegen(guthaben=5000).id, artikel_anlegen().id
+    abgerechnet = datetime.now() - timedelta(hours=1)
+    db.session.add(Abrechnung(name="Letzte", zeitstempel=abgerechnet))
+    db.session.commit()
+    danach = abgerechnet + timedelta(minutes=15)
+
+    vorher = datetime.now()
+    client.post(_URL, json={"buchungen": [
+        _eintrag("z-1", mitglied_id, artikel_id, abgerechnet - timedelta(days=1)),
+        _eintrag("z-2", mitglied_id, artikel_id, danach),
+        _eintrag("z-3", mitglied_id, artikel_id, datetime.now() + timedelta(days=1)),
+        _eintrag("z-4", mitglied_id, artikel_id, "kaputt"),
+    ]})
+    nachher = datetime.now()
+
+    zeitstempel = [b.zeitstempel for b in Buchung.query.order_by(Buchung.id)]
+    assert len(zeitstempel) == 4
+    assert danach in zeitstempel
+    # Vor der Abrechnung, in der Zukunft oder unlesbar: Empfangszeitpunkt
+    assert sum(vorher <= z <= nachher for z in zeitstempel) == 3
+
+
+def test_hoechstens_1000_eintraege(client, mitglied_anlegen, artikel_anlegen):
+    mitglied_id, artikel_id = mitglied_anlegen(guthaben=0, schwaerzungs_grenze=None).id, artikel_anlegen(preis=1).id
+    eintraege = [_eintrag(f"l-{i}", mitglied_id, artikel_id) for i in range(1001)]
+
+    res = client.post(_URL, json={"buchungen": eintraege})
+
+    assert res.status_code == 413
+    assert Buchung.query.count() == 0
+
+    res = client.post(_URL, json={"buchungen": eintraege[:1000]})
+
+    assert res.status_code == 200
+    assert Buchung.query.count() == 1000
+    assert _mitglied(mitglied_id) == (-1000, False)
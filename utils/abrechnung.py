@@ -0,0 +1,78 @@
+"""Gespeicherte Kennzahlen einer Abrechnung (Anzahl, Ein-/Ausgänge, Zeitraum, verändert).
+
+Die Übersicht liest nur noch die Spalten von ``abrechnung``. Berechnet werden sie beim
+Anlegen, Ändern und Aktualisieren einer Abrechnung (``zusammenfassen``); Stornos und
+Storno-Rücknahmen schreiben sie fort (``storno_erfassen``), so wie ``konsum_erfassen``
+die Hotlist-Zähler.
+"""
+from collections import defaultdict
+
+from sqlalchemy import text, update
+
+from models import db, Abrechnung
+
+
+def zusammenfassen(abrechnungs_id: int):
+    """
+    Berechnet die Kennzahlen einer Abrechnung aus ihren Buchungen neu (ein UPDATE).
+
+    Läuft in der aktuellen Session; ``zeitstempel`` der Abrechnung muss vorher gesetzt sein,
+    da ``veraendert`` Stornos nach diesem Zeitpunkt anzeigt.
+    """
+    db.session.execute(text(
+        """
+        UPDATE abrechnung a
+        SET anzahl          = s.anzahl,
+            summe_eingaenge = s.summe_eingaenge,
+            summe_ausgaenge = s.summe_ausgaenge,
+            von_datum       = s.von_datum,
+            bis_datum       = s.bis_datum,
+            veraendert      = s.veraendert
+        FROM (
+            SELECT count(b.id) AS anzahl,
+                   COALESCE(sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis > 0 AND NOT b.storno), 0)
+                       AS summe_eingaenge,
+                   COALESCE(-sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis < 0 AND NOT b.storno), 0)
+                       AS summe_ausgaenge,
+                   min(b.zeitstempel) AS von_datum,
+                   max(b.zeitstempel) AS bis_datum,
+                   COALESCE(bool_or(b.storno_updated_at > a2.zeitstempel), FALSE) AS veraendert
+            FROM abrechnung a2
+            LEFT JOIN buchung b ON b.abrechnungs_id = a2.id
+            WHERE a2.id = :id
+        ) s
+        WHERE a.id = :id
+        """
+    ), {"id": abrechnungs_id})
+
+
+def storno_erfassen(buchungen, vorzeichen: int):
+    """
+    Schreibt die Ein-/Ausgänge der betroffenen Abrechnungen nach einem Storno fort und
+    markiert sie als verändert.
+
+    Args:
+        buchungen: Buchungen (oder Objekte mit abrechnungs_id und gesamtpreis)
+        vorzeichen: -1 beim Stornieren, 1 beim Zurücknehmen eines Stornos
+    """
+    pro_abrechnung = defaultdict(lambda: [0, 0])
+    for b in buchungen:
+        if b.abrechnungs_id is None:
+            continue
+        summen = pro_abrechnung[b.abrechnungs_id]
+        if b.gesamtpreis > 0:
+            summen[0] += b.gesamtpreis * vorzeichen
+        elif b.gesamtpreis < 0:
+            summen[1] += -b.gesamtpreis * vorzeichen
+
+    for abrechnungs_id, (eingaenge, ausgaenge) in sorted(pro_abrechnung.items()):
+        db.session.execute(
+            update(Abrechnung)
+            .where(Abrechnung.id == abrechnungs_id)
+            .values(
+                summe_eingaenge=Abrechnung.summe_eingaenge + eingaenge,
+                summe_ausgaenge=Abrechnung.summe_ausgaenge + ausgaenge,
+                veraendert=True,
+            )
+            .execution_options(synchronize_session=False)
+        )
@@ -1,12 +1,15 @@
 """Hilfsfunktionen für die admin pages"""
 
+import csv
 import io
+import tempfile
 from datetime import datetime, timedelta
-from flask import request, send_file, flash, redirect
+from flask import request, send_file, flash, redirect, Response, stream_with_context
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
+from sqlalchemy import text, func, or_
 import re
+import xlsxwriter
 
 from models import db, Mitglied
 
@@ -42,6 +45,20 @@ def parse_daterange():
     return start_date, end_date
 
 
+def geschaetzte_anzahl(stmt) -> int:
+    """
+    Geschätzte Zeilenzahl einer Abfrage aus den Planer-Statistiken (``EXPLAIN``).
+
+    Kostet im Gegensatz zu ``COUNT(*)`` keinen Scan über alle Treffer; die Genauigkeit
+    hängt davon ab, wie aktuell ``ANALYZE`` gelaufen ist.
+    """
+    compiled = stmt.compile(dialect=db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 # --------------------------------
 # 🧠 Hilfsfunktion für den Export
 # --------------------------------
@@ -65,6 +82,56 @@ def export_df_to_excel(df, filename):
     )
 
 
+def export_rows_to_excel(spalten, zeilen, filename):
+    """
+    Schreibt Zeilen (Iterator von Tupeln) als XLSX, ohne sie gesammelt im Speicher zu halten.
+
+    xlsxwriter im ``constant_memory``-Modus schreibt jede Zeile sofort weg; die fertige
+    Datei liegt in einer temporären Datei, die beim Schließen der Antwort verschwindet.
+    """
+    datei = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(datei, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Daten")
+    worksheet.write_row(0, 0, spalten)
+    for i, zeile in enumerate(zeilen, start=1):
+        worksheet.write_row(i, 0, zeile)
+    workbook.close()
+    datei.seek(0)
+    return send_file(
+        datei,
+        as_attachment=True,
+        download_name=filename,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+def export_rows_to_csv(spalten, zeilen, filename, chunk_zeilen: int = 1000):
+    """
+    Streamt Zeilen (Iterator von Tupeln) als CSV (``;``, UTF-8 mit BOM für Excel).
+
+    Die Antwort wird in Blöcken zu ``chunk_zeilen`` Zeilen geschrieben, während der
+    Iterator noch liest – der Download beginnt sofort.
+    """
+    def erzeugen():
+        puffer = io.StringIO()
+        writer = csv.writer(puffer, delimiter=";")
+        puffer.write("\ufeff")
+        writer.writerow(spalten)
+        for i, zeile in enumerate(zeilen, start=1):
+            writer.writerow(zeile)
+            if i % chunk_zeilen == 0:
+                yield puffer.getvalue()
+                puffer.seek(0)
+                puffer.truncate()
+        yield puffer.getvalue()
+
+    return Response(
+        stream_with_context(erzeugen()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 def import_excel_to_db(file_stream, model, field_mapping, unique_field=None):
     """
     Liest eine Excel-Datei aus einem Stream ein und erstellt oder aktualisiert DB-Einträge.
@@ -151,21 +218,32 @@ def handle_excel_import(db_fields, model, redirect_url, unique_field=None):
 
 
 def suche_mitglied(search_term: str, limit: int = None) -> list:
-    """Durchsucht aktive Mitglieder nach Name und Nickname (PostgreSQL Full-Text + iLike)."""
+    """
+    Durchsucht aktive Mitglieder nach Name und Nickname.
+
+    Volltext über den GIN-indizierten ``suchvektor``, Teilstrings (iLike) über die
+    Trigramm-Indizes auf name/nickname. Sortiert nach ts_rank, dann Ähnlichkeit, dann Name.
+    """
+    tsquery = func.plainto_tsquery("simple", search_term)
+    muster = f"%{search_term}%"
+    aehnlichkeit = func.greatest(
+        func.similarity(Mitglied.name, search_term),
+        func.similarity(func.coalesce(Mitglied.nickname, ""), search_term),
+    )
     q = (
         Mitglied.query.filter(
-            text(
-                """
-                aktiv = true and (
-                    to_tsvector(name || ' ' || coalesce(nickname, '')) @@ to_tsquery(:search_term)
-                    or name iLike '%' || :search_term || '%'
-                    or nickname iLike '%' || :search_term || '%'
-                )
-                """
-            )
+            Mitglied.aktiv == True,
+            or_(
+                Mitglied.suchvektor.op("@@")(tsquery),
+                Mitglied.name.ilike(muster),
+                Mitglied.nickname.ilike(muster),
+            ),
+        )
+        .order_by(
+            func.ts_rank(Mitglied.suchvektor, tsquery).desc(),
+            aehnlichkeit.desc(),
+            Mitglied.name,
         )
-        .params(search_term=search_term)
-        .order_by(Mitglied.name)
     )
     if limit is not None:
         q = q.limit(limit)
@@ -183,25 +261,3 @@ def parse_betrag_cents(raw: str) -> int:
     else:
         raw = raw.replace(",", "")
     return round(float(raw) * 100)
-
-
-
-
-def calc_blacklist(mitglied: Mitglied, betrag: int) -> bool:
-    """
-    Berechnet ob das Mitglied geschwärzt werden soll.
-
-    Args:
-        mitglied: Das zu ändernde Mitglied
-        betrag: Änderung des Guthabens (negativ = Abbuchung, positiv = Aufbuchung)
-    """
-    if mitglied.schwaerzungs_grenze is None:
-        return False
-
-    if mitglied.blacklist:
-        return mitglied.guthaben + betrag < 0
-    else:
-        return (
-            mitglied.guthaben >= mitglied.schwaerzungs_grenze
-            and mitglied.guthaben + betrag < mitglied.schwaerzungs_grenze
-        )
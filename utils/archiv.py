@@ -0,0 +1,127 @@
+"""Kaltes Archiv für abgerechnete Buchungen.
+
+Buchungen von Abrechnungen, die älter als ARCHIV_MONATE sind, werden aus ``buchung``
+nach ``buchung_archiv`` verschoben – ein JSONB-Array pro Abrechnung, das Postgres
+komprimiert (TOAST). Zurück bleiben:
+
+- ``buchung_archiv``: Kopfdaten je Abrechnung (Anzahl, Zeitraum, Ein-/Ausgänge)
+- ``buchung_archiv_summe``: fortgeschriebene Summen pro Mitglied und Artikel, damit
+  Gesamtwerte (``mitglied.konsum_gesamt`` bei ``hotlist_neu_berechnen``) stimmen
+
+Guthaben, Hotlist-Fenster und Ranking-Rollup sind nicht betroffen: Guthaben stehen am
+Mitglied, die Zähler werden beim Buchen fortgeschrieben und archiviert wird nur, was weit
+außerhalb ihrer Fenster liegt. In der Bericht-Verwaltung ist das Archiv über die Views
+``buchung_archiv_zeilen`` und ``buchung_alle`` (aktive + archivierte Buchungen) abfragbar.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+import config
+from models import db, Abrechnung, Buchung, BuchungArchiv
+
+
+def kandidaten(monate: int = None, sperren: bool = False) -> list:
+    """
+    IDs der Abrechnungen mit Buchungen, die älter als ``monate`` Monate und noch nicht archiviert sind.
+
+    Mit ``sperren`` werden die Abrechnungen per ``FOR UPDATE`` gesperrt; die Verwaltung
+    (Ändern, Aktualisieren, Löschen) sperrt dieselbe Zeile und wartet damit, bis die
+    Archivierung abgeschlossen ist.
+    """
+    if monate is None:
+        monate = config.ARCHIV_MONATE
+    grenze = datetime.now() - timedelta(days=monate * 30)
+    stmt = (
+        select(Abrechnung.id)
+        .where(
+            Abrechnung.zeitstempel < grenze,
+            select(Buchung.id).where(Buchung.abrechnungs_id == Abrechnung.id).exists(),
+            ~select(BuchungArchiv.abrechnungs_id)
+            .where(BuchungArchiv.abrechnungs_id == Abrechnung.id)
+            .exists(),
+        )
+        .order_by(Abrechnung.id)
+    )
+    if sperren:
+        stmt = stmt.with_for_update(of=Abrechnung)
+    return db.session.execute(stmt).scalars().all()
+
+
+def archivieren(monate: int = None) -> tuple:
+    """
+    Verschiebt die Buchungen aller ``kandidaten`` in einer Transaktion ins Archiv.
+
+    Returns:
+        (Anzahl Abrechnungen, Anzahl Buchungen)
+    """
+    # Abrechnungen unter Sperre auswählen: ihre Zuordnung kann sich bis zum Commit nicht
+    # mehr ändern, INSERT ins Archiv und DELETE sehen also dieselben Buchungen
+    ids = kandidaten(monate, sperren=True)
+    if not ids:
+        db.session.commit()
+        return 0, 0
+
+    params = {"ids": ids}
+    # Betroffene Buchungen sperren, damit kein Storno dazwischenkommt
+    db.session.execute(
+        text("SELECT id FROM buchung WHERE abrechnungs_id = ANY(:ids) FOR UPDATE"), params
+    )
+
+    db.session.execute(text(
+        """
+        INSERT INTO buchung_archiv (abrechnungs_id, archiviert_am, anzahl, von_datum, bis_datum,
+                                    summe_eingaenge, summe_ausgaenge, buchungen)
+        SELECT b.abrechnungs_id, now(), count(*), min(b.zeitstempel), max(b.zeitstempel),
+               COALESCE(sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis > 0 AND NOT b.storno), 0),
+               COALESCE(-sum(b.gesamtpreis) FILTER (WHERE b.gesamtpreis < 0 AND NOT b.storno), 0),
+               jsonb_agg(to_jsonb(b) - 'abrechnungs_id' ORDER BY b.zeitstempel, b.id)
+        FROM buchung b
+        WHERE b.abrechnungs_id = ANY(:ids)
+        GROUP BY b.abrechnungs_id
+        """
+    ), params)
+
+    db.session.execute(text(
+        """
+        INSERT INTO buchung_archiv_summe (mitglied_id, artikel_id, anzahl, menge, summe, konsum)
+        SELECT mitglied_id, artikel_id, count(*), sum(menge), sum(gesamtpreis),
+               COALESCE(-sum(gesamtpreis) FILTER (WHERE gesamtpreis < 0), 0)
+        FROM buchung
+        WHERE abrechnungs_id = ANY(:ids) AND storno = false
+        GROUP BY mitglied_id, artikel_id
+        ON CONFLICT (mitglied_id, (COALESCE(artikel_id, 0))) DO UPDATE
+        SET anzahl = buchung_archiv_summe.anzahl + excluded.anzahl,
+            menge  = buchung_archiv_summe.menge + excluded.menge,
+            summe  = buchung_archiv_summe.summe + excluded.summe,
+            konsum = buchung_archiv_summe.konsum + excluded.konsum
+        """
+    ), params)
+
+    geloescht = db.session.execute(
+        text("DELETE FROM buchung WHERE abrechnungs_id = ANY(:ids)"), params
+    ).rowcount
+    db.session.commit()
+    return len(ids), geloescht
+
+
+def archiviert(abrechnungs_id: int):
+    """Archiv-Kopf einer Abrechnung oder None."""
+    return db.session.get(BuchungArchiv, abrechnungs_id)
+
+
+def statistik() -> dict:
+    """Kennzahlen für die Bericht-Verwaltung."""
+    abrechnungen, buchungen = db.session.execute(
+        select(func.count(BuchungArchiv.abrechnungs_id), func.coalesce(func.sum(BuchungArchiv.anzahl), 0))
+    ).one()
+    groesse = db.session.execute(
+        text("SELECT pg_size_pretty(pg_total_relation_size('buchung_archiv'))")
+    ).scalar()
+    return {
+        "abrechnungen": abrechnungen,
+        "buchungen": buchungen,
+        "groesse": groesse,
+        "kandidaten": len(kandidaten()),
+        "monate": config.ARCHIV_MONATE,
+    }
@@ -9,7 +9,8 @@ from html.parser import HTMLParser
 
 import config
 from models import Buchung, db
-from utils.admin import calc_blacklist, suche_mitglied, parse_betrag_cents
+from utils.admin import suche_mitglied, parse_betrag_cents
+from utils.buchung import guthaben_aendern
 
 logger = logging.getLogger(__name__)
 
@@ -214,8 +215,7 @@ def _handle_message(mail, msg_id, konto_re, betrag_re):
     mitglied = treffer[0]
 
     try:
-        mitglied.blacklist = calc_blacklist(mitglied, betrag_cents)
-        mitglied.guthaben += betrag_cents
+        guthaben_aendern(mitglied.id, betrag_cents)
         buchung = Buchung(
             mitglied_id=mitglied.id,
             artikel_id=None,
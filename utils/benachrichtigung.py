@@ -0,0 +1,135 @@
+"""Push-Benachrichtigung über Änderungen an Buchungen (Postgres LISTEN/NOTIFY).
+
+Ein Statement-Trigger auf ``buchung`` schickt ``NOTIFY buchung_stand`` – ohne eine
+gemeinsame Zeile zu schreiben, Buchungen serialisieren sich also nicht daran. Postgres stellt
+die Meldung erst nach dem Commit zu. Pro Prozess lauscht ein Hintergrund-Thread auf einer
+eigenen Verbindung, zählt pro Kanal einen Stand hoch und weckt alle wartenden
+Server-Sent-Events-Streams (``/ranking/api/events``) auf – die Anzeigen müssen nicht mehr pollen.
+
+Der Stand taugt als Cache-Schlüssel: wer ihn liest und danach rechnet, sieht mindestens alle
+Commits, die bis dahin gemeldet wurden; jeder spätere Commit ändert den Stand. Er gilt nur
+für diesen Prozess und diese Verbindung (Präfix ``<epoche>-``), Stände verschiedener Worker
+werden also nie verwechselt. Eigene Commits sind erst sichtbar, wenn die Meldung angekommen
+ist (typisch wenige Millisekunden).
+"""
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+from flask import current_app
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+KANAL = "buchung_stand"
+KANAELE = (KANAL, "mitglied_stand", "artikel_stand")
+
+# So lange wartet stand() beim ersten Aufruf auf die Listener-Verbindung
+_START_TIMEOUT_SEKUNDEN = 2
+
+_bedingung = threading.Condition()
+_epoche = None
+_staende = {}
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def stand(kanal: str = KANAL) -> str | None:
+    """
+    Aktueller Stand von ``kanal`` in diesem Prozess (ohne Datenbankzugriff).
+
+    Startet beim ersten Aufruf den Listener und wartet kurz auf dessen Verbindung.
+
+    Returns:
+        den Stand, oder None, solange der Listener nicht verbunden ist – dann nicht cachen
+    """
+    if _epoche is None:
+        starten(current_app._get_current_object())
+    with _bedingung:
+        _bedingung.wait_for(lambda: _epoche is not None, _START_TIMEOUT_SEKUNDEN)
+        return _formatieren(kanal)
+
+
+def warten(bekannt, timeout: float, kanal: str = KANAL):
+    """
+    Blockiert, bis sich der Stand gegenüber ``bekannt`` ändert oder ``timeout`` abläuft.
+
+    Returns:
+        den aktuellen Stand (None, solange der Listener noch nicht verbunden ist)
+    """
+    with _bedingung:
+        _bedingung.wait_for(lambda: _epoche is not None and _formatieren(kanal) != bekannt, timeout)
+        return _formatieren(kanal)
+
+
+def starten(app):
+    """Startet den Listener-Thread dieses Prozesses (idempotent)."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_lauschen, args=(app,), name="stand-listen", daemon=True)
+            _thread.start()
+
+
+def _formatieren(kanal):
+    if _epoche is None:
+        return None
+    return f"{_epoche}-{_staende[kanal]}"
+
+
+def _verbunden(epoche):
+    global _epoche, _staende
+    with _bedingung:
+        _epoche = epoche
+        _staende = dict.fromkeys(KANAELE, 0)
+        _bedingung.notify_all()
+
+
+def _getrennt():
+    global _epoche
+    with _bedingung:
+        _epoche = None
+
+
+def _melden(kanal):
+    with _bedingung:
+        if _epoche is not None and kanal in _staende:
+            _staende[kanal] += 1
+            _bedingung.notify_all()
+
+
+def _lauschen(app):
+    with app.app_context():
+        url = db.engine.url
+    verbindung = url.translate_connect_args(username="user", database="dbname")
+
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**verbindung)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                for kanal in KANAELE:
+                    cur.execute(f"LISTEN {kanal}")
+            # Erst nach dem LISTEN gültig: jeder spätere Commit wird gemeldet. Neue Epoche
+            # pro Verbindung, denn während einer Unterbrechung gehen Meldungen verloren.
+            _verbunden(f"{os.getpid()}.{conn.get_backend_pid()}.{int(time.time())}")
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _melden(conn.notifies.pop(0).channel)
+        except Exception:
+            logger.exception("LISTEN unterbrochen, neuer Versuch in 5 s")
+            _getrennt()
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
@@ -0,0 +1,120 @@
+"""Buchungs-Service: atomare Guthabenänderungen für alle Buchungspfade."""
+
+from sqlalchemy import Integer, case, column, select, update, values
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from models import db, Mitglied
+
+
+def _blacklist_nach(betrag: int):
+    """
+    SQL-Ausdruck für die Schwärzung nach einer Guthabenänderung um ``betrag``.
+
+    - ohne Schwärzungsgrenze nie geschwärzt
+    - bereits geschwärzt: bleibt es, solange das Guthaben danach negativ ist
+    - sonst: wird geschwärzt, wenn die Grenze mit dieser Buchung unterschritten wird
+    """
+    return case(
+        (Mitglied.schwaerzungs_grenze.is_(None), False),
+        (Mitglied.blacklist == True, Mitglied.guthaben + betrag < 0),
+        else_=(Mitglied.guthaben >= Mitglied.schwaerzungs_grenze)
+        & (Mitglied.guthaben + betrag < Mitglied.schwaerzungs_grenze),
+    )
+
+
+def schwaerzung_nach(guthaben: int, blacklist: bool, grenze, betrag: int) -> bool:
+    """Gleiche Regel wie ``_blacklist_nach``, für bereits gesperrte und geladene Zeilen."""
+    if grenze is None:
+        return False
+    if blacklist:
+        return guthaben + betrag < 0
+    return guthaben >= grenze and guthaben + betrag < grenze
+
+
+def guthaben_aendern(mitglied_id: int, betrag: int, nur_ohne_schwaerzung: bool = False):
+    """
+    Ändert das Guthaben eines Mitglieds und berechnet die Schwärzung neu.
+
+    Beides passiert in einem einzigen ``UPDATE ... RETURNING``; die Zeilensperre wird
+    bis zum Commit der aktuellen Session gehalten, parallele Buchungen gehen also nicht
+    verloren. Ein bereits geladenes Mitglied-Objekt wird mit den neuen Werten aktualisiert.
+
+    Args:
+        mitglied_id: ID des Mitglieds
+        betrag: Änderung in Cent (negativ = Abbuchung, positiv = Aufbuchung)
+        nur_ohne_schwaerzung: Nur buchen, wenn das Mitglied (noch) nicht geschwärzt ist
+
+    Returns:
+        (guthaben, blacklist) nach der Änderung, oder None wenn das Mitglied nicht existiert
+        bzw. wegen Schwärzung nicht gebucht wurde.
+    """
+    stmt = (
+        update(Mitglied)
+        .where(Mitglied.id == mitglied_id)
+        .values(
+            guthaben=Mitglied.guthaben + betrag,
+            blacklist=_blacklist_nach(betrag),
+        )
+        .returning(Mitglied.guthaben, Mitglied.blacklist)
+        .execution_options(synchronize_session=False)
+    )
+    if nur_ohne_schwaerzung:
+        stmt = stmt.where(Mitglied.blacklist.isnot(True))
+
+    row = db.session.execute(stmt).one_or_none()
+    if row is None:
+        return None
+
+    mitglied = db.session.identity_map.get(identity_key(Mitglied, mitglied_id))
+    if mitglied is not None:
+        set_committed_value(mitglied, "guthaben", row.guthaben)
+        set_committed_value(mitglied, "blacklist", row.blacklist)
+
+    return row.guthaben, row.blacklist
+
+
+def guthaben_aendern_alle(betraege: dict) -> dict:
+    """
+    Ändert die Guthaben mehrerer Mitglieder in einem einzigen ``UPDATE ... FROM (VALUES ...)``.
+
+    Die Schwärzung wird pro Mitglied einmal für die Summe neu berechnet (gleiche Regel wie
+    ``guthaben_aendern``). Die Mitglieder werden vorher in ID-Reihenfolge gesperrt, damit
+    parallele Sammeländerungen nicht ineinander verklemmen.
+
+    Args:
+        betraege: {mitglied_id: Änderung in Cent}
+
+    Returns:
+        {mitglied_id: (guthaben, blacklist)} nach der Änderung
+    """
+    if not betraege:
+        return {}
+
+    ids = sorted(betraege)
+    db.session.execute(
+        select(Mitglied.id).where(Mitglied.id.in_(ids)).order_by(Mitglied.id).with_for_update()
+    )
+
+    aenderung = values(
+        column("id", Integer), column("betrag", Integer), name="aenderung"
+    ).data([(i, betraege[i]) for i in ids])
+    rows = db.session.execute(
+        update(Mitglied)
+        .where(Mitglied.id == aenderung.c.id)
+        .values(
+            guthaben=Mitglied.guthaben + aenderung.c.betrag,
+            blacklist=_blacklist_nach(aenderung.c.betrag),
+        )
+        .returning(Mitglied.id, Mitglied.guthaben, Mitglied.blacklist)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    ergebnis = {}
+    for row in rows:
+        mitglied = db.session.identity_map.get(identity_key(Mitglied, row.id))
+        if mitglied is not None:
+            set_committed_value(mitglied, "guthaben", row.guthaben)
+            set_committed_value(mitglied, "blacklist", row.blacklist)
+        ergebnis[row.id] = (row.guthaben, row.blacklist)
+    return ergebnis
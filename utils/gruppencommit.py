@@ -0,0 +1,198 @@
+"""Gruppen-Commit für Buchungen zu Stoßzeiten (optional, BUCHUNG_GRUPPENCOMMIT).
+
+Geprüfte Buchungen aus ``bar.buchen`` landen in einer prozesslokalen Warteschlange.
+Ein einzelner Schreib-Thread sammelt sie für einige Millisekunden und schreibt sie in
+einer Transaktion: alle betroffenen Mitglieder werden mit einem ``SELECT ... FOR UPDATE``
+gesperrt, Schwärzung und Guthaben pro Buchung in Ankunftsreihenfolge fortgeschrieben,
+die Buchungen als mehrzeiliger INSERT und die Guthaben einmal pro Mitglied geschrieben.
+Die anfragenden Requests erhalten ihre Antwort erst nach dem Commit.
+
+Idempotency-Keys verhalten sich wie im synchronen Pfad: gespeichert wird nur die
+vollständige Antwort einer erfolgreichen Buchung; scheitert eine Buchung (z.B. "Kein
+Geld"), wird ihre Reservierung im selben Batch wieder gelöscht.
+"""
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from models import db, Buchung, Mitglied
+from utils import idempotenz
+from utils.buchung import schwaerzung_nach
+from utils.hotlist import konsum_erfassen
+
+logger = logging.getLogger(__name__)
+
+_MAX_BATCH = 200
+_WARTEZEIT_SEKUNDEN = 30
+
+_queue = queue.Queue()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+class _Auftrag:
+    def __init__(self, mitglied_id, warenkorb, gesamtpreis, zeitstempel, schluessel, redirect_url):
+        self.mitglied_id = mitglied_id
+        self.warenkorb = warenkorb
+        self.gesamtpreis = gesamtpreis
+        self.zeitstempel = zeitstempel
+        self.schluessel = schluessel
+        self.redirect_url = redirect_url
+        self.antwort = None
+        self.status = None
+        self.fertig = threading.Event()
+
+
+def aktiv() -> bool:
+    return current_app.config.get("BUCHUNG_GRUPPENCOMMIT", False)
+
+
+def buchen(mitglied_id, warenkorb, gesamtpreis, zeitstempel, schluessel=None, redirect_url=None) -> tuple:
+    """
+    Reicht eine geprüfte Buchung beim Schreib-Thread ein und wartet auf deren Commit.
+
+    Die Session des Requests wird vorher geschlossen, damit das Warten keine
+    Datenbankverbindung aus dem Pool belegt.
+
+    Args:
+        warenkorb: [(artikel, menge, gesamtpreis)] wie von ``bar._warenkorb``
+        gesamtpreis: Summe des Warenkorbs (negativ)
+        redirect_url: Teil der Erfolgsantwort (wird mit dem Idempotency-Key gespeichert)
+
+    Returns:
+        (antwort, status) für die JSON-Antwort von ``bar.buchen``
+    """
+    _starten(current_app._get_current_object())
+    db.session.close()
+    auftrag = _Auftrag(mitglied_id, warenkorb, gesamtpreis, zeitstempel, schluessel, redirect_url)
+    _queue.put(auftrag)
+    if not auftrag.fertig.wait(_WARTEZEIT_SEKUNDEN):
+        # Der Batch kann noch committen; eine Wiederholung mit demselben Key ist sicher
+        return {"success": False, "message": "Zeitüberschreitung bei der Buchung."}, 503
+    return auftrag.antwort, auftrag.status
+
+
+def _starten(app):
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_schreiber, args=(app,), name="gruppencommit", daemon=True)
+            _thread.start()
+
+
+def _schreiber(app):
+    intervall = app.config.get("BUCHUNG_GRUPPENCOMMIT_MS", 5) / 1000
+    while True:
+        batch = [_queue.get()]
+        frist = time.monotonic() + intervall
+        while len(batch) < _MAX_BATCH:
+            rest = frist - time.monotonic()
+            if rest <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=rest))
+            except queue.Empty:
+                break
+
+        with app.app_context():
+            try:
+                ergebnisse = _verarbeiten(batch)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Gruppen-Commit: Batch mit %d Buchungen fehlgeschlagen", len(batch))
+                fehler = {"success": False, "message": "Interner Serverfehler bei der Buchung."}
+                ergebnisse = [(fehler, 500)] * len(batch)
+
+        for auftrag, (antwort, status) in zip(batch, ergebnisse):
+            auftrag.antwort, auftrag.status = antwort, status
+            auftrag.fertig.set()
+
+
+def _verarbeiten(batch) -> list:
+    """Schreibt einen Batch in einer Transaktion; gibt [(antwort, status)] in Batch-Reihenfolge zurück."""
+    bekannt = idempotenz.reservieren_alle(a.schluessel for a in batch if a.schluessel)
+
+    ids = sorted({a.mitglied_id for a in batch})
+    zustand = {
+        row.id: [row.guthaben, row.blacklist, row.schwaerzungs_grenze]
+        for row in db.session.execute(
+            select(Mitglied.id, Mitglied.guthaben, Mitglied.blacklist, Mitglied.schwaerzungs_grenze)
+            .where(Mitglied.id.in_(ids))
+            .order_by(Mitglied.id)
+            .with_for_update()
+        )
+    }
+    geaendert = set()
+
+    ergebnisse = []
+    erstes_vorkommen = {}
+    neue_buchungen = []
+    for auftrag in batch:
+        if auftrag.schluessel in bekannt:
+            # Gespeichert werden nur erfolgreiche Buchungen
+            ergebnisse.append((bekannt[auftrag.schluessel], 200))
+            continue
+        if auftrag.schluessel in erstes_vorkommen:
+            ergebnisse.append(None)  # Duplikat im Batch, übernimmt unten das erste Ergebnis
+            continue
+        if auftrag.schluessel:
+            erstes_vorkommen[auftrag.schluessel] = len(ergebnisse)
+
+        z = zustand.get(auftrag.mitglied_id)
+        if z is None:
+            ergebnisse.append(({"success": False, "message": "Mitglied nicht gefunden."}, 404))
+            continue
+        if z[1]:
+            ergebnisse.append(({"success": False, "message": "Kein Geld 🗿"}, 400))
+            continue
+
+        z[1] = schwaerzung_nach(z[0], z[1], z[2], auftrag.gesamtpreis)
+        z[0] += auftrag.gesamtpreis
+        geaendert.add(auftrag.mitglied_id)
+
+        for artikel, menge, preis in auftrag.warenkorb:
+            neue_buchungen.append(Buchung(
+                mitglied_id=auftrag.mitglied_id,
+                artikel_id=artikel.id,
+                menge=menge,
+                preis_pro_einheit=artikel.preis,
+                gesamtpreis=preis,
+                zeitstempel=auftrag.zeitstempel,
+            ))
+
+        betrag = f"{abs(auftrag.gesamtpreis / 100):.2f}".replace(".", ",")
+        antwort = {"success": True, "message": f"Buchung erfolgreich: € {betrag}"}
+        if auftrag.redirect_url:
+            antwort["redirect_url"] = auftrag.redirect_url
+        ergebnisse.append((antwort, 200))
+
+    db.session.add_all(neue_buchungen)
+    konsum_erfassen(neue_buchungen)
+    if geaendert:
+        db.session.execute(
+            update(Mitglied),
+            [
+                {"id": i, "guthaben": zustand[i][0], "blacklist": zustand[i][1]}
+                for i in sorted(geaendert)
+            ],
+        )
+
+    neue_antworten = {
+        k: ergebnisse[idx][0] for k, idx in erstes_vorkommen.items() if ergebnisse[idx][1] == 200
+    }
+    idempotenz.speichern_alle(neue_antworten)
+    idempotenz.freigeben_alle(set(erstes_vorkommen) - set(neue_antworten))
+
+    db.session.commit()
+
+    for k, antwort in neue_antworten.items():
+        idempotenz.merken(k, antwort)
+
+    return [
+        e if e is not None else ergebnisse[erstes_vorkommen[a.schluessel]]
+        for a, e in zip(batch, ergebnisse)
+    ]
@@ -0,0 +1,165 @@
+"""Hotlist der Bar: inkrementell gepflegte Konsum-Zähler pro Mitglied.
+
+Statt bei jedem Aufruf über die gesamte Buchungstabelle zu aggregieren, wird der
+Konsum beim Buchen bzw. Stornieren fortgeschrieben:
+
+- ``mitglied.konsum_gesamt``: Konsum seit Beginn (Cent, positiv)
+- ``konsum_tag``: Konsum pro Mitglied und Tag, für das Fenster der letzten HOTLIST_DAYS Tage
+
+Als Konsum zählen alle nicht stornierten Buchungen mit negativem Gesamtpreis.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, Mitglied, KonsumTag
+from utils import benachrichtigung, rollup
+
+
+def hotlist(limit: int = None) -> list:
+    """
+    Gibt die aktiven Mitglieder in Hotlist-Reihenfolge zurück (eine Abfrage).
+
+    Reihenfolge:
+        1. gepinnt, A→Z (immer enthalten, auch über ``limit`` hinaus)
+        2. Konsum der letzten HOTLIST_DAYS Tage absteigend, dann A→Z
+        3. Konsum seit Beginn absteigend, dann A→Z
+        4. alle übrigen A→Z
+    """
+    hotlist_days = current_app.config.get("HOTLIST_DAYS", 14)
+    since = (datetime.now() - timedelta(days=hotlist_days)).date()
+
+    recent = (
+        db.session.query(
+            KonsumTag.mitglied_id,
+            func.sum(KonsumTag.summe).label("summe"),
+        )
+        .filter(KonsumTag.tag >= since)
+        .group_by(KonsumTag.mitglied_id)
+        .subquery()
+    )
+    recent_summe = func.coalesce(recent.c.summe, 0)
+
+    bucket = case(
+        (Mitglied.gepinnt == True, 0),
+        (recent_summe > 0, 1),
+        (Mitglied.konsum_gesamt > 0, 2),
+        else_=3,
+    )
+    score = case(
+        (bucket == 1, recent_summe),
+        (bucket == 2, Mitglied.konsum_gesamt),
+        else_=0,
+    )
+
+    q = (
+        Mitglied.query
+        .outerjoin(recent, recent.c.mitglied_id == Mitglied.id)
+        .filter(Mitglied.aktiv == True)
+        .order_by(bucket, score.desc(), Mitglied.name)
+    )
+    if limit is not None:
+        pinned_count = (
+            select(func.count(Mitglied.id))
+            .where(Mitglied.aktiv == True, Mitglied.gepinnt == True)
+            .scalar_subquery()
+        )
+        q = q.limit(func.greatest(limit, pinned_count))
+    return q.all()
+
+
+def stand() -> str | None:
+    """
+    Versionskennung der Mitgliederliste (für ETags), ohne die Hotlist zu berechnen.
+
+    Ein Trigger meldet jede Änderung an ``mitglied`` (Buchung, Storno, Aufbuchung, Stammdaten)
+    per ``NOTIFY mitglied_stand``; die Meldung kommt erst nach dem Commit an
+    (``utils.benachrichtigung``). Das Datum deckt das Weiterrutschen des HOTLIST_DAYS-Fensters ab.
+
+    Returns:
+        die Kennung, oder None, solange der Listener nicht verbunden ist
+    """
+    seq = benachrichtigung.stand("mitglied_stand")
+    if seq is None:
+        return None
+    return f"{seq}-{datetime.now():%Y%m%d}"
+
+
+def konsum_erfassen(buchungen, vorzeichen: int = 1):
+    """
+    Schreibt den Konsum der übergebenen Buchungen in die Hotlist-Zähler und den
+    stündlichen Ranking-Rollup (``utils.rollup``) fort.
+
+    Läuft in der aktuellen Session und wird mit der Buchung gemeinsam committed.
+
+    Args:
+        buchungen: Buchungen (oder Objekte mit mitglied_id, artikel_id, menge, gesamtpreis, zeitstempel)
+        vorzeichen: 1 beim Anlegen / Storno zurücknehmen, -1 beim Stornieren
+    """
+    rollup.erfassen(buchungen, vorzeichen)
+
+    pro_tag = defaultdict(int)
+    pro_mitglied = defaultdict(int)
+    for b in buchungen:
+        if b.gesamtpreis >= 0:
+            continue
+        betrag = -b.gesamtpreis * vorzeichen
+        pro_tag[(b.mitglied_id, b.zeitstempel.date())] += betrag
+        pro_mitglied[b.mitglied_id] += betrag
+
+    if not pro_tag:
+        return
+
+    stmt = pg_insert(KonsumTag).values([
+        {"mitglied_id": mitglied_id, "tag": tag, "summe": summe}
+        for (mitglied_id, tag), summe in sorted(pro_tag.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[KonsumTag.mitglied_id, KonsumTag.tag],
+        set_={"summe": KonsumTag.summe + stmt.excluded.summe},
+    )
+    db.session.execute(stmt)
+
+    for mitglied_id, betrag in sorted(pro_mitglied.items()):
+        db.session.execute(
+            update(Mitglied)
+            .where(Mitglied.id == mitglied_id)
+            .values(konsum_gesamt=Mitglied.konsum_gesamt + betrag)
+        )
+
+
+def hotlist_neu_berechnen():
+    """
+    Baut die Hotlist-Zähler komplett aus der Buchungstabelle neu auf (z.B. nach einem Restore).
+
+    Archivierte Buchungen gehen über ``buchung_archiv_summe`` in ``konsum_gesamt`` ein.
+    """
+    db.session.execute(text("DELETE FROM konsum_tag"))
+    db.session.execute(text(
+        """
+        INSERT INTO konsum_tag (mitglied_id, tag, summe)
+        SELECT mitglied_id, zeitstempel::date, -SUM(gesamtpreis)
+        FROM buchung
+        WHERE storno = false AND gesamtpreis < 0
+        GROUP BY mitglied_id, zeitstempel::date
+        """
+    ))
+    db.session.execute(text(
+        """
+        UPDATE mitglied m
+        SET konsum_gesamt = COALESCE((
+            SELECT -SUM(b.gesamtpreis)
+            FROM buchung b
+            WHERE b.mitglied_id = m.id AND b.storno = false AND b.gesamtpreis < 0
+        ), 0) + COALESCE((
+            SELECT SUM(s.konsum)
+            FROM buchung_archiv_summe s
+            WHERE s.mitglied_id = m.id
+        ), 0)
+        """
+    ))
+    db.session.commit()
@@ -0,0 +1,132 @@
+"""Idempotency-Keys für Buchungsanfragen.
+
+Terminals schicken mit jeder Buchung einen selbst erzeugten Schlüssel. Wird dieselbe
+Anfrage (z.B. nach einem Timeout) erneut gesendet, liefert der Server die ursprüngliche
+Antwort zurück, statt ein zweites Mal zu buchen.
+
+Der Schlüssel wird in derselben Transaktion wie die Buchung reserviert (Primärschlüssel
+als Unique-Index): Scheitert die Buchung, verfällt auch die Reservierung. Bekannte
+Antworten werden zusätzlich prozesslokal vorgehalten, damit Wiederholungen die
+Datenbank gar nicht erst erreichen.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import config
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, Idempotenz
+
+logger = logging.getLogger(__name__)
+
+_CACHE_GROESSE = 1000
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def gespeicherte_antwort(schluessel: str):
+    """Antwort aus dem prozesslokalen Cache oder None."""
+    with _lock:
+        antwort = _cache.get(schluessel)
+        if antwort is not None:
+            _cache.move_to_end(schluessel)
+        return antwort
+
+
+def merken(schluessel: str, antwort: dict):
+    """Legt eine committete Antwort im prozesslokalen Cache ab."""
+    with _lock:
+        _cache[schluessel] = antwort
+        _cache.move_to_end(schluessel)
+        while len(_cache) > _CACHE_GROESSE:
+            _cache.popitem(last=False)
+
+
+def reservieren(schluessel: str):
+    """
+    Reserviert den Schlüssel in der laufenden Transaktion.
+
+    Läuft parallel eine Anfrage mit demselben Schlüssel, wartet Postgres auf deren Commit.
+
+    Returns:
+        None, wenn der Schlüssel neu ist (jetzt reserviert), sonst die gespeicherte Antwort.
+    """
+    stmt = (
+        pg_insert(Idempotenz)
+        .values(schluessel=schluessel, zeitstempel=datetime.now())
+        .on_conflict_do_nothing(index_elements=[Idempotenz.schluessel])
+        .returning(Idempotenz.schluessel)
+    )
+    if db.session.execute(stmt).scalar() is not None:
+        return None
+
+    antwort = db.session.get(Idempotenz, schluessel).antwort
+    merken(schluessel, antwort)
+    return antwort
+
+
+def reservieren_alle(schluessel_liste) -> dict:
+    """
+    Wie ``reservieren``, aber für viele Schlüssel mit einem einzigen INSERT.
+
+    Returns:
+        {schluessel: antwort} für alle Schlüssel, die bereits verwendet wurden.
+    """
+    schluessel_liste = set(schluessel_liste)
+    if not schluessel_liste:
+        return {}
+
+    jetzt = datetime.now()
+    stmt = (
+        pg_insert(Idempotenz)
+        .values([{"schluessel": k, "zeitstempel": jetzt} for k in sorted(schluessel_liste)])
+        .on_conflict_do_nothing(index_elements=[Idempotenz.schluessel])
+        .returning(Idempotenz.schluessel)
+    )
+    neu = set(db.session.execute(stmt).scalars())
+    alt = schluessel_liste - neu
+    if not alt:
+        return {}
+
+    antworten = dict(
+        db.session.query(Idempotenz.schluessel, Idempotenz.antwort)
+        .filter(Idempotenz.schluessel.in_(alt))
+        .all()
+    )
+    for k, antwort in antworten.items():
+        merken(k, antwort)
+    return antworten
+
+
+def speichern(schluessel: str, antwort: dict):
+    """Hinterlegt die Antwort zum reservierten Schlüssel (wird mit der Buchung committed)."""
+    db.session.get(Idempotenz, schluessel).antwort = antwort
+
+
+def speichern_alle(antworten: dict):
+    """Wie ``speichern`` für viele Schlüssel: {schluessel: antwort}."""
+    if antworten:
+        db.session.execute(
+            update(Idempotenz),
+            [{"schluessel": k, "antwort": a} for k, a in antworten.items()],
+        )
+
+
+def freigeben_alle(schluessel_liste):
+    """Löscht Reservierungen gescheiterter Buchungen, damit eine Wiederholung neu bucht."""
+    schluessel_liste = set(schluessel_liste)
+    if schluessel_liste:
+        db.session.execute(delete(Idempotenz).where(Idempotenz.schluessel.in_(schluessel_liste)))
+
+
+# Cronjob (wird von app.py gestartet)
+def cronjob(app):
+    with app.app_context():
+        grenze = datetime.now() - timedelta(hours=config.IDEMPOTENZ_TTL_STUNDEN)
+        result = db.session.execute(delete(Idempotenz).where(Idempotenz.zeitstempel < grenze))
+        db.session.commit()
+        if result.rowcount:
+            logger.debug("Idempotenz: %d abgelaufene Schlüssel gelöscht", result.rowcount)
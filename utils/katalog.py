@@ -0,0 +1,108 @@
+"""Prozesslokaler Artikelkatalog für die Bar.
+
+Hält eine unveränderliche Momentaufnahme aller Artikel, damit die Buchungsseite und die
+Warenkorb-Prüfung in ``bar.buchen`` nicht bei jedem Aufruf die Artikeltabelle lesen.
+Die Artikel-Verwaltung invalidiert den Katalog; jede Invalidierung erhöht die Version,
+damit ein parallel laufender Ladevorgang keinen veralteten Stand installiert.
+
+Über Prozessgrenzen hinweg meldet ein Trigger jede Änderung an ``artikel`` per
+``NOTIFY artikel_stand`` nach dem Commit; jeder Zugriff vergleicht den Stand des Listeners
+(``utils.benachrichtigung``, ohne Datenbankzugriff) und lädt neu, sobald er sich geändert hat.
+Ohne verbundenen Listener wird bei jedem Zugriff neu geladen.
+"""
+
+import threading
+from typing import NamedTuple
+
+from models import Artikel
+from utils import benachrichtigung
+
+
+class ArtikelEintrag(NamedTuple):
+    id: int
+    name: str
+    preis: int
+    reihenfolge: int | None
+    aktiv: bool
+    typ: str
+    volumen_liter: float | None
+    reinalkohol_liter: float | None
+
+
+class _Katalog(NamedTuple):
+    version: int
+    db_stand: str | None
+    artikel: dict
+    aktive: list
+
+
+_lock = threading.Lock()
+_version = 0
+_katalog = None
+
+
+def _eintrag(a: Artikel) -> ArtikelEintrag:
+    return ArtikelEintrag(
+        id=a.id,
+        name=a.name,
+        preis=a.preis,
+        reihenfolge=a.reihenfolge,
+        aktiv=a.aktiv,
+        typ=a.typ,
+        volumen_liter=a.volumen_liter,
+        reinalkohol_liter=a.reinalkohol_liter,
+    )
+
+
+def _laden(db_stand: str | None) -> _Katalog:
+    global _katalog
+    version = _version
+    # db_stand wurde vor dem Lesen der Artikel bestimmt: der Katalog ist mindestens so neu
+    artikel = {a.id: _eintrag(a) for a in Artikel.query.all()}
+    aktive = sorted(
+        (a for a in artikel.values() if a.aktiv),
+        # wie ORDER BY reihenfolge, name (NULLs zuletzt)
+        key=lambda a: (a.reihenfolge is None, a.reihenfolge or 0, a.name),
+    )
+    katalog = _Katalog(version, db_stand, artikel, aktive)
+    with _lock:
+        if _version == version:
+            _katalog = katalog
+    return katalog
+
+
+def _aktuell() -> _Katalog:
+    katalog = _katalog
+    db_stand = benachrichtigung.stand("artikel_stand")
+    if db_stand is None or katalog is None or katalog.version != _version or katalog.db_stand != db_stand:
+        katalog = _laden(db_stand)
+    return katalog
+
+
+def invalidieren():
+    """Verwirft den Katalog nach Änderungen an Artikeln."""
+    global _version, _katalog
+    with _lock:
+        _version += 1
+        _katalog = None
+
+
+def aktive_artikel() -> list:
+    """Aktive Artikel sortiert nach Reihenfolge und Name."""
+    return _aktuell().aktive
+
+
+def artikel_aufloesen(artikel_ids) -> dict:
+    """
+    Löst Artikel-IDs gegen den Katalog auf: {id: ArtikelEintrag}.
+
+    Unbekannte IDs (z.B. gerade erst angelegt) werden mit einer einzigen IN-Abfrage
+    nachgeladen; IDs ohne Artikel fehlen im Ergebnis.
+    """
+    katalog = _aktuell().artikel
+    gefunden = {i: katalog[i] for i in artikel_ids if i in katalog}
+    fehlend = {i for i in artikel_ids if i not in gefunden}
+    if fehlend:
+        for a in Artikel.query.filter(Artikel.id.in_(fehlend)):
+            gefunden[a.id] = _eintrag(a)
+    return gefunden
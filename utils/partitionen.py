@@ -0,0 +1,142 @@
+"""Monatliche Range-Partitionierung der Tabelle ``buchung`` (optional).
+
+Die Umstellung ist bewusst keine Alembic-Revision, sondern ein einmaliger Wartungsbefehl
+(``flask buchung-partitionieren``): Sie schreibt die ganze Tabelle um und lohnt sich erst
+bei vielen Buchungen. Danach ist ``buchung`` eine nach ``zeitstempel`` partitionierte
+Tabelle mit einer Partition pro Monat (``buchung_JJJJ_MM``) und einer Default-Partition
+als Auffangnetz. Der Primärschlüssel wird dabei zu ``(id, zeitstempel)``, da Postgres den
+Partitionsschlüssel in jedem eindeutigen Index verlangt; ``id`` bleibt über die Sequenz
+eindeutig, das ORM-Modell arbeitet unverändert weiter.
+
+Zeitraumabfragen (Ranking, Race, Historie, Export) werden vom Planer auf die betroffenen
+Monate beschränkt. Künftige Partitionen legt ``cronjob`` täglich im Voraus an.
+"""
+import logging
+from datetime import date
+
+from sqlalchemy import text
+
+import config
+from models import db, Buchung
+
+logger = logging.getLogger(__name__)
+
+
+def partitioniert() -> bool:
+    """True, wenn ``buchung`` bereits eine partitionierte Tabelle ist."""
+    relkind = db.session.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = 'buchung'::regclass")
+    ).scalar()
+    return relkind == "p"
+
+
+def _monat(tag: date, versatz: int = 0) -> date:
+    """Erster Tag des Monats ``versatz`` Monate nach ``tag``."""
+    index = tag.year * 12 + tag.month - 1 + versatz
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_anlegen(monat: date):
+    name = f"buchung_{monat:%Y_%m}"
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF buchung "
+        f"FOR VALUES FROM ('{monat:%Y-%m-%d}') TO ('{_monat(monat, 1):%Y-%m-%d}')"
+    ))
+
+
+def anlegen(monate_voraus: int = None) -> int:
+    """
+    Legt die Partitionen für den laufenden und die nächsten ``monate_voraus`` Monate an
+    (vorhandene bleiben unberührt). Ohne Partitionierung passiert nichts.
+
+    Returns:
+        Anzahl der geprüften Monate (0, wenn ``buchung`` nicht partitioniert ist)
+    """
+    if not partitioniert():
+        return 0
+    if monate_voraus is None:
+        monate_voraus = config.BUCHUNG_PARTITIONEN_VORAUS
+    heute = date.today()
+    for versatz in range(monate_voraus + 1):
+        _partition_anlegen(_monat(heute, versatz))
+    db.session.commit()
+    return monate_voraus + 1
+
+
+def umstellen():
+    """
+    Wandelt ``buchung`` in eine nach Monaten partitionierte Tabelle um (eine Transaktion).
+
+    Spalten, Defaults und NOT NULL werden übernommen, Fremdschlüssel neu angelegt, die
+    Indizes aus ``Buchung.__table__`` auf der Elterntabelle erzeugt (sie gelten damit für
+    alle Partitionen) und Trigger sowie Views der alten Tabelle übertragen.
+    """
+    if partitioniert():
+        raise RuntimeError("buchung ist bereits partitioniert.")
+
+    conn = db.session.connection()
+    conn.execute(text("LOCK TABLE buchung IN ACCESS EXCLUSIVE MODE"))
+
+    # Definitionen vor dem Umbenennen lesen: sie beziehen sich damit schon auf die neue Tabelle
+    trigger = conn.execute(text(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger "
+        "WHERE tgrelid = 'buchung'::regclass AND NOT tgisinternal"
+    )).scalars().all()
+    fremdschluessel = conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = 'buchung'::regclass AND contype = 'f'"
+    )).all()
+    erster, letzter = conn.execute(text("SELECT min(zeitstempel), max(zeitstempel) FROM buchung")).one()
+    # Views hängen an der alten Tabelle und werden danach auf der neuen wieder angelegt
+    views = conn.execute(text(
+        "SELECT DISTINCT v.relname, pg_get_viewdef(v.oid) FROM pg_depend d "
+        "JOIN pg_rewrite r ON r.oid = d.objid JOIN pg_class v ON v.oid = r.ev_class "
+        "WHERE d.refobjid = 'buchung'::regclass AND v.relkind = 'v'"
+    )).all()
+    for name, _ in views:
+        conn.execute(text(f"DROP VIEW {name}"))
+
+    # Alte Tabelle aus dem Weg räumen; Sequenz und Indexnamen werden weiterverwendet
+    conn.execute(text("ALTER SEQUENCE buchung_id_seq OWNED BY NONE"))
+    conn.execute(text("ALTER TABLE buchung RENAME TO buchung_alt"))
+    conn.execute(text("ALTER TABLE buchung_alt RENAME CONSTRAINT buchung_pkey TO buchung_alt_pkey"))
+    for index in Buchung.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    conn.execute(text(
+        "CREATE TABLE buchung (LIKE buchung_alt INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (zeitstempel)"
+    ))
+    conn.execute(text("ALTER TABLE buchung ADD CONSTRAINT buchung_pkey PRIMARY KEY (id, zeitstempel)"))
+    for name, definition in fremdschluessel:
+        conn.execute(text(f"ALTER TABLE buchung ADD CONSTRAINT {name} {definition}"))
+
+    heute = date.today()
+    monat = _monat(erster.date() if erster else heute)
+    ende = _monat(max(letzter.date() if letzter else heute, heute), config.BUCHUNG_PARTITIONEN_VORAUS)
+    while monat <= ende:
+        _partition_anlegen(monat)
+        monat = _monat(monat, 1)
+    conn.execute(text("CREATE TABLE buchung_default PARTITION OF buchung DEFAULT"))
+
+    # Erst kopieren, dann indizieren: ein Indexaufbau ist billiger als zeilenweise Pflege
+    conn.execute(text("INSERT INTO buchung SELECT * FROM buchung_alt"))
+    for index in Buchung.__table__.indexes:
+        index.create(bind=conn)
+    for definition in trigger:
+        conn.execute(text(definition))
+    for name, definition in views:
+        conn.execute(text(f"CREATE VIEW {name} AS {definition}"))
+
+    conn.execute(text("DROP TABLE buchung_alt"))
+    conn.execute(text("ALTER SEQUENCE buchung_id_seq OWNED BY buchung.id"))
+    db.session.commit()
+
+    db.session.execute(text("ANALYZE buchung"))
+    db.session.commit()
+
+
+def cronjob(app):
+    with app.app_context():
+        if anlegen():
+            logger.debug("Buchung-Partitionen für %d Monate geprüft", config.BUCHUNG_PARTITIONEN_VORAUS + 1)
@@ -0,0 +1,72 @@
+"""Gemeinsamer Ergebnis-Cache für das Ranking (prozesslokal, LRU, Single-Flight).
+
+Mehrere Anzeigen zeigen oft dieselbe Konfiguration. Ergebnisse werden unter
+``(Zeitfenster-Bucket, Artikel-IDs, Buchungsstand)`` abgelegt; fragen mehrere Requests
+gleichzeitig denselben Schlüssel an, rechnet nur der erste, die übrigen warten auf
+dessen Ergebnis. Die Zahl der Einträge ist auf RANKING_CACHE_GROESSE begrenzt.
+"""
+
+import threading
+from collections import OrderedDict
+
+import config
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_laufend = {}
+_statistik = {"treffer": 0, "fehlschlaege": 0, "geteilt": 0}
+
+
+class _Berechnung:
+    def __init__(self):
+        self.fertig = threading.Event()
+        self.wert = None
+        self.fehler = None
+
+
+def holen(schluessel, berechnen):
+    """
+    Liefert das Ergebnis zu ``schluessel``; ``berechnen()`` läuft pro Schlüssel höchstens
+    einmal gleichzeitig. Das Ergebnis wird geteilt und darf nicht verändert werden.
+    """
+    with _lock:
+        if schluessel in _cache:
+            _cache.move_to_end(schluessel)
+            _statistik["treffer"] += 1
+            return _cache[schluessel]
+
+        berechnung = _laufend.get(schluessel)
+        eigene = berechnung is None
+        if eigene:
+            berechnung = _laufend[schluessel] = _Berechnung()
+            _statistik["fehlschlaege"] += 1
+        else:
+            _statistik["geteilt"] += 1
+
+    if not eigene:
+        berechnung.fertig.wait()
+        if berechnung.fehler is not None:
+            raise berechnung.fehler
+        return berechnung.wert
+
+    try:
+        berechnung.wert = berechnen()
+    except Exception as e:
+        berechnung.fehler = e
+        raise
+    else:
+        with _lock:
+            _cache[schluessel] = berechnung.wert
+            while len(_cache) > config.RANKING_CACHE_GROESSE:
+                _cache.popitem(last=False)
+        return berechnung.wert
+    finally:
+        with _lock:
+            _laufend.pop(schluessel, None)
+        berechnung.fertig.set()
+
+
+def statistik() -> dict:
+    """Zähler seit Prozessstart: Treffer, Fehlschläge (= Berechnungen), geteilte Berechnungen."""
+    with _lock:
+        return {**_statistik, "eintraege": len(_cache)}
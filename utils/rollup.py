@@ -0,0 +1,114 @@
+"""Stündlicher Konsum-Rollup für das Ranking.
+
+``konsum_stunde`` hält pro Mitglied, Artikel und Stunde die gebuchte Menge und den Umsatz
+(Cent, positiv) aller nicht stornierten Artikelbuchungen. Fortgeschrieben wird er zusammen
+mit den Hotlist-Zählern in ``utils.hotlist.konsum_erfassen``; ``neu_berechnen`` baut ihn
+komplett aus der Buchungstabelle auf (``flask rollup-neu-berechnen``, Restore).
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import case, func, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import db, Buchung, KonsumStunde
+
+
+def erfassen(buchungen, vorzeichen: int = 1):
+    """
+    Schreibt die übergebenen Buchungen in den Rollup fort (in der aktuellen Session).
+
+    Args:
+        buchungen: Buchungen (mitglied_id, artikel_id, menge, gesamtpreis, zeitstempel)
+        vorzeichen: 1 beim Anlegen / Storno zurücknehmen, -1 beim Stornieren
+    """
+    summen = defaultdict(lambda: [0, 0])
+    for b in buchungen:
+        if b.artikel_id is None:
+            continue
+        stunde = b.zeitstempel.replace(minute=0, second=0, microsecond=0)
+        eintrag = summen[(b.mitglied_id, b.artikel_id, stunde)]
+        eintrag[0] += b.menge * vorzeichen
+        eintrag[1] += max(-b.gesamtpreis, 0) * vorzeichen
+
+    if not summen:
+        return
+
+    stmt = pg_insert(KonsumStunde).values([
+        {"mitglied_id": m, "artikel_id": a, "stunde": s, "menge": menge, "umsatz": umsatz}
+        for (m, a, s), (menge, umsatz) in sorted(summen.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[KonsumStunde.mitglied_id, KonsumStunde.artikel_id, KonsumStunde.stunde],
+        set_={
+            "menge": KonsumStunde.menge + stmt.excluded.menge,
+            "umsatz": KonsumStunde.umsatz + stmt.excluded.umsatz,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def summen_seit(seit, artikel_ids):
+    """
+    Menge und Umsatz pro (Mitglied, Artikel) seit ``seit``, als Subquery.
+
+    Volle Stunden kommen aus dem Rollup, nur die angebrochene erste Stunde wird aus
+    ``buchung`` gelesen – das Ergebnis ist also minutengenau.
+
+    Spalten: mitglied_id, artikel_id, menge, umsatz
+    """
+    grenze = seit.replace(minute=0, second=0, microsecond=0)
+    if grenze < seit:
+        grenze += timedelta(hours=1)
+
+    volle_stunden = select(
+        KonsumStunde.mitglied_id,
+        KonsumStunde.artikel_id,
+        KonsumStunde.menge.label("menge"),
+        KonsumStunde.umsatz.label("umsatz"),
+    ).where(
+        KonsumStunde.stunde >= grenze,
+        KonsumStunde.artikel_id.in_(artikel_ids),
+    )
+    rand = select(
+        Buchung.mitglied_id,
+        Buchung.artikel_id,
+        Buchung.menge.label("menge"),
+        case((Buchung.gesamtpreis < 0, -Buchung.gesamtpreis), else_=0).label("umsatz"),
+    ).where(
+        Buchung.zeitstempel >= seit,
+        Buchung.zeitstempel < grenze,
+        Buchung.storno == False,
+        Buchung.artikel_id.in_(artikel_ids),
+    )
+    teile = union_all(volle_stunden, rand).subquery()
+
+    return (
+        select(
+            teile.c.mitglied_id,
+            teile.c.artikel_id,
+            func.sum(teile.c.menge).label("menge"),
+            func.sum(teile.c.umsatz).label("umsatz"),
+        )
+        .group_by(teile.c.mitglied_id, teile.c.artikel_id)
+        # komplett stornierte Stunden bleiben als Nullzeilen im Rollup stehen
+        .having(func.sum(teile.c.menge) != 0)
+        .subquery()
+    )
+
+
+def neu_berechnen():
+    """Baut den Rollup komplett aus der Buchungstabelle neu auf."""
+    db.session.execute(text("DELETE FROM konsum_stunde"))
+    db.session.execute(text(
+        """
+        INSERT INTO konsum_stunde (mitglied_id, artikel_id, stunde, menge, umsatz)
+        SELECT mitglied_id, artikel_id, date_trunc('hour', zeitstempel),
+               SUM(menge), SUM(CASE WHEN gesamtpreis < 0 THEN -gesamtpreis ELSE 0 END)
+        FROM buchung
+        WHERE storno = false AND artikel_id IS NOT NULL
+        GROUP BY mitglied_id, artikel_id, date_trunc('hour', zeitstempel)
+        """
+    ))
+    db.session.commit()
@@ -0,0 +1,72 @@
+"""Bildregister für die Schwärzungsanzeige (static/schwaerzung).
+
+Die Bilderliste wird beim Start gelesen und nur neu eingelesen, wenn sich die mtime des
+Ordners ändert (Datei hinzugefügt, gelöscht oder umbenannt). Auch die mtime wird höchstens
+alle SCHWAERZUNG_PRUEF_SEKUNDEN geprüft, damit langsame Volumes (Bind-Mount in der
+docker-compose.yml) die Buchungsseite nicht ausbremsen.
+"""
+
+import os
+import threading
+import time
+
+from flask import current_app
+
+ERLAUBTE_ENDUNGEN = {".webp", ".png", ".jpg", ".jpeg", ".gif"}
+
+_lock = threading.Lock()
+_bilder = ()
+_mtime = None
+_geprueft = 0.0
+
+
+def _ordner() -> str:
+    return os.path.join(current_app.static_folder, "schwaerzung")
+
+
+def _einlesen(ordner: str, mtime) -> tuple:
+    global _bilder, _mtime
+    try:
+        dateien = os.listdir(ordner)
+    except FileNotFoundError:
+        dateien = []
+    _bilder = tuple(sorted(
+        f for f in dateien
+        if os.path.splitext(f)[1].lower() in ERLAUBTE_ENDUNGEN
+    ))
+    _mtime = mtime
+    return _bilder
+
+
+def laden():
+    """Liest den Ordner sofort ein (beim Start, innerhalb eines App-Kontexts)."""
+    global _geprueft
+    ordner = _ordner()
+    with _lock:
+        try:
+            mtime = os.stat(ordner).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        _geprueft = time.monotonic()
+        return _einlesen(ordner, mtime)
+
+
+def bilder() -> tuple:
+    """Sortierte Dateinamen der Schwärzungsbilder; liest den Ordner nur bei Änderungen neu ein."""
+    global _geprueft
+    jetzt = time.monotonic()
+    if jetzt - _geprueft < current_app.config.get("SCHWAERZUNG_PRUEF_SEKUNDEN", 10):
+        return _bilder
+
+    ordner = _ordner()
+    with _lock:
+        if jetzt - _geprueft < current_app.config.get("SCHWAERZUNG_PRUEF_SEKUNDEN", 10):
+            return _bilder
+        try:
+            mtime = os.stat(ordner).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        _geprueft = jetzt
+        if mtime != _mtime:
+            return _einlesen(ordner, mtime)
+        return _bilder
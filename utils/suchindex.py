@@ -0,0 +1,138 @@
+"""In-Process-Suchindex über aktive Mitglieder für die Bar-Terminals.
+
+Pro Worker wird ein Trigramm-Index über Name und Nickname gehalten, der Suchanfragen
+ohne Datenbank-Scan beantwortet. Nur die Trefferliste wird danach per Primärschlüssel
+geladen, damit Guthaben und Schwärzung immer aktuell sind.
+
+Der Index wird im Hintergrund aufgebaut (bis dahin sucht Postgres über
+``suche_mitglied``) und von der Mitglieder-Verwaltung invalidiert. Jede Invalidierung erhöht
+die Version; ein Aufbau, der vor der Invalidierung begonnen hat, wird verworfen (wie in
+``utils/katalog.py``). Damit andere Worker nicht dauerhaft veraltet bleiben, wird er nach
+MITGLIED_INDEX_TTL_SEKUNDEN neu aufgebaut; bis dahin antwortet der bisherige Index.
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+
+from models import Mitglied
+from utils.admin import suche_mitglied
+
+_lock = threading.Lock()
+_version = 0
+_index = None
+_laedt = False
+
+
+class _Index:
+    def __init__(self, mitglieder):
+        self.erstellt = time.monotonic()
+        self.eintraege = {}
+        self.trigramme = defaultdict(set)
+        for mitglied_id, name, nickname in mitglieder:
+            heuhaufen = f"{name} {nickname or ''}".lower()
+            self.eintraege[mitglied_id] = (name, heuhaufen, heuhaufen.split())
+            for tri in _trigramme(heuhaufen):
+                self.trigramme[tri].add(mitglied_id)
+
+    def suche(self, search_term: str) -> list:
+        """Gibt die IDs aller Treffer sortiert nach Relevanz, dann Name zurück."""
+        woerter = search_term.lower().split()
+        if not woerter:
+            return []
+
+        kandidaten = None
+        for wort in woerter:
+            for tri in _trigramme(wort):
+                ids = self.trigramme.get(tri, set())
+                kandidaten = ids if kandidaten is None else kandidaten & ids
+                if not kandidaten:
+                    return []
+        if kandidaten is None:
+            kandidaten = self.eintraege.keys()
+
+        treffer = []
+        for mitglied_id in kandidaten:
+            name, heuhaufen, tokens = self.eintraege[mitglied_id]
+            if not all(wort in heuhaufen for wort in woerter):
+                continue
+            score = sum(
+                3 if wort in tokens else 2 if any(t.startswith(wort) for t in tokens) else 1
+                for wort in woerter
+            )
+            treffer.append((-score, name, mitglied_id))
+        treffer.sort()
+        return [mitglied_id for _, _, mitglied_id in treffer]
+
+
+def _trigramme(wort: str) -> set:
+    return {wort[i:i + 3] for i in range(len(wort) - 2)}
+
+
+def _laden(app, version: int):
+    global _index, _laedt
+    try:
+        with app.app_context():
+            mitglieder = (
+                Mitglied.query
+                .with_entities(Mitglied.id, Mitglied.name, Mitglied.nickname)
+                .filter(Mitglied.aktiv == True)
+                .all()
+            )
+        index = _Index(mitglieder)
+        with _lock:
+            # Während des Aufbaus invalidiert → veraltet, nicht veröffentlichen
+            if _version == version:
+                _index = index
+    finally:
+        with _lock:
+            _laedt = False
+
+
+def _neu_aufbauen():
+    """Startet einen Aufbau im Hintergrund, falls nicht schon einer läuft."""
+    global _laedt
+    with _lock:
+        if _laedt:
+            return
+        _laedt = True
+        version = _version
+    threading.Thread(
+        target=_laden,
+        args=(current_app._get_current_object(), version),
+        name="suchindex",
+        daemon=True,
+    ).start()
+
+
+def invalidieren():
+    """Verwirft den Index; der nächste Zugriff baut ihn im Hintergrund neu auf."""
+    global _index, _version
+    with _lock:
+        _version += 1
+        _index = None
+
+
+def suche(search_term: str, limit: int = None) -> list:
+    """Sucht aktive Mitglieder wie ``suche_mitglied``, aber über den In-Process-Index."""
+    index = _index
+    ttl = current_app.config.get("MITGLIED_INDEX_TTL_SEKUNDEN", 300)
+    if index is None or time.monotonic() - index.erstellt > ttl:
+        _neu_aufbauen()
+    if index is None:
+        # Kaltstart / nach Invalidierung: Postgres antwortet, bis der Index fertig ist
+        return suche_mitglied(search_term, limit=limit)
+
+    ids = index.suche(search_term)
+    if limit is not None:
+        ids = ids[:limit]
+    if not ids:
+        return []
+
+    mitglieder = {
+        m.id: m
+        for m in Mitglied.query.filter(Mitglied.id.in_(ids), Mitglied.aktiv == True)
+    }
+    return [mitglieder[i] for i in ids if i in mitglieder]